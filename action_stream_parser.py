@@ -0,0 +1,145 @@
+"""
+Parser Incremental de Ações - Detecta ações JSON completas enquanto a resposta do LLM é transmitida
+"""
+import json
+import re
+from typing import Dict, Any, List, Optional
+
+
+_FENCE_OPEN = "```json"
+
+# Chave imediatamente antes de um valor: "chave": (procurada só nos últimos caracteres)
+_KEY_PATTERN = re.compile(r'"((?:[^"\\]|\\.)*)"\s*:\s*$')
+_KEY_LOOKBACK = 256
+
+
+class StreamingActionParser:
+    """Consome trechos da resposta e devolve cada ação assim que seu objeto JSON fecha
+    
+    Segue o mesmo formato aceito por ReasoningCore._extract_actions: blocos ```json com um
+    objeto de ação, uma lista de ações ou {"actions": [...]}. Em uma lista, cada ação é
+    liberada ao fechar, sem esperar o restante da lista.
+    
+    Uma ação liberada ainda pode ser rejeitada pela extração sobre o texto completo (ex.:
+    o restante do bloco é inválido ou a cerca de fechamento não chega); quem executa as
+    ações antecipadamente deve conferir o resultado final.
+    """
+    
+    def __init__(self):
+        self.actions: List[Dict[str, Any]] = []
+        self._chunks: List[str] = []
+        # Só a parte ainda necessária do texto: a partir do bloco JSON aberto ou da posição de busca
+        self._buffer = ""
+        self._position = 0
+        self._in_json = False
+        # Pilha de containers abertos: (caractere de abertura, posição no texto, chave no objeto pai)
+        self._stack: List[tuple] = []
+        self._in_string = False
+        self._escaped = False
+    
+    @property
+    def text(self) -> str:
+        """Texto completo recebido até aqui"""
+        return "".join(self._chunks)
+    
+    def feed(self, chunk: str) -> List[Dict[str, Any]]:
+        """Acrescenta um trecho e retorna as ações que ficaram completas com ele"""
+        self._chunks.append(chunk)
+        self._buffer += chunk
+        completed: List[Dict[str, Any]] = []
+        
+        while self._position < len(self._buffer):
+            if not self._in_json:
+                if not self._seek_json_start():
+                    break
+                continue
+            
+            char = self._buffer[self._position]
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char in "{[":
+                self._stack.append((char, self._position, self._enclosing_key()))
+            elif char in "}]":
+                if not self._stack:
+                    # JSON malformado: abandonar o bloco
+                    self._in_json = False
+                else:
+                    opening, start, _ = self._stack.pop()
+                    if char == "}" and opening == "{":
+                        action = self._as_action(self._buffer[start:self._position + 1], self._stack)
+                        if action is not None:
+                            completed.append(action)
+                    if not self._stack:
+                        self._in_json = False
+            self._position += 1
+        
+        self._discard_parsed()
+        self.actions.extend(completed)
+        return completed
+    
+    def _discard_parsed(self) -> None:
+        """Descarta do buffer o texto já analisado que não será mais lido"""
+        keep_from = self._stack[0][1] if self._in_json and self._stack else self._position
+        if keep_from <= 0:
+            return
+        self._buffer = self._buffer[keep_from:]
+        self._position -= keep_from
+        self._stack = [(opening, start - keep_from, key) for opening, start, key in self._stack]
+    
+    def _seek_json_start(self) -> bool:
+        """Avança até o primeiro { ou [ depois de uma cerca ```json; False se ainda faltar texto"""
+        fence = self._buffer.find(_FENCE_OPEN, self._position)
+        if fence == -1:
+            # A cerca pode estar dividida entre dois trechos
+            self._position = max(self._position, len(self._buffer) - len(_FENCE_OPEN) + 1)
+            return False
+        
+        index = fence + len(_FENCE_OPEN)
+        while index < len(self._buffer) and self._buffer[index].isspace():
+            index += 1
+        if index == len(self._buffer):
+            self._position = fence
+            return False
+        
+        if self._buffer[index] in "{[":
+            self._in_json = True
+            self._in_string = False
+            self._escaped = False
+            self._stack = []
+            self._position = index
+        else:
+            self._position = index
+        return True
+    
+    def _enclosing_key(self) -> Optional[str]:
+        """Chave do container que abre na posição atual, se o pai for um objeto"""
+        if not self._stack or self._stack[-1][0] != "{":
+            return None
+        parent_start = self._stack[-1][1]
+        window = self._buffer[max(parent_start + 1, self._position - _KEY_LOOKBACK):self._position]
+        match = _KEY_PATTERN.search(window)
+        return match.group(1) if match else None
+    
+    @staticmethod
+    def _as_action(fragment: str, enclosing: List[tuple]) -> Optional[Dict[str, Any]]:
+        """Interpreta o objeto se estiver em posição de ação (topo, item de lista ou de "actions")"""
+        openings = [opening for opening, _, _ in enclosing]
+        if openings == ["{", "["]:
+            if enclosing[1][2] != "actions":
+                return None
+        elif openings not in ([], ["["]):
+            return None
+        try:
+            data = json.loads(fragment)
+        except json.JSONDecodeError:
+            return None
+        if isinstance(data, dict) and "action" in data and "parameters" in data:
+            return data
+        return None
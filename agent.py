@@ -5,10 +5,11 @@ import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(__file__)))))
 
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, Response, stream_with_context
 from datetime import datetime
 import threading
 import time
+import json
 
 # Importar o agente autônomo
 try:
@@ -17,6 +18,21 @@ except ImportError:
     # Fallback para modo simulação
     AutonomousAgent = None
 
+try:
+    from agent.tracing import tracer
+except ImportError:
+    tracer = None
+
+try:
+    from agent.tool_plan import PlanValidationError
+except ImportError:
+    PlanValidationError = ValueError
+
+try:
+    from config.settings import settings
+except ImportError:
+    settings = None
+
 agent_bp = Blueprint('agent', __name__)
 
 # Instância global do agente
@@ -89,6 +105,32 @@ def get_available_tools():
             "error": str(e)
         }), 500
 
+@agent_bp.route('/tools/latency', methods=['GET'])
+def get_tools_latency():
+    """Retorna percentis de latência e taxas por ferramenta e categoria"""
+    try:
+        agent = get_agent()
+        
+        if agent is None:
+            return jsonify({
+                "success": False,
+                "error": "Agente não disponível",
+                "mode": "simulation"
+            }), 503
+        
+        latency = agent.tool_manager.get_latency_statistics(request.args.get('category'))
+        return jsonify({
+            "success": True,
+            "latency": latency,
+            "timestamp": datetime.now().isoformat()
+        })
+    
+    except Exception as e:
+        return jsonify({
+            "success": False,
+            "error": str(e)
+        }), 500
+
 @agent_bp.route('/chat', methods=['POST'])
 def chat_with_agent():
     """Processa uma mensagem de chat com o agente"""
@@ -109,18 +151,29 @@ def chat_with_agent():
             }), 400
         
         agent = get_agent()
+        trace_id = None
         
         if agent is None:
             # Modo simulação
             response = f"[SIMULAÇÃO] Recebi sua mensagem: '{message}'. Em modo real, o agente processaria esta requisição usando suas 37 ferramentas disponíveis."
         else:
             # Processar com o agente real
-            response = agent.process_request(message)
+            if tracer is not None:
+                with tracer.span("http.chat", message_length=len(message)) as span:
+                    response = agent.process_request(message)
+                    trace_id = span.trace_id if span else None
+            else:
+                response = agent.process_request(message)
+        
+        # Consumo do orçamento (tokens, tempo, ferramentas) da requisição
+        task = agent.reasoning_core.get_last_task() if agent is not None else None
         
         return jsonify({
             "success": True,
             "message": message,
             "response": response,
+            "budget": task.get("budget") if task else None,
+            "trace_id": trace_id,
             "timestamp": datetime.now().isoformat(),
             "mode": "simulation" if agent is None else "real"
         })
@@ -131,6 +184,106 @@ def chat_with_agent():
             "error": str(e)
         }), 500
 
+@agent_bp.route('/chat/stream', methods=['POST'])
+def chat_with_agent_stream():
+    """Processa uma mensagem transmitindo tokens, ferramentas e a resposta final (NDJSON)"""
+    try:
+        data = request.get_json()
+        
+        if not data or 'message' not in data:
+            return jsonify({
+                "success": False,
+                "error": "Mensagem é obrigatória"
+            }), 400
+        
+        message = data['message'].strip()
+        if not message:
+            return jsonify({
+                "success": False,
+                "error": "Mensagem não pode estar vazia"
+            }), 400
+        
+        agent = get_agent()
+        
+        if agent is None:
+            return jsonify({
+                "success": False,
+                "error": "Agente não disponível",
+                "mode": "simulation"
+            }), 503
+        
+        events = agent.reasoning_core.process_request_stream(message)
+        
+        def generate():
+            try:
+                for event in events:
+                    yield json.dumps(event, ensure_ascii=False, default=str) + "\n"
+            except Exception as e:
+                yield json.dumps({"event": "error", "error": str(e)}, ensure_ascii=False) + "\n"
+            finally:
+                events.close()
+        
+        return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+    
+    except Exception as e:
+        return jsonify({
+            "success": False,
+            "error": str(e)
+        }), 500
+
+@agent_bp.route('/traces', methods=['GET'])
+def get_recent_traces():
+    """Retorna um resumo dos traces mais recentes"""
+    try:
+        if tracer is None:
+            return jsonify({
+                "success": False,
+                "error": "Rastreamento não disponível"
+            }), 503
+        
+        limit = request.args.get('limit', 20, type=int)
+        return jsonify({
+            "success": True,
+            "traces": tracer.get_recent_traces(limit),
+            "timestamp": datetime.now().isoformat()
+        })
+    
+    except Exception as e:
+        return jsonify({
+            "success": False,
+            "error": str(e)
+        }), 500
+
+@agent_bp.route('/traces/<trace_id>', methods=['GET'])
+def get_trace(trace_id):
+    """Retorna todos os spans de um trace"""
+    try:
+        if tracer is None:
+            return jsonify({
+                "success": False,
+                "error": "Rastreamento não disponível"
+            }), 503
+        
+        spans = tracer.get_trace(trace_id)
+        if not spans:
+            return jsonify({
+                "success": False,
+                "error": f"Trace '{trace_id}' não encontrado"
+            }), 404
+        
+        return jsonify({
+            "success": True,
+            "trace_id": trace_id,
+            "spans": spans,
+            "timestamp": datetime.now().isoformat()
+        })
+    
+    except Exception as e:
+        return jsonify({
+            "success": False,
+            "error": str(e)
+        }), 500
+
 @agent_bp.route('/memory', methods=['GET'])
 def get_memory_summary():
     """Retorna resumo da memória do agente"""
@@ -248,6 +401,7 @@ def execute_tool():
             "result": result.result if result.success else None,
             "error": result.error if not result.success else None,
             "execution_time": result.execution_time,
+            "queue_time": result.queue_time,
             "timestamp": datetime.now().isoformat()
         })
         
@@ -257,6 +411,121 @@ def execute_tool():
             "error": str(e)
         }), 500
 
+@agent_bp.route('/execute/tool/stream', methods=['POST'])
+def execute_tool_stream():
+    """Executa uma ferramenta transmitindo cada parte do resultado assim que é produzida (NDJSON)"""
+    try:
+        data = request.get_json()
+        
+        if not data or 'tool_name' not in data:
+            return jsonify({
+                "success": False,
+                "error": "Nome da ferramenta é obrigatório"
+            }), 400
+        
+        agent = get_agent()
+        
+        if agent is None:
+            return jsonify({
+                "success": False,
+                "error": "Agente não disponível",
+                "mode": "simulation"
+            }), 503
+        
+        events = agent.tool_manager.stream_tool(
+            data['tool_name'],
+            data.get('parameters', {}),
+            max_chunks=data.get('max_chunks')
+        )
+        
+        def generate():
+            # Se o cliente desconectar, o Flask fecha este gerador e a ferramenta é interrompida
+            try:
+                for event in events:
+                    yield json.dumps(event, ensure_ascii=False, default=str) + "\n"
+            except Exception as e:
+                yield json.dumps({"event": "error", "error": str(e)}, ensure_ascii=False) + "\n"
+            finally:
+                events.close()
+        
+        return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+    
+    except Exception as e:
+        return jsonify({
+            "success": False,
+            "error": str(e)
+        }), 500
+
+@agent_bp.route('/execute/plan', methods=['POST'])
+def execute_plan():
+    """Executa um plano de ferramentas com dependências, transmitindo cada nó concluído (NDJSON)"""
+    try:
+        data = request.get_json()
+        
+        if not data or not isinstance(data.get('nodes'), list):
+            return jsonify({
+                "success": False,
+                "error": "Lista de nós do plano é obrigatória"
+            }), 400
+        
+        try:
+            max_workers = _parse_max_workers(data.get('max_workers', 4))
+        except ValueError as e:
+            return jsonify({
+                "success": False,
+                "error": str(e)
+            }), 400
+        
+        agent = get_agent()
+        
+        if agent is None:
+            return jsonify({
+                "success": False,
+                "error": "Agente não disponível",
+                "mode": "simulation"
+            }), 503
+        
+        try:
+            # Validação imediata: um plano inválido não chega a abrir o stream
+            events = agent.tool_manager.execute_plan(
+                data['nodes'],
+                max_workers=max_workers,
+                stop_on_error=data.get('stop_on_error', False)
+            )
+        except PlanValidationError as e:
+            return jsonify({
+                "success": False,
+                "error": f"Plano inválido: {e}"
+            }), 400
+        
+        def generate():
+            try:
+                for event in events:
+                    yield json.dumps(event, ensure_ascii=False, default=str) + "\n"
+            except Exception as e:
+                yield json.dumps({"event": "plan_error", "error": str(e)}, ensure_ascii=False) + "\n"
+        
+        return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+    
+    except Exception as e:
+        return jsonify({
+            "success": False,
+            "error": str(e)
+        }), 500
+
+def _parse_max_workers(value) -> int:
+    """Converte max_workers do corpo da requisição em inteiro positivo, limitado ao teto configurado"""
+    ceiling = settings.plan_max_workers if settings is not None else 16
+    if isinstance(value, bool) or (isinstance(value, float) and not value.is_integer()):
+        raise ValueError("max_workers deve ser um número inteiro")
+    try:
+        max_workers = int(value)
+    except (TypeError, ValueError):
+        raise ValueError("max_workers deve ser um número inteiro")
+    if max_workers < 1:
+        raise ValueError("max_workers deve ser maior que zero")
+    return min(max_workers, ceiling)
+
 @agent_bp.route('/save', methods=['POST'])
 def save_agent_state():
     """Salva o estado do agente"""
@@ -0,0 +1,190 @@
+"""
+Cassete de Gravação/Reprodução - Respostas do LLM e resultados de ferramentas para benchmarks offline
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Dict, Any, Iterator, List, Optional
+
+
+class CassetteMissError(Exception):
+    """Interação não encontrada no cassete durante a reprodução"""
+    pass
+
+
+def interaction_key(kind: str, *parts: Any) -> str:
+    """Chave estável de uma interação (prompt, ferramentas, parâmetros...)"""
+    payload = json.dumps([kind, *parts], sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class Cassette:
+    """Grava interações em um arquivo JSONL (modo "record") ou as serve offline (modo "replay")
+    
+    Cada linha guarda o tipo ("response" para texto do LLM, "tools" para chamadas com
+    ferramentas nativas, "tool" para resultados de ferramentas), o grupo (nome da
+    ferramenta), a chave da interação, a resposta e a duração original. Na reprodução,
+    interações com a mesma chave são servidas na ordem em que foram gravadas; se
+    strict=False e a chave não existir (ex.: o prompt mudou), serve a próxima interação
+    ainda não usada do mesmo tipo e grupo.
+    
+    Chaves exatas são determinísticas mesmo com ações em paralelo (cada chamada de
+    ferramenta tem parâmetros próprios na chave). Já o fallback serve na ordem de
+    chegada, que com ações em paralelo depende do escalonamento das threads: para
+    reproduções determinísticas, use strict=True.
+    
+    A latência sintética de cada interação é fixed + duração gravada * latency_scale;
+    respostas transmitidas são divididas em partes de stream_chunk_chars caracteres,
+    com chunk_latency entre elas.
+    """
+    
+    RECORD = "record"
+    REPLAY = "replay"
+    
+    # Tipos de interação
+    RESPONSE = "response"
+    TOOLS = "tools"
+    TOOL = "tool"
+    
+    def __init__(
+        self,
+        path: str,
+        mode: str = REPLAY,
+        llm_latency: float = 0.0,
+        tool_latency: float = 0.0,
+        latency_scale: float = 0.0,
+        chunk_latency: float = 0.0,
+        stream_chunk_chars: int = 20,
+        strict: bool = False
+    ):
+        if mode not in (self.RECORD, self.REPLAY):
+            raise ValueError(f"Modo de cassete não suportado: {mode}")
+        
+        self.path = path
+        self.mode = mode
+        self.llm_latency = llm_latency
+        self.tool_latency = tool_latency
+        self.latency_scale = latency_scale
+        self.chunk_latency = chunk_latency
+        self.stream_chunk_chars = max(1, stream_chunk_chars)
+        self.strict = strict
+        self._lock = threading.Lock()
+        self.stats = {"recorded": 0, "hits": 0, "fallbacks": 0, "misses": 0}
+        
+        # Reprodução: interações na ordem gravada, índices por chave e as já usadas
+        self._interactions: List[Dict[str, Any]] = []
+        self._by_key: Dict[str, List[int]] = {}
+        self._used: set = set()
+        
+        if mode == self.RECORD:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            # Nova gravação substitui o cassete anterior
+            open(path, "w", encoding="utf-8").close()
+        else:
+            self._load()
+    
+    @property
+    def replaying(self) -> bool:
+        """Indica se o cassete está servindo interações gravadas"""
+        return self.mode == self.REPLAY
+    
+    @property
+    def recording(self) -> bool:
+        """Indica se o cassete está gravando interações"""
+        return self.mode == self.RECORD
+    
+    def _load(self) -> None:
+        """Carrega as interações gravadas"""
+        if not os.path.exists(self.path):
+            raise FileNotFoundError(f"Cassete não encontrado: {self.path}")
+        
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                interaction = json.loads(line)
+                self._by_key.setdefault(interaction["key"], []).append(len(self._interactions))
+                self._interactions.append(interaction)
+    
+    def record(
+        self,
+        interaction_type: str,
+        key: str,
+        response: Any,
+        duration: float,
+        group: Optional[str] = None
+    ) -> None:
+        """Acrescenta uma interação ao cassete"""
+        line = json.dumps(
+            {"type": interaction_type, "group": group, "key": key, "response": response, "duration": duration},
+            ensure_ascii=False,
+            default=str
+        )
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+            self.stats["recorded"] += 1
+    
+    def _take(self, interaction_type: str, key: str, group: Optional[str] = None) -> Dict[str, Any]:
+        """Retira a próxima interação para a chave (ou, sem strict, a próxima do mesmo tipo e grupo)"""
+        with self._lock:
+            for index in self._by_key.get(key, []):
+                if index not in self._used and self._interactions[index]["type"] == interaction_type:
+                    self._used.add(index)
+                    self.stats["hits"] += 1
+                    return self._interactions[index]
+            
+            if not self.strict:
+                for index, interaction in enumerate(self._interactions):
+                    if (
+                        index not in self._used
+                        and interaction["type"] == interaction_type
+                        and interaction.get("group") == group
+                    ):
+                        self._used.add(index)
+                        self.stats["fallbacks"] += 1
+                        return interaction
+            
+            self.stats["misses"] += 1
+        raise CassetteMissError(f"Interação '{interaction_type}' não gravada no cassete {self.path}")
+    
+    def _delay(self, fixed: float, interaction: Dict[str, Any]) -> float:
+        """Latência sintética de uma interação"""
+        return fixed + (interaction.get("duration") or 0.0) * self.latency_scale
+    
+    def replay_llm(self, key: str, interaction_type: str = RESPONSE) -> Any:
+        """Serve uma resposta do LLM gravada ("response" ou "tools"), após a latência sintética"""
+        interaction = self._take(interaction_type, key)
+        time.sleep(self._delay(self.llm_latency, interaction))
+        return interaction["response"]
+    
+    def replay_llm_stream(self, key: str) -> Iterator[str]:
+        """Serve uma resposta de texto gravada em partes, simulando o streaming do provedor"""
+        interaction = self._take(self.RESPONSE, key)
+        time.sleep(self._delay(self.llm_latency, interaction))
+        text = interaction["response"] or ""
+        for start in range(0, len(text), self.stream_chunk_chars):
+            if start and self.chunk_latency:
+                time.sleep(self.chunk_latency)
+            yield text[start:start + self.stream_chunk_chars]
+    
+    def replay_tool(self, key: str, name: Optional[str] = None) -> Dict[str, Any]:
+        """Serve um resultado de ferramenta gravado, após a latência sintética"""
+        interaction = self._take(self.TOOL, key, group=name)
+        time.sleep(self._delay(self.tool_latency, interaction))
+        return interaction["response"]
+    
+    def get_status(self) -> Dict[str, Any]:
+        """Retorna modo, caminho e contadores"""
+        with self._lock:
+            return {
+                "path": self.path,
+                "mode": self.mode,
+                "interactions": len(self._interactions),
+                "unused": len(self._interactions) - len(self._used),
+                **self.stats
+            }
@@ -0,0 +1,246 @@
+"""
+Log Persistente de Execuções - Registro append-only em SQLite para análises de desempenho
+"""
+import os
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import closing
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Union
+
+
+_COLUMNS = (
+    "timestamp", "tool_name", "category", "params_hash", "success",
+    "execution_time", "queue_time", "attempts", "params_bytes", "result_bytes", "error"
+)
+
+_GROUP_COLUMNS = {"tool_name", "category", "success"}
+
+
+def nearest_rank_percentiles(values: List[float], percentiles: tuple = (50, 90, 99)) -> Dict[str, float]:
+    """Percentis exatos (nearest-rank) de uma lista de valores; 0.0 se estiver vazia"""
+    if not values:
+        return {f"p{p}": 0.0 for p in percentiles}
+    ordered = sorted(values)
+    return {
+        f"p{p}": ordered[min(len(ordered) - 1, max(0, int(len(ordered) * p / 100.0 + 0.5) - 1))]
+        for p in percentiles
+    }
+
+
+class ToolExecutionLog:
+    """Log de execuções de ferramentas gravado em lotes por uma thread em segundo plano"""
+    
+    def __init__(
+        self,
+        db_path: str = "./data/tool_executions.db",
+        batch_size: int = 200,
+        flush_interval: float = 1.0,
+        max_queue_size: int = 10000
+    ):
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.dropped_entries = 0
+        self.written_entries = 0
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max_queue_size)
+        self._stop_event = threading.Event()
+        
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._create_schema()
+        
+        self._writer = threading.Thread(target=self._writer_loop, name="tool-execution-log", daemon=True)
+        self._writer.start()
+    
+    def _connect(self) -> sqlite3.Connection:
+        """Abre uma conexão (cada thread usa a sua)"""
+        connection = sqlite3.connect(self.db_path, timeout=30)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        return connection
+    
+    def _create_schema(self) -> None:
+        """Cria a tabela e os índices se ainda não existirem"""
+        with closing(self._connect()) as connection, connection:
+            connection.execute("""
+                CREATE TABLE IF NOT EXISTS tool_executions (
+                    timestamp REAL NOT NULL,
+                    tool_name TEXT NOT NULL,
+                    category TEXT,
+                    params_hash TEXT,
+                    success INTEGER NOT NULL,
+                    execution_time REAL NOT NULL,
+                    queue_time REAL DEFAULT 0,
+                    attempts INTEGER DEFAULT 1,
+                    params_bytes INTEGER DEFAULT 0,
+                    result_bytes INTEGER DEFAULT 0,
+                    error TEXT
+                )
+            """)
+            connection.execute("CREATE INDEX IF NOT EXISTS idx_tool_executions_ts ON tool_executions (timestamp)")
+            connection.execute("CREATE INDEX IF NOT EXISTS idx_tool_executions_tool ON tool_executions (tool_name, timestamp)")
+    
+    def log(self, entry: Dict[str, Any]) -> None:
+        """Enfileira uma execução; nunca bloqueia quem executa a ferramenta"""
+        row = tuple(entry.get(column) for column in _COLUMNS)
+        try:
+            self._queue.put_nowait(row)
+        except queue.Full:
+            self.dropped_entries += 1
+    
+    def _writer_loop(self) -> None:
+        """Consome a fila e grava em lotes"""
+        connection = self._connect()
+        try:
+            while not (self._stop_event.is_set() and self._queue.empty()):
+                batch = []
+                deadline = time.monotonic() + self.flush_interval
+                while len(batch) < self.batch_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    try:
+                        batch.append(self._queue.get(timeout=remaining))
+                    except queue.Empty:
+                        break
+                
+                if batch:
+                    self._write_batch(connection, batch)
+        finally:
+            connection.close()
+    
+    def _write_batch(self, connection: sqlite3.Connection, batch: List[tuple]) -> None:
+        """Grava um lote em uma única transação"""
+        placeholders = ", ".join("?" for _ in _COLUMNS)
+        try:
+            with connection:
+                connection.executemany(
+                    f"INSERT INTO tool_executions ({', '.join(_COLUMNS)}) VALUES ({placeholders})",
+                    batch
+                )
+            self.written_entries += len(batch)
+        except sqlite3.Error as e:
+            self.dropped_entries += len(batch)
+            print(f"Erro ao gravar log de execuções: {e}")
+    
+    def close(self, timeout: float = 5.0) -> None:
+        """Grava o que estiver pendente e encerra a thread de escrita"""
+        self._stop_event.set()
+        self._writer.join(timeout)
+    
+    @staticmethod
+    def _to_epoch(value: Union[None, float, datetime]) -> Optional[float]:
+        """Converte datetime em timestamp (epoch)"""
+        if isinstance(value, datetime):
+            return value.timestamp()
+        return value
+    
+    def _where(self, since, until, tool_name: Optional[str], category: Optional[str]) -> tuple:
+        """Monta a cláusula WHERE comum às consultas"""
+        clauses = []
+        params: List[Any] = []
+        for clause, value in (
+            ("timestamp >= ?", self._to_epoch(since)),
+            ("timestamp < ?", self._to_epoch(until)),
+            ("tool_name = ?", tool_name),
+            ("category = ?", category)
+        ):
+            if value is not None:
+                clauses.append(clause)
+                params.append(value)
+        return (" WHERE " + " AND ".join(clauses) if clauses else ""), params
+    
+    def query(
+        self,
+        since: Union[None, float, datetime] = None,
+        until: Union[None, float, datetime] = None,
+        tool_name: Optional[str] = None,
+        category: Optional[str] = None,
+        limit: int = 100
+    ) -> List[Dict[str, Any]]:
+        """Retorna as execuções mais recentes que atendem aos filtros"""
+        where, params = self._where(since, until, tool_name, category)
+        with closing(self._connect()) as connection:
+            rows = connection.execute(
+                f"SELECT {', '.join(_COLUMNS)} FROM tool_executions{where} ORDER BY timestamp DESC LIMIT ?",
+                params + [limit]
+            ).fetchall()
+        return [dict(zip(_COLUMNS, row)) for row in rows]
+    
+    def aggregate(
+        self,
+        since: Union[None, float, datetime] = None,
+        until: Union[None, float, datetime] = None,
+        group_by: str = "tool_name",
+        bucket_seconds: Optional[int] = None,
+        tool_name: Optional[str] = None,
+        category: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """Agrega execuções por ferramenta/categoria e, opcionalmente, por janela de tempo"""
+        if group_by not in _GROUP_COLUMNS:
+            raise ValueError(f"Agrupamento não suportado: {group_by}")
+        
+        where, params = self._where(since, until, tool_name, category)
+        group_columns = [group_by]
+        select_columns = [group_by]
+        if bucket_seconds:
+            select_columns.insert(0, f"CAST(timestamp / {int(bucket_seconds)} AS INTEGER) * {int(bucket_seconds)} AS bucket")
+            group_columns.insert(0, "bucket")
+        
+        sql = f"""
+            SELECT {', '.join(select_columns)},
+                   COUNT(*), SUM(success), AVG(execution_time), MAX(execution_time),
+                   AVG(queue_time), SUM(params_bytes), SUM(result_bytes)
+            FROM tool_executions{where}
+            GROUP BY {', '.join(group_columns)}
+            ORDER BY {', '.join(group_columns)}
+        """
+        with closing(self._connect()) as connection:
+            rows = connection.execute(sql, params).fetchall()
+        
+        results = []
+        for row in rows:
+            offset = 2 if bucket_seconds else 1
+            count, successes, avg_time, max_time, avg_queue, params_bytes, result_bytes = row[offset:]
+            item = {
+                group_by: row[offset - 1],
+                "count": count,
+                "success_rate": (successes or 0) / count if count else 0.0,
+                "avg_execution_time": avg_time or 0.0,
+                "max_execution_time": max_time or 0.0,
+                "avg_queue_time": avg_queue or 0.0,
+                "params_bytes": params_bytes or 0,
+                "result_bytes": result_bytes or 0
+            }
+            if bucket_seconds:
+                item["bucket_start"] = datetime.fromtimestamp(row[0]).isoformat()
+            results.append(item)
+        return results
+    
+    def percentiles(
+        self,
+        tool_name: str,
+        since: Union[None, float, datetime] = None,
+        until: Union[None, float, datetime] = None,
+        percentiles: tuple = (50, 90, 99)
+    ) -> Dict[str, float]:
+        """Calcula percentis exatos de latência de uma ferramenta em uma janela"""
+        where, params = self._where(since, until, tool_name, None)
+        with closing(self._connect()) as connection:
+            values = [row[0] for row in connection.execute(
+                f"SELECT execution_time FROM tool_executions{where} ORDER BY execution_time", params
+            )]
+        return nearest_rank_percentiles(values, percentiles)
+    
+    def get_status(self) -> Dict[str, Any]:
+        """Retorna o estado do log"""
+        return {
+            "db_path": self.db_path,
+            "pending_entries": self._queue.qsize(),
+            "written_entries": self.written_entries,
+            "dropped_entries": self.dropped_entries
+        }
@@ -9,7 +9,7 @@ import zipfile
 import tarfile
 import hashlib
 import mimetypes
-from typing import Dict, Any, List, Optional, Union
+from typing import Dict, Any, List, Optional, Union, Iterator
 from datetime import datetime
 from pathlib import Path
 import subprocess
@@ -18,6 +18,17 @@ import subprocess
 class FileManagerModule:
     """Módulo avançado para gerenciamento de arquivos e sistema"""
     
+    # Ferramentas que só leem arquivos: podem ser executadas especulativamente
+    READ_ONLY_TOOLS = frozenset({
+        "search_in_files", "search_in_files_stream", "calculate_file_hash",
+        "get_file_metadata", "get_operation_history"
+    })
+    
+    # Ferramentas que seguram o GIL: rodam no pool de processos quando ele está ativo
+    CPU_BOUND_TOOLS = frozenset({
+        "search_in_files", "calculate_file_hash", "create_archive", "extract_archive"
+    })
+    
     def __init__(self, base_directory: str = "/tmp/agent_workspace"):
         self.base_directory = Path(base_directory)
         self.base_directory.mkdir(parents=True, exist_ok=True)
@@ -206,6 +217,25 @@ class FileManagerModule:
         max_results: int = 100
     ) -> Dict[str, Any]:
         """Busca por padrão em arquivos"""
+        stream = self.search_in_files_stream(search_pattern, directory, file_extensions, case_sensitive, max_results)
+        while True:
+            try:
+                next(stream)
+            except StopIteration as stop:
+                return stop.value
+    
+    def search_in_files_stream(
+        self,
+        search_pattern: str,
+        directory: str = ".",
+        file_extensions: Optional[List[str]] = None,
+        case_sensitive: bool = False,
+        max_results: int = 100
+    ) -> Iterator[Dict[str, Any]]:
+        """Busca por padrão em arquivos produzindo cada ocorrência assim que é encontrada
+        
+        Retorna (valor do gerador) o mesmo resumo de search_in_files.
+        """
         try:
             search_dir = self._resolve_path(directory)
             
@@ -234,25 +264,26 @@ class FileManagerModule:
                         continue
                     
                     try:
+                        # Ler linha a linha: ocorrências saem antes do fim do arquivo
                         with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                            lines = f.readlines()
-                        
-                        files_searched += 1
-                        
-                        # Buscar em cada linha
-                        for line_num, line in enumerate(lines, 1):
-                            search_line = line if case_sensitive else line.lower()
+                            files_searched += 1
                             
-                            if pattern in search_line:
-                                results.append({
-                                    "file_path": str(file_path),
-                                    "line_number": line_num,
-                                    "line_content": line.strip(),
-                                    "match_position": search_line.find(pattern)
-                                })
+                            # Buscar em cada linha
+                            for line_num, line in enumerate(f, 1):
+                                search_line = line if case_sensitive else line.lower()
                                 
-                                if len(results) >= max_results:
-                                    break
+                                if pattern in search_line:
+                                    match = {
+                                        "file_path": str(file_path),
+                                        "line_number": line_num,
+                                        "line_content": line.strip(),
+                                        "match_position": search_line.find(pattern)
+                                    }
+                                    results.append(match)
+                                    yield match
+                                    
+                                    if len(results) >= max_results:
+                                        break
                         
                         if len(results) >= max_results:
                             break
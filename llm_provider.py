@@ -1,12 +1,20 @@
 """
 Provedor de LLM que suporta OpenAI e Gemini
 """
+import json
 import os
 import sys
+import time
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Iterator, List, Union
 from config.settings import settings
+from .tracing import tracer
+from .cassette import Cassette, interaction_key
+
+
+# Início das respostas de chamadas que falharam (ex.: timeout, erro da API)
+LLM_ERROR_PREFIX = "[ERRO]"
 
 
 class LLMProvider:
@@ -15,8 +23,33 @@ class LLMProvider:
     def __init__(self):
         self.provider = settings.llm_provider
         self.client = None
+        self.cassette: Optional[Cassette] = None
         self._initialize_client()
     
+    @property
+    def available(self) -> bool:
+        """Indica se há respostas reais (cliente ou cassete em reprodução) em vez de simulação"""
+        return self.client is not None or self._replaying()
+    
+    def use_cassette(self, cassette: Optional[Cassette]) -> None:
+        """Grava as respostas em um cassete ou as serve a partir dele (None desativa)"""
+        self.cassette = cassette
+    
+    def _replaying(self) -> bool:
+        """Indica se as respostas vêm do cassete"""
+        return self.cassette is not None and self.cassette.replaying
+    
+    def _cassette_key(self, kind: str, *parts: Any) -> Optional[str]:
+        """Chave da interação no cassete; sem cassete o prompt não é serializado nem hasheado"""
+        if self.cassette is None:
+            return None
+        return interaction_key(kind, *parts)
+    
+    def _record(self, interaction_type: str, key: Optional[str], response: Any, start: float) -> None:
+        """Grava a resposta no cassete, se estiver gravando"""
+        if self.cassette is not None and self.cassette.recording:
+            self.cassette.record(interaction_type, key, response, time.perf_counter() - start)
+    
     def _initialize_client(self):
         """Inicializa o cliente baseado no provedor configurado"""
         try:
@@ -62,19 +95,54 @@ class LLMProvider:
         except ImportError:
             raise ImportError("Biblioteca openai não encontrada. Instale com: pip install openai")
     
-    def generate_response(self, prompt: str, **kwargs) -> str:
-        """Gera uma resposta usando o provedor configurado"""
-        if not self.client:
+    def _timeout_options(self, kwargs: Dict[str, Any]) -> Dict[str, Any]:
+        """Limite de tempo da chamada (kwargs["timeout"], em segundos) no formato do provedor"""
+        timeout = kwargs.get("timeout")
+        if not timeout:
+            return {}
+        if self.provider == "gemini":
+            return {"request_options": {"timeout": timeout}}
+        return {"timeout": timeout}
+    
+    def generate_response(self, prompt: Union[str, List[str]], **kwargs) -> str:
+        """Gera uma resposta usando o provedor configurado
+        
+        O prompt pode vir como lista de segmentos; a junção acontece uma única vez, aqui.
+        """
+        if not isinstance(prompt, str):
+            prompt = "".join(prompt)
+        
+        if not self.available:
             return f"[SIMULAÇÃO - {self.provider.upper()}] Resposta para: {prompt[:100]}..."
         
-        try:
-            if self.provider == "gemini":
-                return self._generate_gemini_response(prompt, **kwargs)
-            elif self.provider == "openai":
-                return self._generate_openai_response(prompt, **kwargs)
-        except Exception as e:
-            print(f"Erro ao gerar resposta: {e}")
-            return f"[ERRO] Não foi possível gerar resposta: {e}"
+        with tracer.span(
+            "llm.generate_response",
+            provider=self.provider,
+            model=settings.get_current_model(),
+            prompt_chars=len(prompt),
+            replay=self._replaying()
+        ) as span:
+            try:
+                key = self._cassette_key("response", prompt)
+                start = time.perf_counter()
+                if self._replaying():
+                    response = self.cassette.replay_llm(key, Cassette.RESPONSE)
+                elif self.provider == "gemini":
+                    response = self._generate_gemini_response(prompt, **kwargs)
+                elif self.provider == "openai":
+                    response = self._generate_openai_response(prompt, **kwargs)
+                else:
+                    response = None
+                self._record(Cassette.RESPONSE, key, response, start)
+                if span:
+                    span.set_attribute("response_chars", len(response or ""))
+                return response
+            except Exception as e:
+                if span:
+                    span.status = "error"
+                    span.error = str(e)
+                print(f"Erro ao gerar resposta: {e}")
+                return f"{LLM_ERROR_PREFIX} Não foi possível gerar resposta: {e}"
     
     def _generate_gemini_response(self, prompt: str, **kwargs) -> str:
         """Gera resposta usando Gemini"""
@@ -84,7 +152,8 @@ class LLMProvider:
                 generation_config={
                     "temperature": kwargs.get("temperature", settings.temperature),
                     "max_output_tokens": kwargs.get("max_tokens", settings.max_tokens),
-                }
+                },
+                **self._timeout_options(kwargs)
             )
             return response.text
         except Exception as e:
@@ -97,12 +166,251 @@ class LLMProvider:
                 model=settings.get_current_model(),
                 messages=[{"role": "user", "content": prompt}],
                 temperature=kwargs.get("temperature", settings.temperature),
-                max_tokens=kwargs.get("max_tokens", settings.max_tokens)
+                max_tokens=kwargs.get("max_tokens", settings.max_tokens),
+                **self._timeout_options(kwargs)
             )
             return response.choices[0].message.content
         except Exception as e:
             raise Exception(f"Erro na API do OpenAI: {e}")
     
+    def generate_response_stream(self, prompt: Union[str, List[str]], **kwargs) -> Iterator[str]:
+        """Gera uma resposta produzindo os trechos de texto à medida que chegam do provedor
+        
+        A concatenação dos trechos equivale ao retorno de generate_response.
+        """
+        if not isinstance(prompt, str):
+            prompt = "".join(prompt)
+        
+        if not self.available:
+            yield f"[SIMULAÇÃO - {self.provider.upper()}] Resposta para: {prompt[:100]}..."
+            return
+        
+        with tracer.span(
+            "llm.generate_response_stream",
+            provider=self.provider,
+            model=settings.get_current_model(),
+            prompt_chars=len(prompt),
+            replay=self._replaying()
+        ) as span:
+            response_chars = 0
+            chunks = 0
+            try:
+                key = self._cassette_key("response", prompt)
+                start = time.perf_counter()
+                if self._replaying():
+                    stream = self.cassette.replay_llm_stream(key)
+                elif self.provider == "gemini":
+                    stream = self._stream_gemini_response(prompt, **kwargs)
+                elif self.provider == "openai":
+                    stream = self._stream_openai_response(prompt, **kwargs)
+                else:
+                    raise ValueError(f"Provedor LLM não suportado: {self.provider}")
+                parts = []
+                for text in stream:
+                    response_chars += len(text)
+                    chunks += 1
+                    parts.append(text)
+                    yield text
+                self._record(Cassette.RESPONSE, key, "".join(parts), start)
+            except Exception as e:
+                if span:
+                    span.status = "error"
+                    span.error = str(e)
+                print(f"Erro ao gerar resposta: {e}")
+                yield f"{LLM_ERROR_PREFIX} Não foi possível gerar resposta: {e}"
+            finally:
+                if span:
+                    span.set_attributes(response_chars=response_chars, chunks=chunks)
+    
+    def _stream_gemini_response(self, prompt: str, **kwargs) -> Iterator[str]:
+        """Transmite a resposta do Gemini"""
+        try:
+            response = self.client.generate_content(
+                prompt,
+                generation_config={
+                    "temperature": kwargs.get("temperature", settings.temperature),
+                    "max_output_tokens": kwargs.get("max_tokens", settings.max_tokens),
+                },
+                stream=True,
+                **self._timeout_options(kwargs)
+            )
+            for chunk in response:
+                # Partes sem texto (ex.: metadados de segurança) não levantam erro aqui
+                text = "".join(part.text for part in chunk.parts if getattr(part, "text", None))
+                if text:
+                    yield text
+        except Exception as e:
+            raise Exception(f"Erro na API do Gemini: {e}")
+    
+    def _stream_openai_response(self, prompt: str, **kwargs) -> Iterator[str]:
+        """Transmite a resposta do OpenAI"""
+        try:
+            stream = self.client.chat.completions.create(
+                model=settings.get_current_model(),
+                messages=[{"role": "user", "content": prompt}],
+                temperature=kwargs.get("temperature", settings.temperature),
+                max_tokens=kwargs.get("max_tokens", settings.max_tokens),
+                stream=True,
+                **self._timeout_options(kwargs)
+            )
+            for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+        except Exception as e:
+            raise Exception(f"Erro na API do OpenAI: {e}")
+    
+    def generate_with_tools(
+        self,
+        prompt: Union[str, List[str]],
+        tools: List[Dict[str, Any]],
+        **kwargs
+    ) -> Dict[str, Any]:
+        """Gera uma resposta com chamada nativa de funções
+        
+        tools segue o formato OpenAI (ToolManager.get_tool_definitions). Retorna
+        {"content": texto, "tool_calls": [{"id", "name", "arguments"}]} e, em caso de falha,
+        também "error" (quem chama pode recorrer ao modo texto).
+        """
+        if not isinstance(prompt, str):
+            prompt = "".join(prompt)
+        
+        if not self.available:
+            return {
+                "content": f"[SIMULAÇÃO - {self.provider.upper()}] Resposta para: {prompt[:100]}...",
+                "tool_calls": []
+            }
+        
+        with tracer.span(
+            "llm.generate_with_tools",
+            provider=self.provider,
+            model=settings.get_current_model(),
+            prompt_chars=len(prompt),
+            tools=len(tools),
+            replay=self._replaying()
+        ) as span:
+            try:
+                key = self._cassette_key("tools", prompt, tools)
+                start = time.perf_counter()
+                if self._replaying():
+                    response = self.cassette.replay_llm(key, Cassette.TOOLS)
+                elif self.provider == "gemini":
+                    response = self._generate_gemini_tool_response(prompt, tools, **kwargs)
+                elif self.provider == "openai":
+                    response = self._generate_openai_tool_response(prompt, tools, **kwargs)
+                else:
+                    raise ValueError(f"Provedor LLM não suportado: {self.provider}")
+                self._record(Cassette.TOOLS, key, response, start)
+                if span:
+                    span.set_attributes(
+                        response_chars=len(response["content"] or ""),
+                        tool_calls=len(response["tool_calls"])
+                    )
+                return response
+            except Exception as e:
+                if span:
+                    span.status = "error"
+                    span.error = str(e)
+                print(f"Erro ao gerar resposta com ferramentas: {e}")
+                return {
+                    "content": f"{LLM_ERROR_PREFIX} Não foi possível gerar resposta: {e}",
+                    "tool_calls": [],
+                    "error": str(e)
+                }
+    
+    def _generate_openai_tool_response(self, prompt: str, tools: List[Dict[str, Any]], **kwargs) -> Dict[str, Any]:
+        """Gera resposta com function calling do OpenAI"""
+        try:
+            response = self.client.chat.completions.create(
+                model=settings.get_current_model(),
+                messages=[{"role": "user", "content": prompt}],
+                tools=tools or None,
+                temperature=kwargs.get("temperature", settings.temperature),
+                max_tokens=kwargs.get("max_tokens", settings.max_tokens),
+                **self._timeout_options(kwargs)
+            )
+        except Exception as e:
+            raise Exception(f"Erro na API do OpenAI: {e}")
+        
+        message = response.choices[0].message
+        tool_calls = []
+        for call in message.tool_calls or []:
+            try:
+                arguments = json.loads(call.function.arguments or "{}")
+            except json.JSONDecodeError:
+                arguments = {}
+            tool_calls.append({"id": call.id, "name": call.function.name, "arguments": arguments})
+        
+        return {"content": message.content or "", "tool_calls": tool_calls}
+    
+    def _generate_gemini_tool_response(self, prompt: str, tools: List[Dict[str, Any]], **kwargs) -> Dict[str, Any]:
+        """Gera resposta com function calling do Gemini"""
+        declarations = []
+        for tool in tools:
+            func_info = tool.get("function", tool)
+            declaration = {"name": func_info["name"], "description": func_info.get("description", "")}
+            parameters = self._to_gemini_schema(func_info.get("parameters") or {})
+            # Gemini rejeita objetos sem propriedades
+            if parameters.get("properties"):
+                declaration["parameters"] = parameters
+            declarations.append(declaration)
+        
+        try:
+            response = self.client.generate_content(
+                prompt,
+                tools=[{"function_declarations": declarations}] if declarations else None,
+                generation_config={
+                    "temperature": kwargs.get("temperature", settings.temperature),
+                    "max_output_tokens": kwargs.get("max_tokens", settings.max_tokens),
+                },
+                **self._timeout_options(kwargs)
+            )
+        except Exception as e:
+            raise Exception(f"Erro na API do Gemini: {e}")
+        
+        content_parts = []
+        tool_calls = []
+        for candidate in response.candidates[:1]:
+            for part in candidate.content.parts:
+                function_call = getattr(part, "function_call", None)
+                if function_call and function_call.name:
+                    tool_calls.append({
+                        "id": f"call_{len(tool_calls) + 1}",
+                        "name": function_call.name,
+                        "arguments": self._proto_to_python(function_call.args) or {}
+                    })
+                elif getattr(part, "text", None):
+                    content_parts.append(part.text)
+        
+        return {"content": "".join(content_parts), "tool_calls": tool_calls}
+    
+    def _to_gemini_schema(self, schema: Dict[str, Any]) -> Dict[str, Any]:
+        """Converte um JSON Schema para o subconjunto OpenAPI aceito pelo Gemini"""
+        converted = {}
+        for key in ("description", "enum", "nullable", "format", "required"):
+            if key in schema:
+                converted[key] = schema[key]
+        if "type" in schema:
+            converted["type"] = str(schema["type"]).upper()
+        if "properties" in schema:
+            converted["properties"] = {
+                name: self._to_gemini_schema(value) for name, value in schema["properties"].items()
+            }
+        if "items" in schema:
+            converted["items"] = self._to_gemini_schema(schema["items"])
+        elif converted.get("type") == "ARRAY":
+            converted["items"] = {"type": "STRING"}
+        return converted
+    
+    def _proto_to_python(self, value: Any) -> Any:
+        """Converte os tipos de mapa/lista do protobuf do Gemini em dict/list"""
+        if hasattr(value, "items") and callable(value.items):
+            return {key: self._proto_to_python(item) for key, item in value.items()}
+        if isinstance(value, (str, bytes)):
+            return value
+        if hasattr(value, "__iter__"):
+            return [self._proto_to_python(item) for item in value]
+        return value
+    
     def generate_structured_response(self, prompt: str, schema: Dict[str, Any], **kwargs) -> Dict[str, Any]:
         """Gera uma resposta estruturada (JSON)"""
         if not self.client:
@@ -3,6 +3,7 @@ Sistema de Memória do Agente
 """
 import json
 import os
+import threading
 from typing import List, Dict, Any, Optional
 from datetime import datetime
 from pydantic import BaseModel
@@ -24,6 +25,8 @@ class Memory:
         self.short_term_memory: List[MemoryEntry] = []
         self.long_term_memory: List[MemoryEntry] = []
         self.max_short_term_entries = 50
+        # Requisições simultâneas escrevem na mesma memória
+        self._lock = threading.RLock()
         
         # Criar diretório se não existir
         os.makedirs(persist_path, exist_ok=True)
@@ -43,18 +46,20 @@ class Memory:
             metadata=metadata
         )
         
-        # Adicionar à memória de curto prazo
-        self.short_term_memory.append(entry)
-        
-        # Limitar tamanho da memória de curto prazo
-        if len(self.short_term_memory) > self.max_short_term_entries:
-            # Mover entradas antigas para memória de longo prazo
-            old_entry = self.short_term_memory.pop(0)
-            self.long_term_memory.append(old_entry)
+        with self._lock:
+            # Adicionar à memória de curto prazo
+            self.short_term_memory.append(entry)
+            
+            # Limitar tamanho da memória de curto prazo
+            if len(self.short_term_memory) > self.max_short_term_entries:
+                # Mover entradas antigas para memória de longo prazo
+                old_entry = self.short_term_memory.pop(0)
+                self.long_term_memory.append(old_entry)
     
     def get_recent_entries(self, count: int = 10, entry_type: Optional[str] = None) -> List[MemoryEntry]:
         """Recupera entradas recentes da memória"""
-        entries = self.short_term_memory.copy()
+        with self._lock:
+            entries = self.short_term_memory.copy()
         
         if entry_type:
             entries = [e for e in entries if e.type == entry_type]
@@ -63,7 +68,8 @@ class Memory:
     
     def search_memory(self, query: str, entry_type: Optional[str] = None) -> List[MemoryEntry]:
         """Busca na memória por conteúdo relevante"""
-        all_entries = self.short_term_memory + self.long_term_memory
+        with self._lock:
+            all_entries = self.short_term_memory + self.long_term_memory
         
         if entry_type:
             all_entries = [e for e in all_entries if e.type == entry_type]
@@ -95,8 +101,9 @@ class Memory:
     def clear_short_term_memory(self) -> None:
         """Limpa a memória de curto prazo"""
         # Mover tudo para memória de longo prazo antes de limpar
-        self.long_term_memory.extend(self.short_term_memory)
-        self.short_term_memory.clear()
+        with self._lock:
+            self.long_term_memory.extend(self.short_term_memory)
+            self.short_term_memory.clear()
     
     def save_long_term_memory(self) -> None:
         """Salva a memória de longo prazo em arquivo"""
@@ -104,7 +111,9 @@ class Memory:
         
         # Converter para formato serializável
         memory_data = []
-        for entry in self.long_term_memory:
+        with self._lock:
+            long_term_memory = list(self.long_term_memory)
+        for entry in long_term_memory:
             memory_data.append({
                 "timestamp": entry.timestamp.isoformat(),
                 "type": entry.type,
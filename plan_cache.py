@@ -0,0 +1,277 @@
+"""
+Cache de Planos - Reaproveita sequências de ferramentas de requisições estruturalmente iguais
+"""
+import re
+import threading
+import unicodedata
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Tuple
+
+
+# Palavras ignoradas na comparação aproximada de requisições
+_STOPWORDS = {
+    "a", "o", "as", "os", "um", "uma", "de", "do", "da", "dos", "das", "e", "em", "no", "na",
+    "nos", "nas", "por", "para", "com", "que", "me", "se", "eu", "meu", "minha", "favor",
+    "the", "an", "of", "and", "to", "in", "on", "for", "with", "please", "me", "my"
+}
+
+# Negações: requisições que diferem só nelas têm sentido oposto e nunca casam por similaridade
+_NEGATIONS = {"nao", "nunca", "jamais", "nem", "sem", "not", "never", "don't", "dont", "without"}
+
+_STRIP_CHARS = ".,;:!?\"'()[]{}<>"
+
+# Marcador de parâmetro substituível nos passos guardados
+_SLOT_PATTERN = re.compile(r"\{\{slot:(\d+)\}\}")
+
+# Referência ao resultado de outro passo (${passo} ou ${passo.campo})
+_REFERENCE_PATTERN = re.compile(r"\$\{[^}]+\}")
+
+
+def _normalize_token(token: str) -> str:
+    """Minúsculas e sem acentos"""
+    decomposed = unicodedata.normalize("NFKD", token.lower())
+    return "".join(char for char in decomposed if not unicodedata.combining(char))
+
+
+def tokenize(text: str) -> Tuple[List[str], List[str]]:
+    """Retorna (tokens originais, tokens normalizados), sem pontuação nas bordas"""
+    original = [token.strip(_STRIP_CHARS) for token in text.split()]
+    original = [token for token in original if token]
+    return original, [_normalize_token(token) for token in original]
+
+
+class PlanCache:
+    """Cache de planos por intenção normalizada da requisição
+    
+    Trechos da requisição que aparecem nos parâmetros das ferramentas viram "slots":
+    a requisição é guardada como modelo (ex.: "pesquise <slot> e resuma") e os parâmetros
+    como "{{slot:0}}". Uma nova requisição que se encaixa no modelo reaproveita os passos
+    com os novos valores. Modelos sem slots também casam por similaridade de palavras.
+    
+    Só são guardados planos cujos textos nos parâmetros vêm da requisição (slots ou
+    palavras dela) ou de outro passo (${ref}): um valor literal pode ter sido copiado
+    de um resultado anterior (ex.: a URL escolhida na busca) e seria reaproveitado obsoleto.
+    """
+    
+    def __init__(self, max_entries: int = 200, similarity_threshold: float = 0.8):
+        self.max_entries = max_entries
+        self.similarity_threshold = similarity_threshold
+        self.entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+    
+    def _find_slots(self, original: List[str], normalized: List[str], steps: List[Dict[str, Any]]) -> List[Tuple[int, int]]:
+        """Encontra trechos contíguos da requisição usados literalmente nos parâmetros"""
+        values = []
+        
+        def collect(value: Any) -> None:
+            if isinstance(value, str):
+                values.append(_normalize_token(value))
+            elif isinstance(value, dict):
+                for item in value.values():
+                    collect(item)
+            elif isinstance(value, list):
+                for item in value:
+                    collect(item)
+        
+        for step in steps:
+            collect(step.get("parameters", {}))
+        
+        slots: List[Tuple[int, int]] = []
+        used = [False] * len(normalized)
+        # Trechos mais longos primeiro
+        for length in range(len(normalized), 0, -1):
+            for start in range(0, len(normalized) - length + 1):
+                end = start + length
+                if any(used[start:end]):
+                    continue
+                if length == 1 and normalized[start] in _STOPWORDS:
+                    continue
+                phrase = " ".join(normalized[start:end])
+                if any(self._contains_phrase(value, phrase) for value in values):
+                    slots.append((start, end))
+                    for index in range(start, end):
+                        used[index] = True
+        return sorted(slots)
+    
+    @staticmethod
+    def _contains_phrase(value: str, phrase: str) -> bool:
+        """Verifica se a frase aparece no valor respeitando limites de palavra"""
+        return re.search(rf"(?<!\w){re.escape(phrase)}(?!\w)", value) is not None
+    
+    def _substitute_slots(self, value: Any, slot_texts: List[Tuple[str, str]]) -> Any:
+        """Troca os trechos da requisição original pelos marcadores {{slot:N}}"""
+        if isinstance(value, str):
+            for index, (original_text, normalized_text) in enumerate(slot_texts):
+                if value == original_text or _normalize_token(value) == normalized_text:
+                    return f"{{{{slot:{index}}}}}"
+                # Trecho dentro de um valor maior: substituir sem diferenciar maiúsculas
+                value = re.sub(rf"(?i)(?<!\w){re.escape(original_text)}(?!\w)", f"{{{{slot:{index}}}}}", value)
+            return value
+        if isinstance(value, dict):
+            return {key: self._substitute_slots(item, slot_texts) for key, item in value.items()}
+        if isinstance(value, list):
+            return [self._substitute_slots(item, slot_texts) for item in value]
+        return value
+    
+    def _fill_slots(self, value: Any, slot_values: List[str]) -> Any:
+        """Preenche os marcadores {{slot:N}} com os valores da nova requisição"""
+        if isinstance(value, str):
+            return _SLOT_PATTERN.sub(lambda match: slot_values[int(match.group(1))], value)
+        if isinstance(value, dict):
+            return {key: self._fill_slots(item, slot_values) for key, item in value.items()}
+        if isinstance(value, list):
+            return [self._fill_slots(item, slot_values) for item in value]
+        return value
+    
+    @classmethod
+    def _has_literal_text(cls, value: Any, request_words: set) -> bool:
+        """Verifica se algum texto do parâmetro, fora dos slots e referências ${...}, não vem da requisição"""
+        if isinstance(value, str):
+            remainder = _REFERENCE_PATTERN.sub(" ", _SLOT_PATTERN.sub(" ", value))
+            return any(_normalize_token(word) not in request_words for word in re.findall(r"\w+", remainder))
+        if isinstance(value, dict):
+            return any(cls._has_literal_text(item, request_words) for item in value.values())
+        if isinstance(value, list):
+            return any(cls._has_literal_text(item, request_words) for item in value)
+        return False
+    
+    def store(self, request: str, steps: List[Dict[str, Any]]) -> Optional[str]:
+        """Guarda os passos bem-sucedidos de uma requisição; retorna a chave do modelo
+        
+        Retorna None (sem guardar) se algum parâmetro tiver texto literal.
+        """
+        original, normalized = tokenize(request)
+        if not normalized or not steps:
+            return None
+        
+        slots = self._find_slots(original, normalized, steps)
+        template: List[Optional[str]] = []
+        slot_texts = []
+        position = 0
+        for start, end in slots:
+            template.extend(normalized[position:start])
+            template.append(None)
+            slot_texts.append((" ".join(original[start:end]), " ".join(normalized[start:end])))
+            position = end
+        template.extend(normalized[position:])
+        
+        # Modelo só com slots casaria com qualquer requisição
+        content_words = {token for token in template if token and token not in _STOPWORDS}
+        if not content_words:
+            return None
+        
+        stored_steps = [
+            dict(step, parameters=self._substitute_slots(step.get("parameters", {}), slot_texts))
+            for step in steps
+        ]
+        request_words = {word for token in normalized for word in re.findall(r"\w+", token)}
+        if any(self._has_literal_text(step["parameters"], request_words) for step in stored_steps):
+            return None
+        
+        key = " ".join(token if token is not None else "<slot>" for token in template)
+        entry = {
+            "key": key,
+            "template": template,
+            "content_words": content_words,
+            "negations": content_words & _NEGATIONS,
+            "steps": stored_steps,
+            "created_at": datetime.now().isoformat(),
+            "hits": 0
+        }
+        
+        with self._lock:
+            self.entries[key] = entry
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        return key
+    
+    def _match_template(self, template: List[Optional[str]], original: List[str], normalized: List[str]) -> Optional[List[str]]:
+        """Casa a requisição com o modelo; cada slot consome um ou mais tokens"""
+        def match(template_index: int, token_index: int) -> Optional[List[str]]:
+            if template_index == len(template):
+                return [] if token_index == len(normalized) else None
+            expected = template[template_index]
+            if expected is not None:
+                if token_index < len(normalized) and normalized[token_index] == expected:
+                    return match(template_index + 1, token_index + 1)
+                return None
+            for end in range(token_index + 1, len(normalized) + 1):
+                rest = match(template_index + 1, end)
+                if rest is not None:
+                    return [" ".join(original[token_index:end])] + rest
+            return None
+        
+        return match(0, 0)
+    
+    def lookup(self, request: str) -> Optional[Dict[str, Any]]:
+        """Procura um plano para a requisição; retorna {"key", "steps"} com os slots preenchidos"""
+        original, normalized = tokenize(request)
+        request_words = {token for token in normalized if token not in _STOPWORDS}
+        
+        with self._lock:
+            candidates = list(reversed(self.entries.values()))
+        
+        best = None
+        for entry in candidates:
+            slot_values = self._match_template(entry["template"], original, normalized)
+            if slot_values is not None:
+                best = (entry, slot_values)
+                break
+            # Modelos sem slots: aceitar pequenas variações de redação
+            if (
+                None not in entry["template"]
+                and entry["content_words"]
+                and request_words
+                and entry["negations"] == request_words & _NEGATIONS
+            ):
+                union = entry["content_words"] | request_words
+                similarity = len(entry["content_words"] & request_words) / len(union)
+                if similarity >= self.similarity_threshold:
+                    best = (entry, [])
+                    break
+        
+        with self._lock:
+            if best is None:
+                self.misses += 1
+                return None
+            entry, slot_values = best
+            self.hits += 1
+            entry["hits"] += 1
+            if entry["key"] in self.entries:
+                self.entries.move_to_end(entry["key"])
+        
+        return {
+            "key": entry["key"],
+            "steps": [dict(step, parameters=self._fill_slots(step.get("parameters", {}), slot_values)) for step in entry["steps"]]
+        }
+    
+    def invalidate(self, key: str) -> None:
+        """Remove um plano (ex.: falhou ao ser reaproveitado)"""
+        with self._lock:
+            self.entries.pop(key, None)
+    
+    def clear(self) -> None:
+        """Esvazia o cache"""
+        with self._lock:
+            self.entries.clear()
+            self.hits = 0
+            self.misses = 0
+    
+    def get_status(self) -> Dict[str, Any]:
+        """Retorna tamanho, acertos e os modelos mais usados"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self.entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "top_templates": [
+                    {"key": entry["key"], "hits": entry["hits"], "steps": len(entry["steps"])}
+                    for entry in sorted(self.entries.values(), key=lambda e: e["hits"], reverse=True)[:10]
+                ]
+            }
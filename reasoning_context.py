@@ -0,0 +1,119 @@
+"""
+Contexto do Loop de Raciocínio - Janela deslizante de resultados com resumo dos antigos
+"""
+from typing import Dict, Any, Iterable, List, Tuple
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimativa rápida de tokens (~4 caracteres por token)"""
+    return (len(text) + 3) // 4
+
+
+def estimate_segments_tokens(segments: Iterable[str]) -> int:
+    """Mesma estimativa de estimate_tokens para um prompt em segmentos, sem concatená-los"""
+    return (sum(len(segment) for segment in segments) + 3) // 4
+
+
+class ReasoningContext:
+    """Mantém os últimos K resultados de ações na íntegra, resume os anteriores e respeita um teto de tokens"""
+    
+    def __init__(
+        self,
+        base_context: str,
+        keep_last: int = 3,
+        max_tokens: int = 6000,
+        summary_chars: int = 200
+    ):
+        self.base_context = base_context
+        self.keep_last = max(1, keep_last)
+        self.max_tokens = max_tokens
+        self.summary_chars = summary_chars
+        self.entries: List[Dict[str, Any]] = []
+    
+    def add_result(self, action_name: str, action_result: Dict[str, Any]) -> None:
+        """Acrescenta o resultado de uma ação"""
+        self.add_results([(action_name, action_result)])
+    
+    def add_results(self, results: List[Tuple[str, Dict[str, Any]]]) -> None:
+        """Acrescenta, em uma única atualização, os resultados das ações de um mesmo turno"""
+        if len(results) == 1:
+            full_text = f"\n\nResultado da ação: {results[0][1]}"
+        else:
+            full_text = "\n\nResultados das ações (executadas em paralelo):" + "".join(
+                f"\n- {action_name}: {action_result}" for action_name, action_result in results
+            )
+        self.entries.append({
+            "index": len(self.entries) + 1,
+            "results": results,
+            "full_text": full_text,
+            "full_tokens": estimate_tokens(full_text),
+            "summary_text": None
+        })
+    
+    def _summarize_result(self, action_name: str, result: Dict[str, Any]) -> str:
+        """Resumo de um único resultado: status, trecho do conteúdo e spill_id"""
+        status = "Sucesso" if result.get("success") else "Erro"
+        content = str(result.get("result") if result.get("success") else result.get("error"))
+        if len(content) > self.summary_chars:
+            content = f"{content[:self.summary_chars]}... ({len(content) - self.summary_chars} caracteres omitidos)"
+        
+        summary = f"({action_name}): {status} - {content}"
+        if result.get("spill_id"):
+            summary += f" [spill_id: {result['spill_id']}]"
+        return summary
+    
+    def _summary(self, entry: Dict[str, Any]) -> str:
+        """Resumo curto (e memorizado) de um turno antigo"""
+        if entry["summary_text"] is None:
+            results = entry["results"]
+            if len(results) == 1:
+                entry["summary_text"] = f"\n\nResultado resumido #{entry['index']} {self._summarize_result(*results[0])}"
+            else:
+                entry["summary_text"] = f"\n\nResultados resumidos #{entry['index']}:" + "".join(
+                    f"\n- {self._summarize_result(action_name, result)}" for action_name, result in results
+                )
+        return entry["summary_text"]
+    
+    def segments(self, reserved_tokens: int = 0) -> List[str]:
+        """Monta os segmentos do contexto dentro do teto de tokens
+        
+        reserved_tokens desconta o que mais irá no prompt (ex.: prompt do sistema).
+        Ao exceder o teto: reduz a janela verbatim, depois descarta os resumos mais
+        antigos e, por fim, trunca o resultado mais recente.
+        """
+        budget = self.max_tokens - reserved_tokens - estimate_tokens(self.base_context)
+        keep = min(self.keep_last, len(self.entries))
+        
+        def cost(verbatim_count: int, first: int) -> int:
+            split = len(self.entries) - verbatim_count
+            summarized = sum(
+                estimate_tokens(self._summary(entry)) for entry in self.entries[first:split]
+            )
+            return summarized + sum(entry["full_tokens"] for entry in self.entries[split:])
+        
+        first = 0
+        while keep > 1 and cost(keep, first) > budget:
+            keep -= 1
+        while first < len(self.entries) - keep and cost(keep, first) > budget:
+            first += 1
+        
+        split = len(self.entries) - keep
+        segments = [self.base_context]
+        if first:
+            segments.append(f"\n\n[{first} resultado(s) antigo(s) omitido(s) por limite de contexto]")
+        segments.extend(self._summary(entry) for entry in self.entries[first:split])
+        segments.extend(entry["full_text"] for entry in self.entries[split:])
+        
+        # Ainda acima do teto: truncar o resultado mais recente
+        overflow = cost(keep, first) - budget
+        if self.entries and overflow > 0:
+            text = segments[-1]
+            max_chars = max(self.summary_chars, len(text) - overflow * 4)
+            if max_chars < len(text):
+                segments[-1] = f"{text[:max_chars]}... (truncado: {len(text) - max_chars} caracteres omitidos)"
+        
+        return segments
+    
+    def token_estimate(self, reserved_tokens: int = 0) -> int:
+        """Tokens estimados do contexto montado"""
+        return sum(estimate_tokens(segment) for segment in self.segments(reserved_tokens))
@@ -1,20 +1,63 @@
 """
 Núcleo de Raciocínio do Agente Autônomo
 """
+import contextvars
 import json
+import queue
 import re
-from typing import List, Dict, Any, Optional, Tuple
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Callable, List, Dict, Any, Iterator, Optional, Tuple, Union
 from datetime import datetime
 
 from .memory import Memory
+from .cassette import Cassette
+from .action_stream_parser import StreamingActionParser
 from .tool_manager import ToolManager, ToolResult
-from .llm_provider import llm_provider
+from .tool_plan import PlanValidationError
+from .execution_log import nearest_rank_percentiles
+from .plan_cache import PlanCache
+from .request_budget import RequestBudget
+from .speculation import ToolSpeculator
+from .llm_provider import llm_provider, LLM_ERROR_PREFIX
+from .reasoning_context import ReasoningContext, estimate_segments_tokens, estimate_tokens
+from .tool_retriever import ToolRetriever
+from .tracing import tracer
 import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from config.settings import settings
 
 
+# Fila de eventos da requisição em andamento (definida por process_request_stream)
+_event_sink: contextvars.ContextVar = contextvars.ContextVar("reasoning_event_sink", default=None)
+
+# Tarefa da requisição em andamento: cada requisição (e as threads que ela dispara) vê só a sua
+_current_task: contextvars.ContextVar = contextvars.ContextVar("reasoning_current_task", default=None)
+
+# Chamadas especulativas da requisição em andamento
+_speculation: contextvars.ContextVar = contextvars.ContextVar("reasoning_speculation", default=None)
+
+# Orçamento (tokens, tempo, ferramentas) da requisição em andamento
+_budget: contextvars.ContextVar = contextvars.ContextVar("reasoning_budget", default=None)
+
+# Última tarefa encerrada neste contexto (ex.: a requisição HTTP que chamou process_request)
+_last_task: contextvars.ContextVar = contextvars.ContextVar("reasoning_last_task", default=None)
+# Início da iteração cujo registro de tempos está aberto
+_iteration_start: contextvars.ContextVar = contextvars.ContextVar("reasoning_iteration_start", default=None)
+
+# Fases registradas por iteração em current_task["iteration_timings"] (tempos em segundos)
+_TIMING_PHASES = (
+    "context_preparation", "prompt_assembly", "llm_call", "llm_queue", "llm_generation",
+    "action_extraction", "tool_execution", "total"
+)
+_SIZE_FIELDS = ("prompt_chars", "response_chars")
+
+
 class ReasoningCore:
     """Núcleo de raciocínio do agente"""
     
@@ -23,13 +66,71 @@ class ReasoningCore:
         self.tool_manager = tool_manager
         self.llm = llm_provider
         self.max_iterations = 10
-        self.current_task = None
-        self.task_history = []
+        self.strategy = settings.reasoning_strategy  # "react" ou "plan_execute"
+        self.plan_cache = PlanCache(
+            max_entries=settings.plan_cache_max_entries,
+            similarity_threshold=settings.plan_cache_similarity
+        ) if settings.plan_cache_enabled else None
+        # Só as ferramentas relevantes para a requisição/passo vão no prompt
+        self.tool_retriever = ToolRetriever(
+            top_k=settings.tool_retrieval_top_k,
+            always_include=settings.tool_retrieval_always_include
+        ) if settings.tool_retrieval_enabled else None
+        # Ferramentas somente leitura prováveis executadas enquanto o LLM gera o primeiro passo
+        self.speculator = ToolSpeculator(
+            tool_manager,
+            max_calls=settings.speculative_max_calls
+        ) if settings.speculative_tools_enabled else None
+        # Ferramentas CPU-bound em processos separados (não seguram o GIL das outras requisições)
+        if settings.tool_process_pool_workers > 0 and tool_manager.process_pool is None:
+            tool_manager.enable_process_pool(max_workers=settings.tool_process_pool_workers)
+        # Histórico limitado e compartilhado entre requisições; tarefas em andamento por id
+        self.task_history: deque = deque(maxlen=settings.task_history_max_entries)
+        self._active_tasks: Dict[str, Dict[str, Any]] = {}
+        self._tasks_lock = threading.Lock()
         
         print(f"Núcleo de Raciocínio inicializado com provedor: {self.llm.provider}")
         
+        # Exportação de spans de rastreamento
+        tracer.configure(
+            export_path=settings.trace_export_path,
+            buffer_size=settings.trace_buffer_size,
+            enabled=settings.tracing_enabled
+        )
+        
+        # Gravação/reprodução de interações para benchmarks offline
+        if settings.cassette_mode != "off":
+            self.use_cassette(Cassette(
+                settings.cassette_path,
+                mode=settings.cassette_mode,
+                llm_latency=settings.cassette_llm_latency,
+                tool_latency=settings.cassette_tool_latency,
+                latency_scale=settings.cassette_latency_scale,
+                strict=settings.cassette_strict
+            ))
+        
         # Sistema de prompts
         self.system_prompt = self._get_system_prompt()
+        
+        # Prompts do sistema já formatados, por subconjunto de ferramentas (descartados quando o catálogo muda)
+        self._formatted_prompt_cache: Tuple[int, Dict[Tuple[str, ...], str]] = (-1, {})
+        
+        # Chamada nativa de funções: ferramentas vão estruturadas, fora do texto do prompt
+        self.native_function_calling = settings.native_function_calling
+        # Provedor/modelo que já recusou ferramentas nativas: só modo texto a partir daí
+        self._native_unsupported: set = set()
+        self.native_system_prompt = self._get_native_system_prompt()
+        self._tool_definitions_cache: Optional[Tuple[int, List[Dict[str, Any]]]] = None
+    
+    def use_cassette(self, cassette: Optional[Cassette]) -> None:
+        """Grava (ou reproduz) as respostas do LLM e os resultados das ferramentas no cassete"""
+        self.llm.use_cassette(cassette)
+        self.tool_manager.use_cassette(cassette)
+    
+    @property
+    def current_task(self) -> Optional[Dict[str, Any]]:
+        """Tarefa da requisição atual (isolada por contexto, segura com requisições simultâneas)"""
+        return _current_task.get()
     
     def _get_system_prompt(self) -> str:
         """Retorna o prompt do sistema"""
@@ -72,92 +173,849 @@ Para usar uma ferramenta, responda no formato:
 }
 ```
 
+Para executar várias ações independentes de uma vez, envie uma lista JSON com esses objetos; elas serão executadas em paralelo.
+
 Se não precisar usar ferramentas, responda normalmente."""
     
-    def process_request(self, user_input: str) -> str:
-        """Processa uma requisição do usuário"""
-        try:
-            # Registrar entrada do usuário na memória
-            self.memory.add_entry("conversation", user_input, {"role": "user"})
-            
-            # Iniciar nova tarefa
-            self.current_task = {
-                "id": datetime.now().isoformat(),
+    def _get_native_system_prompt(self) -> str:
+        """Prompt do sistema sem a lista de ferramentas e o formato JSON (enviados como funções nativas)"""
+        base_prompt = self.system_prompt.split("FERRAMENTAS DISPONÍVEIS:")[0]
+        return base_prompt + "Use as ferramentas fornecidas (chamadas de função) quando necessário.\nSe não precisar usar ferramentas, responda normalmente."
+    
+    def new_budget(self) -> RequestBudget:
+        """Orçamento padrão de uma requisição, a partir das configurações"""
+        return RequestBudget(
+            max_tokens=settings.request_max_tokens,
+            max_wall_time=settings.max_execution_time,
+            max_tool_calls=settings.request_max_tool_calls
+        )
+    
+    def process_request(self, user_input: str, budget: Optional[RequestBudget] = None) -> str:
+        """Processa uma requisição do usuário
+        
+        O orçamento (padrão: new_budget()) limita tokens, tempo total e chamadas de
+        ferramentas; esgotado, a resposta final é gerada com o contexto parcial e o
+        consumo fica em current_task["budget"].
+        """
+        budget = budget or self.new_budget()
+        with tracer.span("reasoning.process_request", input_length=len(user_input)) as span:
+            # Iniciar nova tarefa, visível só no contexto desta requisição
+            task = {
+                "id": f"{datetime.now().isoformat()}-{uuid.uuid4().hex[:8]}",
                 "input": user_input,
                 "start_time": datetime.now(),
                 "iterations": 0,
                 "actions": [],
-                "status": "in_progress"
+                "status": "in_progress",
+                "strategy": self.strategy,
+                "llm_calls": 0,
+                "trace_id": span.trace_id if span else None
             }
+            task_token = _current_task.set(task)
+            budget_token = _budget.set(budget)
+            speculation_token = None
+            with self._tasks_lock:
+                self._active_tasks[task["id"]] = task
             
-            # Processar com loop de raciocínio
-            response = self._reasoning_loop(user_input)
-            
-            # Finalizar tarefa
-            self.current_task["status"] = "completed"
-            self.current_task["end_time"] = datetime.now()
-            self.current_task["response"] = response
-            self.task_history.append(self.current_task)
-            
-            # Registrar resposta na memória
-            self.memory.add_entry("conversation", response, {"role": "assistant"})
+            try:
+                # Registrar entrada do usuário na memória
+                self.memory.add_entry("conversation", user_input, {"role": "user"})
+                
+                self._emit(
+                    "task_started",
+                    task_id=self.current_task["id"],
+                    strategy=self.strategy,
+                    trace_id=self.current_task["trace_id"]
+                )
+                
+                # Requisição estruturalmente igual a uma anterior: reaproveitar o plano
+                response = self._replay_cached_plan(user_input) if self.plan_cache is not None else None
+                
+                # Processar com a estratégia configurada
+                if response is None:
+                    if self.strategy == "plan_execute":
+                        response = self._plan_and_execute(user_input)
+                    else:
+                        if self.speculator is not None and self.llm.available:
+                            with tracer.span("reasoning.speculate") as speculate_span:
+                                speculation = self.speculator.start(user_input, budget)
+                                if speculate_span:
+                                    speculate_span.set_attribute("calls", speculation.calls)
+                            speculation_token = _speculation.set(speculation)
+                        response = self._reasoning_loop(user_input)
+                    self._store_cached_plan(user_input)
+                
+                # Finalizar tarefa
+                self.current_task["status"] = "completed"
+                self.current_task["response"] = response
+                
+                if span:
+                    span.set_attributes(
+                        task_id=self.current_task["id"],
+                        iterations=self.current_task["iterations"],
+                        actions=len(self.current_task["actions"]),
+                        strategy=self.strategy,
+                        llm_calls=self.current_task["llm_calls"],
+                        response_length=len(response)
+                    )
+                
+                # Registrar resposta na memória
+                self.memory.add_entry("conversation", response, {"role": "assistant"})
+                
+                return response
             
-            return response
+            except Exception as e:
+                error_msg = f"Erro no processamento: {str(e)}"
+                self.memory.add_entry("error", error_msg)
+                task["status"] = "failed"
+                task["error"] = error_msg
+                if span:
+                    span.status = "error"
+                    span.error = error_msg
+                return f"Desculpe, ocorreu um erro: {error_msg}"
             
-        except Exception as e:
-            error_msg = f"Erro no processamento: {str(e)}"
-            self.memory.add_entry("error", error_msg)
-            return f"Desculpe, ocorreu um erro: {error_msg}"
+            finally:
+                if speculation_token is not None:
+                    _speculation.get().discard()
+                    _speculation.reset(speculation_token)
+                self._end_iteration_timing()
+                task["end_time"] = datetime.now()
+                task["budget"] = budget.get_status()
+                if span:
+                    span.set_attribute("budget_exhausted", task["budget"]["exhausted"])
+                with self._tasks_lock:
+                    self._active_tasks.pop(task["id"], None)
+                    self.task_history.append(task)
+                _budget.reset(budget_token)
+                _current_task.reset(task_token)
+                _last_task.set(task)
+    
+    def process_request_stream(
+        self,
+        user_input: str,
+        budget: Optional[RequestBudget] = None
+    ) -> Iterator[Dict[str, Any]]:
+        """Variante de process_request que produz eventos à medida que o processamento avança
+        
+        Eventos: "task_started", "token" (texto do LLM conforme chega, com a fase:
+        "reasoning", "planning" ou "final"), "tool_started"/"plan_started", "tool_finished"
+        e, por último, "final" com a resposta completa e o consumo do orçamento. O processamento roda em uma thread
+        própria; se o consumidor parar de ler, a requisição termina em segundo plano.
+        """
+        events: "queue.Queue" = queue.Queue()
+        finished = object()
+        
+        def run() -> None:
+            _event_sink.set(events)
+            try:
+                response = self.process_request(user_input, budget)
+                task = _last_task.get()
+                events.put({
+                    "event": "final",
+                    "response": response,
+                    "budget": task.get("budget") if task else None,
+                    "timestamp": datetime.now().isoformat()
+                })
+            except Exception as e:
+                events.put({"event": "error", "error": str(e), "timestamp": datetime.now().isoformat()})
+            finally:
+                events.put(finished)
+        
+        # Cópia do contexto: herda o span atual e isola a fila de eventos desta requisição
+        context = contextvars.copy_context()
+        threading.Thread(target=context.run, args=(run,), name="reasoning-stream", daemon=True).start()
+        
+        while True:
+            event = events.get()
+            if event is finished:
+                return
+            yield event
+    
+    def _emit(self, event: str, **data: Any) -> None:
+        """Publica um evento para process_request_stream (sem efeito fora dele)"""
+        sink = _event_sink.get()
+        if sink is not None:
+            sink.put(dict(data, event=event, timestamp=datetime.now().isoformat()))
     
     def _reasoning_loop(self, user_input: str) -> str:
         """Loop principal de raciocínio"""
-        if not self.llm.client:
+        if not self.llm.available:
             return self._simulate_response(user_input)
         
-        # Preparar contexto
-        context = self._prepare_context(user_input)
+        # Preparar contexto (tempo contabilizado na primeira iteração)
+        self._begin_iteration_timing(1)
+        with tracer.span("reasoning.prepare_context"), self._timed("context_preparation"):
+            context = self._prepare_context(user_input)
+        
+        # Janela deslizante: últimos resultados na íntegra, anteriores resumidos, dentro do teto de tokens
+        reasoning_context = self._new_reasoning_context(context)
         
         # Loop de raciocínio
         for iteration in range(self.max_iterations):
+            if iteration and self._budget_exhausted():
+                # Orçamento esgotado: responder com o que já foi obtido
+                return self._final_response(reasoning_context)
+            
             self.current_task["iterations"] = iteration + 1
+            if iteration:
+                self._begin_iteration_timing(iteration + 1)
             
-            try:
-                # Preparar prompt completo
-                full_prompt = f"{self.system_prompt.format(tools=self._format_tools_for_prompt())}\n\n{context}"
+            with tracer.span("reasoning.iteration", iteration=iteration + 1):
+                try:
+                    # Gerar resposta do LLM e verificar se há ações ou é a resposta final
+                    response_content, actions, action_results = self._next_step(reasoning_context)
+                    
+                    if not actions and self._llm_call_cut_by_budget(response_content):
+                        # Tempo do orçamento acabou durante a chamada: responder com o que já foi obtido
+                        return self._final_response(reasoning_context)
+                    
+                    if actions:
+                        # Executar ações (independentes entre si, em paralelo), se ainda não disparadas durante a geração
+                        if action_results is None:
+                            with self._timed("tool_execution"):
+                                action_results = self._execute_actions(actions)
+                        
+                        # Adicionar todos os resultados ao contexto em uma única atualização
+                        reasoning_context.add_results([
+                            (action.get("action"), action_result)
+                            for action, action_result in zip(actions, action_results)
+                        ])
+                        
+                        # Se alguma ação foi bem-sucedida e não é a última iteração, continuar
+                        if any(result.get("success") for result in action_results) and iteration < self.max_iterations - 1:
+                            continue
+                        else:
+                            # Gerar resposta final
+                            return self._final_response(reasoning_context)
+                    else:
+                        # Resposta final sem ações
+                        return response_content
+                
+                except Exception as e:
+                    self.memory.add_entry("error", f"Erro na iteração {iteration}: {str(e)}")
+                    if iteration == 0:
+                        return f"Erro no processamento: {str(e)}"
+                    else:
+                        return "Ocorreu um erro durante o processamento, mas consegui executar algumas ações."
+        
+        return "Processo concluído após múltiplas iterações."
+    
+    def _next_step(
+        self,
+        reasoning_context: ReasoningContext
+    ) -> Tuple[str, List[Dict[str, Any]], Optional[List[Dict[str, Any]]]]:
+        """Consulta o LLM e retorna (texto da resposta, ações, resultados se as ações já foram executadas)"""
+        native_key = (self.llm.provider, settings.get_current_model())
+        if self.native_function_calling and native_key not in self._native_unsupported:
+            with self._timed("prompt_assembly"):
+                prompt_segments = [self.native_system_prompt, "\n\n"] + reasoning_context.segments(
+                    estimate_tokens(self.native_system_prompt)
+                )
+                tools = self._select_tools(self._retrieval_query(reasoning_context))
+            output = self._generate_with_tools(prompt_segments, tools)
+            if "error" in output and self._budget_exhausted():
+                # Falha pelo fim do orçamento, não por falta de suporte: não repetir em modo texto
+                return output["content"], [], None
+            
+            if "error" not in output:
+                with self._timed("action_extraction"):
+                    if output["tool_calls"]:
+                        actions = [
+                            {
+                                "action": call["name"],
+                                "parameters": call["arguments"],
+                                "reasoning": output["content"]
+                            }
+                            for call in output["tool_calls"]
+                        ]
+                    else:
+                        # Modelo pode ainda responder com o bloco JSON em texto
+                        actions = self._extract_actions(output["content"])
+                return output["content"], actions, None
+            
+            # Provedor/modelo sem suporte a ferramentas: não pagar a chamada nativa de novo
+            self._native_unsupported.add(native_key)
+            self.memory.add_entry(
+                "error",
+                f"Chamada nativa de funções falhou em {native_key[0]}/{native_key[1]}, "
+                f"usando modo texto daqui em diante: {output['error']}"
+            )
+        
+        # Modo texto: ferramentas descritas no prompt e ação extraída do JSON da resposta
+        with self._timed("prompt_assembly"):
+            system_prompt = self._get_formatted_system_prompt(self._select_tools(self._retrieval_query(reasoning_context)))
+            prompt_segments = [system_prompt, "\n\n"] + reasoning_context.segments(estimate_tokens(system_prompt))
+        if settings.stream_action_dispatch:
+            return self._generate_and_dispatch(prompt_segments)
+        response_content = self._generate(prompt_segments)
+        with self._timed("action_extraction"):
+            actions = self._extract_actions(response_content)
+        return response_content, actions, None
+    
+    def _generate_and_dispatch(
+        self,
+        prompt: Union[str, List[str]]
+    ) -> Tuple[str, List[Dict[str, Any]], Optional[List[Dict[str, Any]]]]:
+        """Transmite a resposta do LLM e executa cada ação somente leitura assim que seu JSON fecha
+        
+        A execução dessas ferramentas se sobrepõe ao restante da geração (ex.: a explicação
+        que o modelo escreve depois do bloco JSON). As ações valem as extraídas do texto
+        completo: as demais são executadas depois da geração, e uma ação antecipada que a
+        extração não confirma (bloco inválido ou sem cerca de fechamento) é descartada.
+        """
+        parser = StreamingActionParser()
+        early: List[Tuple[Dict[str, Any], Any]] = []
+        
+        with tracer.span("reasoning.stream_dispatch") as span:
+            with ThreadPoolExecutor(max_workers=max(1, settings.max_parallel_actions)) as executor:
+                def submit(action: Dict[str, Any]) -> Any:
+                    # Cópia do contexto na thread que dispara: a ação herda tarefa e span
+                    context = contextvars.copy_context()
+                    return executor.submit(context.run, self._execute_action, action)
                 
-                # Gerar resposta do LLM
-                response_content = self.llm.generate_response(full_prompt)
+                def on_text(text: str) -> None:
+                    for action in parser.feed(text):
+                        # Com a resposta incompleta, só ferramentas sem efeitos colaterais
+                        if self._is_read_only_action(action):
+                            early.append((action, submit(action)))
                 
-                # Verificar se é uma ação ou resposta final
-                action_match = self._extract_action(response_content)
+                response_content = self._generate(prompt, on_text=on_text)
+                generation_end = time.monotonic()
                 
-                if action_match:
-                    # Executar ação
-                    action_result = self._execute_action(action_match)
-                    
-                    # Adicionar resultado ao contexto
-                    context += f"\n\nResultado da ação: {action_result}"
-                    
-                    # Se a ação foi bem-sucedida e parece ser a final, continuar
-                    if action_result.get("success") and iteration < self.max_iterations - 1:
-                        continue
+                with self._timed("action_extraction"):
+                    actions = self._extract_actions(response_content)
+                
+                # Reaproveitar as execuções antecipadas que a extração confirma; disparar o restante
+                pending = list(early)
+                futures = []
+                for action in actions:
+                    index = next((i for i, (early_action, _) in enumerate(pending) if early_action == action), None)
+                    if index is not None:
+                        futures.append(pending.pop(index)[1])
                     else:
-                        # Gerar resposta final
-                        final_prompt = f"Com base nas ações executadas, forneça uma resposta final ao usuário.\n\n{context}"
-                        final_response = self.llm.generate_response(final_prompt)
-                        return final_response
-                else:
-                    # Resposta final sem ações
-                    return response_content
+                        futures.append(submit(action))
+                
+                # Só a espera após a geração conta como execução (o restante se sobrepôs ao LLM)
+                with self._timed("tool_execution"):
+                    action_results = [future.result() for future in futures]
+                    unconfirmed = self._discard_unconfirmed_actions(pending)
+                
+                if span:
+                    span.set_attributes(
+                        actions=len(actions),
+                        dispatched_during_generation=len(early) - len(pending),
+                        unconfirmed_actions=len(unconfirmed),
+                        wait_after_generation=time.monotonic() - generation_end
+                    )
+                if not actions:
+                    return response_content, [], None
+                return response_content, actions, action_results
+    
+    def _is_read_only_action(self, action: Dict[str, Any]) -> bool:
+        """Verifica se a ação usa uma ferramenta somente leitura"""
+        tool = self.tool_manager.get_tool_by_name(action.get("action"))
+        return tool is not None and tool.read_only
+    
+    def _discard_unconfirmed_actions(self, pending: List[Tuple[Dict[str, Any], Any]]) -> List[Dict[str, Any]]:
+        """Cancela (ou aguarda, se já em execução) ações antecipadas que o texto completo não confirmou
+        
+        As que chegaram a executar ficam marcadas como "unconfirmed" na tarefa e fora do
+        contexto e do cache de planos.
+        """
+        unconfirmed = []
+        for action, future in pending:
+            if future.cancel():
+                continue
+            future.result()
+            unconfirmed.append(action)
+        
+        if unconfirmed:
+            parameters = [action.get("parameters") for action in unconfirmed]
+            for task_action in (self.current_task or {}).get("actions", []):
+                if any(task_action.get("parameters") is item for item in parameters):
+                    task_action["unconfirmed"] = True
+            self.memory.add_entry(
+                "error",
+                f"Ações executadas durante a geração não confirmadas pela resposta completa: "
+                f"{[action.get('action') for action in unconfirmed]}"
+            )
+        return unconfirmed
+    
+    def _generate(
+        self,
+        prompt: Union[str, List[str]],
+        phase: str = "reasoning",
+        on_text: Optional[Callable[[str], None]] = None
+    ) -> str:
+        """Chama o LLM contabilizando a chamada na tarefa atual
+        
+        Com on_text ou dentro de process_request_stream, a resposta é transmitida: cada
+        trecho é repassado a on_text e vira um evento "token".
+        """
+        if self.current_task is not None:
+            self.current_task["llm_calls"] = self.current_task.get("llm_calls", 0) + 1
+        self._add_timing("prompt_chars", len(prompt) if isinstance(prompt, str) else sum(map(len, prompt)))
+        start = time.perf_counter()
+        
+        if on_text is None and _event_sink.get() is None:
+            response = self.llm.generate_response(prompt, **self._llm_options())
+            self._add_timing("llm_call", time.perf_counter() - start)
+            self._add_timing("response_chars", len(response or ""))
+            self._charge_tokens(prompt, response)
+            return response
+        
+        # Transmitida: espera até o primeiro trecho (fila + processamento do prompt) separada da geração
+        parts = []
+        first_chunk_time = None
+        for text in self.llm.generate_response_stream(prompt, **self._llm_options()):
+            if first_chunk_time is None:
+                first_chunk_time = time.perf_counter() - start
+            parts.append(text)
+            self._emit("token", text=text, phase=phase)
+            if on_text is not None:
+                on_text(text)
+        
+        elapsed = time.perf_counter() - start
+        response = "".join(parts)
+        self._add_timing("llm_call", elapsed)
+        self._add_timing("llm_queue", elapsed if first_chunk_time is None else first_chunk_time)
+        self._add_timing("llm_generation", 0.0 if first_chunk_time is None else elapsed - first_chunk_time)
+        self._add_timing("response_chars", len(response))
+        self._charge_tokens(prompt, response)
+        return response
+    
+    def _generate_with_tools(self, prompt: Union[str, List[str]], tools: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Chama o LLM com ferramentas nativas contabilizando a chamada na tarefa atual"""
+        if self.current_task is not None:
+            self.current_task["llm_calls"] = self.current_task.get("llm_calls", 0) + 1
+        self._add_timing("prompt_chars", len(prompt) if isinstance(prompt, str) else sum(map(len, prompt)))
+        start = time.perf_counter()
+        output = self.llm.generate_with_tools(prompt, tools, **self._llm_options())
+        self._add_timing("llm_call", time.perf_counter() - start)
+        self._add_timing("response_chars", len(output.get("content") or ""))
+        self._charge_tokens(prompt, output.get("content"), json.dumps(tools, ensure_ascii=False, default=str))
+        # Chamadas com ferramentas não são transmitidas: o texto sai em um único evento
+        if output.get("content") and "error" not in output:
+            self._emit("token", text=output["content"], phase="reasoning")
+        return output
+    
+    def _charge_tokens(self, prompt: Union[str, List[str]], response: Optional[str], extra: str = "") -> None:
+        """Desconta do orçamento os tokens estimados de uma chamada ao LLM"""
+        budget = _budget.get()
+        if budget is not None:
+            segments = [prompt] if isinstance(prompt, str) else prompt
+            budget.add_tokens(estimate_segments_tokens([*segments, extra]), estimate_tokens(response or ""))
+    
+    def _budget_exhausted(self) -> Optional[str]:
+        """Limite esgotado do orçamento da requisição (registrado na tarefa), ou None"""
+        budget = _budget.get()
+        reason = budget.exhausted() if budget is not None else None
+        if reason and self.current_task is not None and "budget_exhausted" not in self.current_task:
+            self.current_task["budget_exhausted"] = reason
+            self.memory.add_entry("error", f"Orçamento da requisição esgotado ({reason}); gerando resposta parcial")
+            self._emit("budget_exhausted", reason=reason, budget=budget.get_status())
+        return reason
+    
+    def _llm_call_cut_by_budget(self, response: Optional[str]) -> bool:
+        """Verifica se a chamada ao LLM falhou (ex.: timeout) com o orçamento da requisição esgotado"""
+        return bool(response) and response.startswith(LLM_ERROR_PREFIX) and self._budget_exhausted() is not None
+    
+    def _refused_tool_call(self) -> Optional[ToolResult]:
+        """Reserva uma chamada de ferramenta no orçamento; o resultado de recusa se esgotado, ou None"""
+        budget = _budget.get()
+        if budget is None or budget.try_tool_call():
+            return None
+        return ToolResult(
+            success=False,
+            error=f"Orçamento de chamadas de ferramentas esgotado ({budget.max_tool_calls})"
+        )
+    
+    def _budgeted_tool_call(self, name: str, parameters: Dict[str, Any]) -> ToolResult:
+        """Executa uma ferramenta de um plano após reservá-la no orçamento"""
+        refused = self._refused_tool_call()
+        if refused is not None:
+            return refused
+        return self.tool_manager.execute_tool(name, parameters)
+    
+    def _llm_options(self) -> Dict[str, Any]:
+        """Opções das chamadas ao LLM: o tempo restante do orçamento como timeout
+        
+        Esgotado o tempo, a chamada que gera a resposta final vai sem limite.
+        """
+        budget = _budget.get()
+        remaining = budget.remaining_time() if budget is not None else None
+        return {"timeout": remaining} if remaining else {}
+    
+    def _begin_iteration_timing(self, iteration: int) -> None:
+        """Abre o registro de tempos e tamanhos de uma iteração na tarefa atual (fechando o anterior)
+        
+        O "total" de uma iteração vai do seu início ao da seguinte (ou ao fim da requisição):
+        nas duas estratégias inclui a preparação do contexto, o planejamento e a resposta final.
+        """
+        if self.current_task is not None:
+            self._end_iteration_timing()
+            self.current_task.setdefault("iteration_timings", []).append({"iteration": iteration})
+            _iteration_start.set(time.perf_counter())
+    
+    def _end_iteration_timing(self) -> None:
+        """Fecha o registro da iteração atual com o seu tempo total"""
+        start = _iteration_start.get()
+        if start is not None:
+            self._add_timing("total", time.perf_counter() - start)
+            _iteration_start.set(None)
+    
+    def _add_timing(self, field: str, value: float) -> None:
+        """Soma um tempo (ou tamanho) ao registro da iteração atual"""
+        timings = self.current_task.get("iteration_timings") if self.current_task is not None else None
+        if timings:
+            timings[-1][field] = timings[-1].get(field, 0) + value
+    
+    @contextmanager
+    def _timed(self, phase: str) -> Iterator[None]:
+        """Mede o bloco e soma o tempo à fase da iteração atual"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._add_timing(phase, time.perf_counter() - start)
+    
+    def _new_reasoning_context(self, context: str) -> ReasoningContext:
+        """Cria o contexto com janela deslizante usando os limites configurados"""
+        return ReasoningContext(
+            context,
+            keep_last=settings.context_keep_last_results,
+            max_tokens=settings.context_max_tokens,
+            summary_chars=settings.context_summary_chars
+        )
+    
+    def _final_response(self, reasoning_context: ReasoningContext) -> str:
+        """Pede ao LLM a resposta final com base nos resultados acumulados"""
+        final_instruction = "Com base nas ações executadas, forneça uma resposta final ao usuário.\n\n"
+        prompt = [final_instruction] + reasoning_context.segments(estimate_tokens(final_instruction))
+        response = self._generate(prompt, phase="final")
+        if self._llm_call_cut_by_budget(response):
+            # Cortada pelo fim do tempo: repetir uma vez, agora sem limite (ver _llm_options)
+            response = self._generate(prompt, phase="final")
+        return response
+    
+    def _plan_and_execute(self, user_input: str) -> str:
+        """Estratégia planejar-e-executar: uma chamada gera o plano, executado localmente
+        
+        O LLM só é consultado novamente se um passo falhar ou ao atingir um checkpoint
+        (até settings.plan_max_revisions revisões), além da resposta final.
+        """
+        if not self.llm.available:
+            return self._simulate_response(user_input)
+        
+        self._begin_iteration_timing(1)
+        with tracer.span("reasoning.prepare_context"), self._timed("context_preparation"):
+            context = self._prepare_context(user_input)
+        reasoning_context = self._new_reasoning_context(context)
+        
+        with tracer.span("reasoning.plan"):
+            plan = self._request_plan(reasoning_context, self._get_planning_prompt())
+        if plan is None and self._budget_exhausted():
+            # Planejamento interrompido pelo fim do orçamento: responder sem novas chamadas
+            return self._final_response(reasoning_context)
+        if plan is None:
+            # Resposta sem plano válido: seguir com o loop ReAct
+            self.memory.add_entry("error", "Plano inválido; usando o loop de raciocínio")
+            return self._reasoning_loop(user_input)
+        if not plan["steps"]:
+            return plan.get("answer") or self._final_response(reasoning_context)
+        
+        results: Dict[str, Any] = {}
+        for revision in range(settings.plan_max_revisions + 1):
+            self.current_task["iterations"] += 1
+            if revision:
+                self._begin_iteration_timing(self.current_task["iterations"])
+            with tracer.span("reasoning.plan_execution", revision=revision, steps=len(plan["steps"])):
+                with self._timed("tool_execution"):
+                    outcome = self._execute_plan_steps(plan["steps"], results, reasoning_context)
+            
+            if outcome["success"] and not outcome["deferred_nodes"]:
+                break
+            if revision == settings.plan_max_revisions or self._budget_exhausted():
+                break
+            
+            # Falha ou checkpoint: pedir ao LLM o restante do plano
+            with tracer.span("reasoning.plan_revision", revision=revision + 1):
+                plan = self._request_plan(reasoning_context, self._get_revision_prompt(plan["steps"], outcome, results))
+            if plan is None or not plan["steps"]:
+                break
+        
+        return self._final_response(reasoning_context)
+    
+    def _replay_cached_plan(self, user_input: str) -> Optional[str]:
+        """Executa o plano em cache para a requisição, se houver; só a resposta final usa o LLM"""
+        if not self.llm.available:
+            return None
+        
+        cached = self.plan_cache.lookup(user_input)
+        if cached is None:
+            return None
+        if not self._is_read_only_plan(cached["steps"]):
+            # Ferramenta deixou de ser somente leitura: nunca reexecutar efeitos colaterais sem o LLM
+            self.plan_cache.invalidate(cached["key"])
+            return None
+        
+        with tracer.span("reasoning.plan_cache_replay", template=cached["key"], steps=len(cached["steps"])):
+            with tracer.span("reasoning.prepare_context"):
+                context = self._prepare_context(user_input)
+            reasoning_context = self._new_reasoning_context(context)
+            
+            self.current_task["iterations"] += 1
+            self.current_task["plan_cache_key"] = cached["key"]
+            outcome = self._execute_plan_steps(cached["steps"], {}, reasoning_context)
+            
+            if not outcome["success"] or outcome["deferred_nodes"]:
+                # Plano não serve mais para este tipo de requisição: descartar e seguir o fluxo normal
+                self.plan_cache.invalidate(cached["key"])
+                self.memory.add_entry("error", f"Plano em cache falhou ({cached['key']}); replanejando")
+                self.current_task["actions"] = []
+                self.current_task.pop("plan_steps", None)
+                self.current_task.pop("plan_cache_key", None)
+                return None
+            
+            return self._final_response(reasoning_context)
+    
+    def _store_cached_plan(self, user_input: str) -> None:
+        """Guarda no cache a sequência de ações da tarefa, se todas tiveram sucesso
+        
+        Só planos de ferramentas somente leitura: reaproveitar um plano dispensa o LLM,
+        e uma requisição parecida (ex.: negada) não pode disparar efeitos colaterais.
+        """
+        if self.plan_cache is None or not self.llm.available:
+            return
+        
+        # Ações antecipadas que a resposta completa não confirmou não fazem parte do plano
+        actions = [action for action in self.current_task.get("actions", []) if not action.get("unconfirmed")]
+        if not actions or not all(action.get("success") for action in actions):
+            return
+        
+        steps = self.current_task.get("plan_steps")
+        if not steps:
+            # Sequência do loop ReAct: reexecutar na mesma ordem
+            steps = [
+                {
+                    "id": f"step_{index + 1}",
+                    "tool": action["name"],
+                    "parameters": action.get("parameters", {}),
+                    "depends_on": [f"step_{index}"] if index else []
+                }
+                for index, action in enumerate(actions)
+            ]
+        
+        if not self._is_read_only_plan(steps):
+            return
+        
+        # Checkpoints só fazem sentido no planejamento original
+        self.plan_cache.store(user_input, [
+            {key: value for key, value in step.items() if key != "checkpoint"} for step in steps
+        ])
+    
+    def _is_read_only_plan(self, steps: List[Dict[str, Any]]) -> bool:
+        """Verifica se todos os passos usam ferramentas somente leitura"""
+        for step in steps:
+            tool = self.tool_manager.get_tool_by_name(step.get("tool"))
+            if tool is None or not tool.read_only:
+                return False
+        return True
+    
+    def _execute_plan_steps(
+        self,
+        steps: List[Dict[str, Any]],
+        results: Dict[str, Any],
+        reasoning_context: ReasoningContext
+    ) -> Dict[str, Any]:
+        """Executa os passos do plano via ToolManager e registra os resultados em uma única atualização"""
+        completed_nodes = []
+        summary: Dict[str, Any] = {}
+        steps_by_id = {str(step.get("id")): step for step in steps}
+        
+        self._emit("plan_started", steps=[
+            {"id": step.get("id"), "tool": step.get("tool")} for step in steps
+        ])
+        try:
+            events = self.tool_manager.execute_plan(
+                steps,
+                max_workers=settings.max_parallel_actions,
+                stop_on_error=True,
+                initial_results=results,
+                execute_tool=self._budgeted_tool_call
+            )
+            for event in events:
+                if event["event"] == "node_completed":
+                    self._compact_plan_result(event)
+                    completed_nodes.append(event)
+                    self._emit(
+                        "tool_finished",
+                        name=event["tool"],
+                        node_id=event["node_id"],
+                        success=event["success"],
+                        error=event["error"],
+                        execution_time=event["execution_time"]
+                    )
+                    if event["success"]:
+                        results[event["node_id"]] = event["result"]
                     
-            except Exception as e:
-                self.memory.add_entry("error", f"Erro na iteração {iteration}: {str(e)}")
-                if iteration == 0:
-                    return f"Erro no processamento: {str(e)}"
-                else:
-                    return "Ocorreu um erro durante o processamento, mas consegui executar algumas ações."
+                    if self.current_task:
+                        step = steps_by_id.get(event["node_id"], {})
+                        self.current_task["actions"].append({
+                            "name": event["tool"],
+                            "node_id": event["node_id"],
+                            "parameters": step.get("parameters", {}),
+                            "success": event["success"],
+                            "timestamp": datetime.now().isoformat()
+                        })
+                        # Passos concluídos (com referências ${...}) para o cache de planos
+                        if event["success"] and step:
+                            self.current_task.setdefault("plan_steps", []).append(step)
+                    self.memory.add_entry(
+                        "result",
+                        f"Resultado de {event['tool']} ({event['node_id']}): {'Sucesso' if event['success'] else 'Erro'} - {event['compact_result'] or event['error']}",
+                        {"spill_id": event["spill_id"]} if event["spill_id"] else None
+                    )
+                elif event["event"] == "plan_completed":
+                    summary = event
+        except PlanValidationError as e:
+            summary = {"success": False, "failed_nodes": [], "deferred_nodes": [], "error": str(e)}
         
-        return "Processo concluído após múltiplas iterações."
+        if completed_nodes:
+            node_results = []
+            for event in completed_nodes:
+                node_result = {
+                    "node_id": event["node_id"],
+                    "tool": event["tool"],
+                    "success": event["success"],
+                    "result": event["compact_result"],
+                    "error": event["error"]
+                }
+                if event["spill_id"]:
+                    node_result["spill_id"] = event["spill_id"]
+                node_results.append((f"{event['node_id']}:{event['tool']}", node_result))
+            reasoning_context.add_results(node_results)
+        
+        return {
+            "success": summary.get("success", False),
+            "failed_nodes": summary.get("failed_nodes", []),
+            "deferred_nodes": summary.get("deferred_nodes", []),
+            "error": summary.get("error")
+        }
+    
+    def _compact_plan_result(self, event: Dict[str, Any]) -> None:
+        """Garante a versão compacta do resultado de um nó (como compact_result no ReAct)
+        
+        O resultado completo continua em "result", só para as referências ${...} dos passos
+        seguintes; contexto e memória recebem a prévia com spill_id. Nós for_each juntam as
+        prévias dos itens, e o conjunto também é despejado se ficar grande.
+        """
+        event.setdefault("compact_result", event.get("result"))
+        event.setdefault("spill_id", None)
+        if event["spill_id"] is None and event["success"]:
+            handle = self.tool_manager.spill_store.maybe_spill(event["compact_result"])
+            if handle:
+                event["compact_result"] = handle["preview"]
+                event["spill_id"] = handle["spill_id"]
+    
+    def _request_plan(self, reasoning_context: ReasoningContext, instruction: str) -> Optional[Dict[str, Any]]:
+        """Pede um plano ao LLM e o interpreta ({"steps": [...], "answer": ...})"""
+        response = self._generate(
+            [instruction, "\n\n"] + reasoning_context.segments(estimate_tokens(instruction)),
+            phase="planning"
+        )
+        
+        match = re.search(r'```json\s*(\{.*\})\s*```', response, re.DOTALL) or re.search(r'\{.*\}', response, re.DOTALL)
+        if not match:
+            return None
+        try:
+            plan = json.loads(match.group(1) if match.re.groups else match.group(0))
+        except json.JSONDecodeError as e:
+            self.memory.add_entry("error", f"Erro ao interpretar plano: {str(e)}")
+            return None
+        
+        if not isinstance(plan, dict) or not isinstance(plan.get("steps", []), list):
+            return None
+        plan["steps"] = [step for step in plan.get("steps", []) if isinstance(step, dict) and step.get("tool")]
+        return plan
+    
+    def _get_planning_prompt(self) -> str:
+        """Prompt de planejamento com as ferramentas e seus parâmetros"""
+        return """Você é um agente autônomo inteligente. Planeje de uma vez TODAS as chamadas de ferramentas necessárias para atender à requisição do usuário.
+
+FERRAMENTAS DISPONÍVEIS:
+""" + self._format_tools_for_planning() + """
+
+Responda APENAS com um bloco ```json no formato:
+{
+  "steps": [
+    {"id": "passo1", "tool": "nome_da_ferramenta", "parameters": {"parametro": "valor"}, "depends_on": [], "checkpoint": false}
+  ],
+  "answer": null
+}
+
+REGRAS DO PLANO:
+- Use "${id}" ou "${id.campo}" nos parâmetros para usar o resultado de um passo anterior
+- Use "for_each": "${id.lista}" para repetir um passo para cada item (o item atual é "${item}")
+- Passos sem dependência entre si são executados em paralelo
+- Marque "checkpoint": true nos passos cujo resultado precisa ser avaliado antes de continuar
+- Se nenhuma ferramenta for necessária, use "steps": [] e escreva a resposta em "answer"."""
+
+    def _get_revision_prompt(self, steps: List[Dict[str, Any]], outcome: Dict[str, Any], results: Dict[str, Any]) -> str:
+        """Prompt de revisão do plano após falha ou checkpoint"""
+        pending = [step for step in steps if step.get("id") in set(outcome["failed_nodes"]) | set(outcome["deferred_nodes"])]
+        reason = f"Erro: {outcome['error']}" if outcome.get("error") else (
+            f"Passos com falha: {outcome['failed_nodes']}" if outcome["failed_nodes"] else "Checkpoint atingido"
+        )
+        
+        return self._get_planning_prompt() + f"""
+
+REVISÃO DO PLANO ({reason}):
+Os resultados dos passos já executados estão abaixo e podem ser referenciados pelos seus ids: {sorted(results)}.
+Passos ainda não concluídos do plano anterior: {json.dumps(pending, ensure_ascii=False, default=str)}
+Responda com os passos restantes (ids novos, sem repetir os já concluídos) ou "steps": [] se não for necessário continuar."""
+
+    def _format_tools_for_planning(self) -> str:
+        """Formata as ferramentas com os nomes dos parâmetros (* = obrigatório)"""
+        tool_descriptions = []
+        for tool in self._select_tools(self._retrieval_query()):
+            func_info = tool["function"]
+            parameters = func_info.get("parameters") or {}
+            required = set(parameters.get("required", []))
+            signature = ", ".join(
+                f"{name}{'*' if name in required else ''}: {schema.get('type', 'any')}"
+                for name, schema in parameters.get("properties", {}).items()
+            )
+            tool_descriptions.append(f"- {func_info['name']}({signature}): {func_info['description']}")
+        
+        return "\n".join(tool_descriptions) if tool_descriptions else "Nenhuma ferramenta disponível."
+    
+    def _get_tool_definitions(self) -> List[Dict[str, Any]]:
+        """Definições das ferramentas no formato de funções, refeitas só quando o catálogo muda"""
+        version = self.tool_manager.catalog_version
+        if self._tool_definitions_cache is None or self._tool_definitions_cache[0] != version:
+            self._tool_definitions_cache = (version, self.tool_manager.get_tool_definitions())
+        return self._tool_definitions_cache[1]
+    
+    def _select_tools(self, query: str) -> List[Dict[str, Any]]:
+        """Definições das ferramentas relevantes para a consulta (todas, sem o seletor)"""
+        tool_definitions = self._get_tool_definitions()
+        if self.tool_retriever is None or not query:
+            return tool_definitions
+        with tracer.span("reasoning.select_tools", available=len(tool_definitions)) as span:
+            selected = self.tool_retriever.select(query, tool_definitions, self.tool_manager.catalog_version)
+            if span:
+                span.set_attribute("selected", len(selected))
+        return selected
+    
+    def _retrieval_query(self, reasoning_context: Optional[ReasoningContext] = None) -> str:
+        """Consulta do seletor de ferramentas: requisição do usuário mais as ações do último turno"""
+        parts = [self.current_task["input"]] if self.current_task else []
+        if reasoning_context is not None and reasoning_context.entries:
+            for action_name, action_result in reasoning_context.entries[-1]["results"]:
+                content = action_result.get("result") if action_result.get("success") else action_result.get("error")
+                parts.append(f"{action_name} {str(content)[:200]}")
+        return " ".join(parts)
     
     def _prepare_context(self, user_input: str) -> str:
         """Prepara o contexto para o LLM"""
@@ -182,9 +1040,29 @@ Se não precisar usar ferramentas, responda normalmente."""
         
         return "\n".join(context_parts)
     
-    def _format_tools_for_prompt(self) -> str:
+    def _get_formatted_system_prompt(self, tool_definitions: Optional[List[Dict[str, Any]]] = None) -> str:
+        """Retorna o prompt do sistema com as ferramentas, refeito só quando o catálogo ou o subconjunto muda"""
+        if tool_definitions is None:
+            tool_definitions = self._get_tool_definitions()
+        version = self.tool_manager.catalog_version
+        if self._formatted_prompt_cache[0] != version:
+            self._formatted_prompt_cache = (version, {})
+        prompts = self._formatted_prompt_cache[1]
+        
+        key = tuple(tool["function"]["name"] for tool in tool_definitions)
+        # get e não "in" + []: outra requisição pode limpar o cache entre as duas leituras
+        prompt = prompts.get(key)
+        if prompt is None:
+            if len(prompts) >= 64:
+                prompts.clear()
+            # replace e não format: o exemplo JSON do prompt contém chaves literais
+            prompt = self.system_prompt.replace("{tools}", self._format_tools_for_prompt(tool_definitions))
+            prompts[key] = prompt
+        return prompt
+    
+    def _format_tools_for_prompt(self, tool_definitions: Optional[List[Dict[str, Any]]] = None) -> str:
         """Formata as ferramentas para o prompt"""
-        tools = self.tool_manager.get_tool_definitions()
+        tools = self.tool_manager.get_tool_definitions() if tool_definitions is None else tool_definitions
         
         if not tools:
             return "Nenhuma ferramenta disponível."
@@ -199,22 +1077,45 @@ Se não precisar usar ferramentas, responda normalmente."""
         return "\n".join(tool_descriptions)
     
     def _extract_action(self, response: str) -> Optional[Dict[str, Any]]:
-        """Extrai ação do formato JSON da resposta"""
-        try:
-            # Procurar por blocos JSON
-            json_pattern = r'```json\s*(\{.*?\})\s*```'
-            matches = re.findall(json_pattern, response, re.DOTALL)
-            
-            if matches:
-                action_data = json.loads(matches[0])
-                if "action" in action_data and "parameters" in action_data:
-                    return action_data
-            
-            return None
+        """Extrai a primeira ação do formato JSON da resposta"""
+        actions = self._extract_actions(response)
+        return actions[0] if actions else None
+    
+    def _extract_actions(self, response: str) -> List[Dict[str, Any]]:
+        """Extrai todas as ações dos blocos JSON da resposta (objeto, lista ou {"actions": [...]})"""
+        actions = []
+        
+        # Procurar por blocos JSON
+        json_pattern = r'```json\s*([\[{].*?[\]}])\s*```'
+        for match in re.findall(json_pattern, response, re.DOTALL):
+            try:
+                data = json.loads(match)
+            except json.JSONDecodeError as e:
+                self.memory.add_entry("error", f"Erro ao extrair ação: {str(e)}")
+                continue
             
-        except Exception as e:
-            self.memory.add_entry("error", f"Erro ao extrair ação: {str(e)}")
-            return None
+            if isinstance(data, dict) and isinstance(data.get("actions"), list):
+                data = data["actions"]
+            for action_data in (data if isinstance(data, list) else [data]):
+                if isinstance(action_data, dict) and "action" in action_data and "parameters" in action_data:
+                    actions.append(action_data)
+        
+        return actions
+    
+    def _execute_actions(self, actions: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Executa as ações de um turno; mais de uma roda em paralelo (limites de categoria do ToolManager valem)"""
+        if len(actions) == 1:
+            return [self._execute_action(actions[0])]
+        
+        with tracer.span("reasoning.parallel_actions", actions=len(actions)):
+            # Cada ação roda em uma cópia do contexto atual para herdar o span
+            contexts = [contextvars.copy_context() for _ in actions]
+            with ThreadPoolExecutor(max_workers=max(1, min(len(actions), settings.max_parallel_actions))) as executor:
+                return list(executor.map(
+                    lambda context, action: context.run(self._execute_action, action),
+                    contexts,
+                    actions
+                ))
     
     def _execute_action(self, action_data: Dict[str, Any]) -> Dict[str, Any]:
         """Executa uma ação usando o tool manager"""
@@ -230,29 +1131,63 @@ Se não precisar usar ferramentas, responda normalmente."""
         )
         
         # Registrar na tarefa atual
+        task_action = {
+            "name": action_name,
+            "parameters": parameters,
+            "reasoning": reasoning,
+            "timestamp": datetime.now().isoformat()
+        }
         if self.current_task:
-            self.current_task["actions"].append({
-                "name": action_name,
-                "parameters": parameters,
-                "reasoning": reasoning,
-                "timestamp": datetime.now().isoformat()
-            })
+            self.current_task["actions"].append(task_action)
+        self._emit("tool_started", name=action_name, parameters=parameters)
+        
+        # Executar ferramenta (ferramentas de streaming são interrompidas ao atingir o limite de partes)
+        tool = self.tool_manager.get_tool_by_name(action_name)
+        speculation = _speculation.get()
+        # Chamada especulada: já reservada no orçamento quando foi disparada
+        result = speculation.take(action_name, parameters) if speculation is not None else None
+        refused = self._refused_tool_call() if result is None else None
+        if refused is not None:
+            # Limite de chamadas da requisição atingido: a ação é recusada sem executar
+            result = refused
+            task_action["refused"] = True
+        elif result is not None:
+            # Mesma chamada já disparada especulativamente
+            task_action["speculative"] = True
+        elif tool and tool.streaming:
+            result = self.tool_manager.run_stream(action_name, parameters, max_chunks=settings.tool_stream_max_chunks)
+        else:
+            result = self.tool_manager.execute_tool(action_name, parameters)
+        task_action["success"] = result.success
+        self._emit(
+            "tool_finished",
+            name=action_name,
+            success=result.success,
+            error=result.error,
+            execution_time=result.execution_time
+        )
         
-        # Executar ferramenta
-        result = self.tool_manager.execute_tool(action_name, parameters)
+        # Resultados grandes chegam como prévia + spill_id (conteúdo completo via read_tool_result)
+        compact_result = result.compact_result()
         
         # Registrar resultado
         self.memory.add_entry(
             "result",
-            f"Resultado de {action_name}: {'Sucesso' if result.success else 'Erro'} - {result.result or result.error}"
+            f"Resultado de {action_name}: {'Sucesso' if result.success else 'Erro'} - {compact_result or result.error}",
+            {"spill_id": result.spill_id} if result.spill_id else None
         )
         
-        return {
+        action_result = {
             "success": result.success,
-            "result": result.result,
+            "result": compact_result,
             "error": result.error,
             "execution_time": result.execution_time
         }
+        if result.spill_id:
+            action_result["spill_id"] = result.spill_id
+            action_result["result_size"] = result.result_size
+        
+        return action_result
     
     def _simulate_response(self, user_input: str) -> str:
         """Simula uma resposta quando o LLM não está disponível"""
@@ -274,24 +1209,93 @@ Se não precisar usar ferramentas, responda normalmente."""
             return f"Recebi sua requisição: '{user_input}'. No modo simulação, eu analisaria a tarefa, planejaria as ações necessárias e executaria as ferramentas apropriadas para completar sua solicitação."
     
     def get_current_task_status(self) -> Optional[Dict[str, Any]]:
-        """Retorna o status da tarefa atual"""
-        return self.current_task
+        """Retorna a tarefa da requisição atual ou, fora de uma requisição, a mais recente em andamento"""
+        task = self.current_task
+        if task is not None:
+            return task
+        with self._tasks_lock:
+            return list(self._active_tasks.values())[-1] if self._active_tasks else None
+    
+    def get_last_task(self) -> Optional[Dict[str, Any]]:
+        """Retorna a última tarefa encerrada no contexto atual (ex.: a da requisição HTTP em curso)"""
+        return _last_task.get()
+    
+    def get_active_tasks(self) -> List[Dict[str, Any]]:
+        """Retorna as tarefas em andamento (uma por requisição simultânea)"""
+        with self._tasks_lock:
+            return list(self._active_tasks.values())
     
     def get_task_history(self, count: int = 10) -> List[Dict[str, Any]]:
         """Retorna o histórico de tarefas"""
-        return self.task_history[-count:] if count > 0 else self.task_history
+        with self._tasks_lock:
+            history = list(self.task_history)
+        return history[-count:] if count > 0 else history
     
     def clear_task_history(self) -> None:
         """Limpa o histórico de tarefas"""
-        self.task_history.clear()
+        with self._tasks_lock:
+            self.task_history.clear()
+    
+    def shutdown(self) -> None:
+        """Encerra os trabalhadores em segundo plano (execução especulativa e pool de processos)"""
+        if self.speculator is not None:
+            self.speculator.shutdown()
+            self.speculator = None
+        self.tool_manager.disable_process_pool()
     
     def get_reasoning_statistics(self) -> Dict[str, Any]:
         """Retorna estatísticas do núcleo de raciocínio"""
+        with self._tasks_lock:
+            task_history = list(self.task_history)
+            active_tasks = list(self._active_tasks.values())
+        
+        # Comparação de chamadas ao LLM por tarefa entre as estratégias
+        llm_calls_by_strategy: Dict[str, Dict[str, Any]] = {}
+        for task in task_history:
+            strategy_stats = llm_calls_by_strategy.setdefault(task.get("strategy", "react"), {"tasks": 0, "llm_calls": 0})
+            strategy_stats["tasks"] += 1
+            strategy_stats["llm_calls"] += task.get("llm_calls", 0)
+        for strategy_stats in llm_calls_by_strategy.values():
+            strategy_stats["average_llm_calls"] = strategy_stats["llm_calls"] / strategy_stats["tasks"]
+        
+        # Distribuição por fase dos tempos e tamanhos registrados em cada iteração
+        samples: Dict[str, List[float]] = {}
+        for task in task_history:
+            for record in task.get("iteration_timings", []):
+                for field in _TIMING_PHASES + _SIZE_FIELDS:
+                    if field in record:
+                        samples.setdefault(field, []).append(record[field])
+        latency_breakdown = {
+            field: dict(
+                nearest_rank_percentiles(samples[field]),
+                count=len(samples[field]),
+                mean=sum(samples[field]) / len(samples[field]),
+                total=sum(samples[field])
+            )
+            for field in _TIMING_PHASES + _SIZE_FIELDS
+            if samples.get(field)
+        }
+        
+        # Requisições encerradas por orçamento, por limite esgotado
+        budget_exhausted: Dict[str, int] = {}
+        for task in task_history:
+            if task.get("budget_exhausted"):
+                budget_exhausted[task["budget_exhausted"]] = budget_exhausted.get(task["budget_exhausted"], 0) + 1
+        
         return {
-            "total_tasks": len(self.task_history),
-            "completed_tasks": sum(1 for task in self.task_history if task.get("status") == "completed"),
-            "current_task_id": self.current_task.get("id") if self.current_task else None,
-            "average_iterations": sum(task.get("iterations", 0) for task in self.task_history) / len(self.task_history) if self.task_history else 0,
+            "total_tasks": len(task_history),
+            "completed_tasks": sum(1 for task in task_history if task.get("status") == "completed"),
+            "current_task_id": active_tasks[-1].get("id") if active_tasks else None,
+            "active_tasks": len(active_tasks),
+            "average_iterations": sum(task.get("iterations", 0) for task in task_history) / len(task_history) if task_history else 0,
+            "strategy": self.strategy,
+            "llm_calls_by_strategy": llm_calls_by_strategy,
+            "latency_breakdown": latency_breakdown,
+            "budget_exhausted": budget_exhausted,
+            "plan_cache": self.plan_cache.get_status() if self.plan_cache is not None else None,
+            "tool_retrieval": self.tool_retriever.get_status() if self.tool_retriever is not None else None,
+            "speculation": self.speculator.get_status() if self.speculator is not None else None,
+            "cassette": self.llm.cassette.get_status() if self.llm.cassette is not None else None,
             "llm_provider": self.llm.get_provider_info()
         }
 
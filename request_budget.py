@@ -0,0 +1,113 @@
+"""
+Orçamento por Requisição - Limites de tokens, tempo total e chamadas de ferramentas
+"""
+import threading
+import time
+from typing import Dict, Any, Optional
+
+
+class RequestBudget:
+    """Consumo de uma requisição frente aos seus limites (0 desativa um limite)
+    
+    Tokens são estimados a partir do texto enviado ao LLM e do texto recebido. O
+    raciocínio consulta exhausted() entre os passos e, esgotado um limite, encerra com
+    a resposta final a partir do contexto parcial. Toda chamada de ferramenta (inclusive
+    passos de planos e chamadas especulativas) é reservada com try_tool_call antes de
+    ser disparada; além do limite, é recusada.
+    
+    O tempo restante (remaining_time) vai como timeout para as chamadas ao LLM. Ferramentas
+    já em execução não são interrompidas: um passo longo pode ultrapassar max_wall_time,
+    e o esgotamento só é percebido ao final dele.
+    """
+    
+    TOKENS = "tokens"
+    WALL_TIME = "wall_time"
+    TOOL_CALLS = "tool_calls"
+    
+    def __init__(self, max_tokens: int = 0, max_wall_time: float = 0, max_tool_calls: int = 0):
+        self.max_tokens = max_tokens
+        self.max_wall_time = max_wall_time
+        self.max_tool_calls = max_tool_calls
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.tool_calls = 0
+        self.refused_tool_calls = 0
+        self._start = time.monotonic()
+        self._exhausted: Optional[str] = None
+        self._lock = threading.Lock()
+    
+    @property
+    def total_tokens(self) -> int:
+        """Tokens estimados de prompt e resposta somados"""
+        return self.prompt_tokens + self.completion_tokens
+    
+    @property
+    def elapsed(self) -> float:
+        """Segundos desde o início da requisição"""
+        return time.monotonic() - self._start
+    
+    def add_tokens(self, prompt_tokens: int = 0, completion_tokens: int = 0) -> None:
+        """Contabiliza uma chamada ao LLM"""
+        with self._lock:
+            self.prompt_tokens += prompt_tokens
+            self.completion_tokens += completion_tokens
+    
+    def remaining_time(self) -> Optional[float]:
+        """Segundos restantes do limite de tempo total (None se não houver limite)"""
+        if not self.max_wall_time:
+            return None
+        return max(0.0, self.max_wall_time - self.elapsed)
+    
+    def release_tool_calls(self, count: int = 1) -> None:
+        """Devolve reservas de chamadas que acabaram não executadas (ex.: especulação cancelada)"""
+        with self._lock:
+            self.tool_calls = max(0, self.tool_calls - count)
+    
+    def try_tool_call(self, optional: bool = False) -> bool:
+        """Reserva uma chamada de ferramenta; False se o limite já foi atingido
+        
+        Chamadas opcionais (ex.: especulativas) recusadas não contam como recusa nem
+        marcam o orçamento como esgotado.
+        """
+        with self._lock:
+            if self.max_tool_calls and self.tool_calls >= self.max_tool_calls:
+                if optional:
+                    return False
+                self.refused_tool_calls += 1
+                self._exhausted = self._exhausted or self.TOOL_CALLS
+                return False
+            self.tool_calls += 1
+            return True
+    
+    def exhausted(self) -> Optional[str]:
+        """Primeiro limite esgotado ("tokens", "wall_time" ou "tool_calls"), ou None"""
+        with self._lock:
+            if self._exhausted is None:
+                if self.max_tokens and self.prompt_tokens + self.completion_tokens >= self.max_tokens:
+                    self._exhausted = self.TOKENS
+                elif self.max_wall_time and self.elapsed >= self.max_wall_time:
+                    self._exhausted = self.WALL_TIME
+                elif self.max_tool_calls and self.tool_calls >= self.max_tool_calls:
+                    self._exhausted = self.TOOL_CALLS
+            return self._exhausted
+    
+    def get_status(self) -> Dict[str, Any]:
+        """Retorna limites, consumo e o limite esgotado (se houver)"""
+        exhausted = self.exhausted()
+        with self._lock:
+            return {
+                "limits": {
+                    "tokens": self.max_tokens or None,
+                    "wall_time": self.max_wall_time or None,
+                    "tool_calls": self.max_tool_calls or None
+                },
+                "consumed": {
+                    "prompt_tokens": self.prompt_tokens,
+                    "completion_tokens": self.completion_tokens,
+                    "tokens": self.prompt_tokens + self.completion_tokens,
+                    "wall_time": round(self.elapsed, 3),
+                    "tool_calls": self.tool_calls
+                },
+                "refused_tool_calls": self.refused_tool_calls,
+                "exhausted": exhausted
+            }
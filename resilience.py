@@ -0,0 +1,165 @@
+"""
+Resiliência de Ferramentas de Rede - Políticas de retentativa e circuit breakers
+"""
+import random
+import re
+import threading
+import time
+from typing import Dict, Any, List, Optional
+from urllib.parse import urlparse
+from pydantic import BaseModel
+
+
+class RetryPolicy(BaseModel):
+    """Política declarativa de retentativa com backoff exponencial e jitter"""
+    max_attempts: int = 3
+    base_delay: float = 0.5
+    max_delay: float = 8.0
+    multiplier: float = 2.0
+    jitter: bool = True
+    max_total_time: float = 30.0
+    
+    # Erros considerados transitórios (nome da exceção ou expressão regular sobre a mensagem)
+    retryable_exceptions: List[str] = [
+        "TimeoutError", "Timeout", "ConnectionError", "ConnectTimeout", "ReadTimeout",
+        "TimeoutException", "WebDriverException", "ChunkedEncodingError"
+    ]
+    retryable_error_patterns: List[str] = [
+        r"\btimed? ?out\b",
+        r"\bconnection (?:refused|reset|aborted|error|closed)\b",
+        r"\bfailed to establish a new connection\b",
+        r"\btemporar(?:il)?y unavailable\b|\btemporary failure\b",
+        r"\btoo many requests\b|\bservice unavailable\b|\bbad gateway\b|\bgateway time-?out\b",
+        # Códigos HTTP só quando aparecem como status (ex.: "HTTP 503", "status 429", "502 Server Error")
+        r"\b(?:http|status|status code|error|erro)\W{0,3}(?:429|500|502|503|504)\b",
+        r"\b(?:429|500|502|503|504) (?:client |server )?error\b|\b500 internal server error\b"
+    ]
+    
+    def delay_for(self, attempt: int) -> float:
+        """Calcula a espera antes da próxima tentativa (attempt começa em 1)"""
+        delay = min(self.max_delay, self.base_delay * (self.multiplier ** (attempt - 1)))
+        # Full jitter: espalha as retentativas de vários clientes
+        return random.uniform(0, delay) if self.jitter else delay
+    
+    def is_retryable(self, error: Optional[str], exception: Optional[BaseException] = None) -> bool:
+        """Verifica se o erro é transitório segundo a política"""
+        if exception is not None:
+            exception_names = {cls.__name__ for cls in type(exception).__mro__}
+            if exception_names.intersection(self.retryable_exceptions):
+                return True
+        
+        error_text = error or ""
+        return any(re.search(pattern, error_text, re.IGNORECASE) for pattern in self.retryable_error_patterns)
+
+
+class CircuitBreaker:
+    """Circuit breaker: após falhas consecutivas, rejeita chamadas até o tempo de recuperação"""
+    
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+    
+    def __init__(self, failure_threshold: int = 5, recovery_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.total_rejections = 0
+        self._half_open_in_flight = False
+        self._lock = threading.Lock()
+    
+    def allow(self) -> bool:
+        """Indica se uma chamada pode prosseguir"""
+        with self._lock:
+            if self.state == self.OPEN:
+                if time.monotonic() - self.opened_at >= self.recovery_timeout:
+                    # Deixar passar uma chamada de teste
+                    self.state = self.HALF_OPEN
+                    self._half_open_in_flight = False
+                else:
+                    self.total_rejections += 1
+                    return False
+            
+            if self.state == self.HALF_OPEN:
+                if self._half_open_in_flight:
+                    self.total_rejections += 1
+                    return False
+                self._half_open_in_flight = True
+            
+            return True
+    
+    def release(self) -> None:
+        """Libera a chamada de teste sem registrar resultado (chamada não executada)"""
+        with self._lock:
+            self._half_open_in_flight = False
+    
+    def record_success(self) -> None:
+        """Registra sucesso e fecha o circuito"""
+        with self._lock:
+            self.state = self.CLOSED
+            self.consecutive_failures = 0
+            self._half_open_in_flight = False
+    
+    def record_failure(self) -> None:
+        """Registra falha; abre o circuito ao atingir o limite"""
+        with self._lock:
+            self.consecutive_failures += 1
+            self._half_open_in_flight = False
+            if self.state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+    
+    def retry_after(self) -> float:
+        """Segundos restantes até a próxima chamada de teste"""
+        if self.state != self.OPEN:
+            return 0.0
+        return max(0.0, self.recovery_timeout - (time.monotonic() - self.opened_at))
+    
+    def get_status(self) -> Dict[str, Any]:
+        """Retorna o estado do circuit breaker"""
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "total_rejections": self.total_rejections,
+            "retry_after": self.retry_after()
+        }
+
+
+class CircuitBreakerRegistry:
+    """Mantém circuit breakers por ferramenta e por host"""
+    
+    def __init__(self, failure_threshold: int = 5, recovery_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.breakers: Dict[str, CircuitBreaker] = {}
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def extract_host(parameters: Dict[str, Any]) -> Optional[str]:
+        """Identifica o host de destino a partir dos parâmetros da chamada"""
+        url = parameters.get("url")
+        if isinstance(url, str) and url:
+            return urlparse(url if "://" in url else f"http://{url}").netloc.lower() or None
+        engine = parameters.get("search_engine")
+        if isinstance(engine, str) and engine:
+            return f"engine:{engine.lower()}"
+        return None
+    
+    def get_breakers(self, tool_name: str, parameters: Dict[str, Any]) -> List[CircuitBreaker]:
+        """Retorna os breakers aplicáveis: o da ferramenta e, se houver, o do host"""
+        keys = [f"tool:{tool_name}"]
+        host = self.extract_host(parameters)
+        if host:
+            keys.append(f"host:{host}")
+        
+        with self._lock:
+            for key in keys:
+                if key not in self.breakers:
+                    self.breakers[key] = CircuitBreaker(self.failure_threshold, self.recovery_timeout)
+            return [self.breakers[key] for key in keys]
+    
+    def get_status(self) -> Dict[str, Any]:
+        """Retorna o estado de todos os breakers"""
+        with self._lock:
+            return {key: breaker.get_status() for key, breaker in self.breakers.items()}
@@ -0,0 +1,251 @@
+"""
+Área de Despejo de Resultados - Mantém resultados grandes de ferramentas em disco
+"""
+import json
+import os
+import threading
+import uuid
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional, Tuple
+
+
+def _is_continuation(byte: int) -> bool:
+    """Byte de continuação UTF-8 (10xxxxxx): não inicia um caractere"""
+    return byte & 0xC0 == 0x80
+
+
+class ResultSpillStore:
+    """Guarda resultados grandes em arquivos e devolve um handle compacto com prévia
+    
+    Arquivos de execuções anteriores são reindexados ao iniciar (e contam para
+    max_total_bytes); o diretório só é criado no primeiro despejo.
+    """
+    
+    def __init__(
+        self,
+        spill_directory: str = "./data/tool_results",
+        threshold_bytes: int = 64 * 1024,
+        preview_chars: int = 2000,
+        max_total_bytes: int = 512 * 1024 * 1024
+    ):
+        self.spill_directory = spill_directory
+        self.threshold_bytes = threshold_bytes
+        self.preview_chars = preview_chars
+        self.max_total_bytes = max_total_bytes
+        self.total_bytes = 0
+        self.entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        
+        self._load_existing()
+    
+    def _load_existing(self) -> None:
+        """Indexa os resultados deixados por execuções anteriores, do mais antigo ao mais novo"""
+        if not os.path.isdir(self.spill_directory):
+            return
+        
+        found = []
+        for file_name in os.listdir(self.spill_directory):
+            spill_id, extension = os.path.splitext(file_name)
+            if extension not in (".json", ".txt"):
+                continue
+            path = os.path.join(self.spill_directory, file_name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            found.append((stat.st_mtime, spill_id, path, stat.st_size, extension[1:]))
+        
+        with self._lock:
+            for _, spill_id, path, size, data_format in sorted(found):
+                self.entries[spill_id] = {"path": path, "size": size, "format": data_format}
+                self.total_bytes += size
+            self._evict()
+    
+    def _serialize(self, result: Any) -> tuple:
+        """Serializa o resultado, preferindo JSON para permitir recarregar a estrutura"""
+        if isinstance(result, str):
+            return result, "text"
+        try:
+            return json.dumps(result, ensure_ascii=False, default=str), "json"
+        except (TypeError, ValueError):
+            return str(result), "text"
+    
+    def maybe_spill(self, result: Any) -> Optional[Dict[str, Any]]:
+        """Despeja o resultado em disco se exceder o limite; retorna o handle ou None"""
+        if result is None:
+            return None
+        
+        # Escalares nunca ultrapassam o limite
+        if isinstance(result, (int, float, bool)):
+            return None
+        
+        serialized, data_format = self._serialize(result)
+        payload = serialized.encode("utf-8")
+        if len(payload) <= self.threshold_bytes:
+            return None
+        
+        spill_id, path = self._new_path(data_format)
+        with open(path, "wb") as f:
+            f.write(payload)
+        
+        return self._register(spill_id, path, len(payload), data_format, serialized)
+    
+    def stream_writer(self) -> "StreamSpillWriter":
+        """Cria um acumulador de partes de um resultado em streaming (ver StreamSpillWriter)"""
+        return StreamSpillWriter(self)
+    
+    def _new_path(self, data_format: str) -> Tuple[str, str]:
+        """Gera o identificador e o caminho do arquivo de um novo resultado"""
+        spill_id = uuid.uuid4().hex[:16]
+        os.makedirs(self.spill_directory, exist_ok=True)
+        path = os.path.join(self.spill_directory, f"{spill_id}.{'json' if data_format == 'json' else 'txt'}")
+        return spill_id, path
+    
+    def _register(self, spill_id: str, path: str, size: int, data_format: str, head: str) -> Dict[str, Any]:
+        """Indexa um arquivo já gravado e retorna o seu handle"""
+        handle = {
+            "spill_id": spill_id,
+            "size": size,
+            "format": data_format,
+            "preview": self._build_preview(head, spill_id, size)
+        }
+        
+        with self._lock:
+            self.entries[spill_id] = {"path": path, "size": size, "format": data_format}
+            self.total_bytes += size
+            self._evict()
+        
+        return handle
+    
+    def _build_preview(self, serialized: str, spill_id: str, size: int) -> str:
+        """Monta a prévia com a referência para leitura sob demanda"""
+        return (
+            f"{serialized[:self.preview_chars]}... "
+            f"[resultado truncado: {size} bytes; use read_tool_result com spill_id='{spill_id}']"
+        )
+    
+    def _evict(self) -> None:
+        """Remove os resultados mais antigos quando a área excede o limite"""
+        while self.total_bytes > self.max_total_bytes and len(self.entries) > 1:
+            _, entry = self.entries.popitem(last=False)
+            self.total_bytes -= entry["size"]
+            try:
+                os.remove(entry["path"])
+            except OSError:
+                pass
+    
+    def read(self, spill_id: str, offset: int = 0, length: Optional[int] = None) -> Optional[str]:
+        """Lê um trecho (em bytes) do resultado despejado
+        
+        Os limites são ajustados aos caracteres UTF-8: um caractere pertence ao trecho em
+        que começa. Trechos consecutivos (offset, offset + length, ...) reconstituem o texto
+        sem perder nem repetir caracteres multibyte.
+        """
+        with self._lock:
+            entry = self.entries.get(spill_id)
+        if not entry:
+            return None
+        
+        bounded = length is not None and length >= 0
+        with open(entry["path"], "rb") as f:
+            f.seek(max(offset, 0))
+            # Até 3 bytes a mais para completar o último caractere
+            data = f.read(length + 3 if bounded else -1)
+        
+        start = 0
+        while start < len(data) and _is_continuation(data[start]):
+            start += 1
+        end = min(length, len(data)) if bounded else len(data)
+        while end < len(data) and _is_continuation(data[end]):
+            end += 1
+        return data[start:max(start, end)].decode("utf-8", errors="replace")
+    
+    def load(self, spill_id: str) -> Any:
+        """Carrega o resultado completo, reconstruindo a estrutura JSON quando possível"""
+        with self._lock:
+            entry = self.entries.get(spill_id)
+        if not entry:
+            raise KeyError(f"Resultado '{spill_id}' não encontrado")
+        
+        content = self.read(spill_id)
+        return json.loads(content) if entry["format"] == "json" else content
+    
+    def clear(self) -> None:
+        """Remove todos os resultados despejados"""
+        with self._lock:
+            for entry in self.entries.values():
+                try:
+                    os.remove(entry["path"])
+                except OSError:
+                    pass
+            self.entries.clear()
+            self.total_bytes = 0
+    
+    def get_status(self) -> Dict[str, Any]:
+        """Retorna o estado da área de despejo"""
+        return {
+            "spilled_results": len(self.entries),
+            "total_bytes": self.total_bytes,
+            "threshold_bytes": self.threshold_bytes,
+            "spill_directory": self.spill_directory
+        }
+
+
+class StreamSpillWriter:
+    """Acumula as partes de um resultado em streaming sem mantê-lo inteiro em memória
+    
+    Enquanto a lista serializada couber no limite do ResultSpillStore, as partes ficam em
+    memória; ao ultrapassá-lo, são gravadas de forma incremental como um array JSON e só
+    o início (para a prévia) continua em memória.
+    """
+    
+    def __init__(self, store: ResultSpillStore):
+        self.store = store
+        self.chunks: List[Any] = []
+        self.count = 0
+        self.size = 2  # "[" e "]"
+        self.head = ""
+        self.spill_id: Optional[str] = None
+        self.path: Optional[str] = None
+        self._file = None
+    
+    def append(self, chunk: Any) -> None:
+        """Adiciona uma parte, passando a gravar em disco ao exceder o limite"""
+        serialized = json.dumps(chunk, ensure_ascii=False, default=str)
+        separator = ", " if self.count else ""
+        self.count += 1
+        self.size += len(f"{separator}{serialized}".encode("utf-8"))
+        if len(self.head) < self.store.preview_chars:
+            self.head = (self.head or "[") + separator + serialized
+        
+        if self._file is not None:
+            self._file.write(f"{separator}{serialized}".encode("utf-8"))
+            return
+        
+        self.chunks.append(chunk)
+        if self.size > self.store.threshold_bytes:
+            self.spill_id, self.path = self.store._new_path("json")
+            self._file = open(self.path, "wb")
+            self._file.write(json.dumps(self.chunks, ensure_ascii=False, default=str)[:-1].encode("utf-8"))
+            self.chunks = []
+    
+    def finish(self) -> Tuple[Optional[List[Any]], Optional[Dict[str, Any]]]:
+        """Encerra o acúmulo: (partes, None) se couberam em memória, ou (None, handle) se despejadas"""
+        if self._file is None:
+            return self.chunks, None
+        
+        self._file.write(b"]")
+        self._file.close()
+        self._file = None
+        return None, self.store._register(self.spill_id, self.path, self.size, "json", self.head)
+    
+    def discard(self) -> None:
+        """Descarta as partes (ex.: a ferramenta retornou um valor próprio)"""
+        self.chunks = []
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
@@ -1,9 +1,10 @@
 """
 Módulo de Pesquisa Web - Busca de informações na internet
 """
+import codecs
 import requests
 import json
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Iterator, Union
 from datetime import datetime
 from bs4 import BeautifulSoup
 from urllib.parse import quote_plus, urljoin
@@ -12,6 +13,15 @@ from urllib.parse import quote_plus, urljoin
 class SearchModule:
     """Módulo para pesquisa de informações na web"""
     
+    # Ferramentas sem efeitos colaterais (só consultam): podem ser executadas especulativamente
+    READ_ONLY_TOOLS = frozenset({
+        "search_web", "fetch_page_content", "fetch_page_content_stream", "search_images",
+        "get_search_suggestions", "get_search_history", "get_search_statistics"
+    })
+    
+    # Análise de HTML com BeautifulSoup segura o GIL: roda no pool de processos quando ele está ativo
+    CPU_BOUND_TOOLS = frozenset({"fetch_page_content"})
+    
     def __init__(self):
         self.search_history = []
         self.max_history_size = 1000
@@ -275,35 +285,79 @@ class SearchModule:
             }
             
             if extract_text and 'text/html' in response.headers.get('content-type', ''):
-                soup = BeautifulSoup(response.content, 'html.parser')
-                
-                # Remover scripts e estilos
-                for script in soup(["script", "style"]):
-                    script.decompose()
-                
-                # Extrair texto
-                text = soup.get_text(strip=True, separator=' ')
-                content_info["text"] = text
-                content_info["text_length"] = len(text)
+                content_info.update(self._extract_html_info(response.content, url))
+            
+            return {
+                "success": True,
+                "content": content_info
+            }
+        
+        except Exception as e:
+            return {
+                "success": False,
+                "error": str(e),
+                "url": url
+            }
+    
+    def fetch_page_content_stream(
+        self,
+        url: str,
+        extract_text: bool = True,
+        chunk_size: int = 16384,
+        max_bytes: Optional[int] = None
+    ) -> Iterator[Dict[str, Any]]:
+        """Baixa uma página produzindo cada bloco recebido, sem esperar o corpo inteiro
+        
+        Retorna (valor do gerador) o mesmo resultado de fetch_page_content; com max_bytes,
+        o download é interrompido ao atingir o limite.
+        """
+        try:
+            with self.session.get(url, timeout=15, stream=True) as response:
+                response.raise_for_status()
+                content_type = response.headers.get('content-type', '')
+                # Decodificador incremental: caracteres multibyte podem cruzar blocos
+                decoder = codecs.getincrementaldecoder(response.encoding or 'utf-8')(errors='replace')
                 
-                # Extrair título
-                title_elem = soup.find('title')
-                content_info["title"] = title_elem.get_text(strip=True) if title_elem else ""
+                # Só o texto decodificado é guardado, e só quando for extraído no final
+                keep_text = extract_text and 'text/html' in content_type
+                text_parts: List[str] = []
+                received = 0
+                truncated = False
+                for block in response.iter_content(chunk_size=chunk_size):
+                    received += len(block)
+                    chunk = decoder.decode(block)
+                    if keep_text:
+                        text_parts.append(chunk)
+                    yield {
+                        "bytes_received": received,
+                        "chunk": chunk
+                    }
+                    if max_bytes and received >= max_bytes:
+                        truncated = True
+                        break
                 
-                # Extrair meta description
-                meta_desc = soup.find('meta', attrs={'name': 'description'})
-                content_info["description"] = meta_desc.get('content', '') if meta_desc else ""
+                if not truncated:
+                    # Bytes retidos pelo decodificador (sequência incompleta no último bloco)
+                    tail = decoder.decode(b"", final=True)
+                    if tail:
+                        if keep_text:
+                            text_parts.append(tail)
+                        yield {
+                            "bytes_received": received,
+                            "chunk": tail
+                        }
                 
-                # Extrair links
-                links = []
-                for link in soup.find_all('a', href=True):
-                    href = link['href']
-                    if href.startswith('http') or href.startswith('/'):
-                        links.append({
-                            "text": link.get_text(strip=True),
-                            "href": urljoin(url, href)
-                        })
-                content_info["links"] = links[:50]  # Limitar a 50 links
+                content_info = {
+                    "url": url,
+                    "status_code": response.status_code,
+                    "content_type": content_type,
+                    "content_length": received,
+                    "truncated": truncated,
+                    "timestamp": datetime.now().isoformat()
+                }
+            
+            if keep_text:
+                content_info.update(self._extract_html_info("".join(text_parts), url))
             
             return {
                 "success": True,
@@ -317,6 +371,42 @@ class SearchModule:
                 "url": url
             }
     
+    def _extract_html_info(self, content: Union[bytes, str], url: str) -> Dict[str, Any]:
+        """Extrai texto, título, descrição e links de um HTML"""
+        soup = BeautifulSoup(content, 'html.parser')
+        
+        # Remover scripts e estilos
+        for script in soup(["script", "style"]):
+            script.decompose()
+        
+        # Extrair texto
+        text = soup.get_text(strip=True, separator=' ')
+        info = {
+            "text": text,
+            "text_length": len(text)
+        }
+        
+        # Extrair título
+        title_elem = soup.find('title')
+        info["title"] = title_elem.get_text(strip=True) if title_elem else ""
+        
+        # Extrair meta description
+        meta_desc = soup.find('meta', attrs={'name': 'description'})
+        info["description"] = meta_desc.get('content', '') if meta_desc else ""
+        
+        # Extrair links
+        links = []
+        for link in soup.find_all('a', href=True):
+            href = link['href']
+            if href.startswith('http') or href.startswith('/'):
+                links.append({
+                    "text": link.get_text(strip=True),
+                    "href": urljoin(url, href)
+                })
+        info["links"] = links[:50]  # Limitar a 50 links
+        
+        return info
+    
     def search_images(self, query: str, max_results: int = 20) -> Dict[str, Any]:
         """Busca imagens na web"""
         try:
@@ -20,17 +20,62 @@ class Settings(BaseSettings):
     openai_model: str = "gpt-4"  # Para OpenAI
     max_tokens: int = 4000
     temperature: float = 0.1
+    native_function_calling: bool = False  # Ferramentas enviadas como funções nativas (regex como alternativa)
     
     # Configurações de memória
     memory_max_tokens: int = 8000
     memory_persist_path: str = "./data/memory"
     
+    # Estratégia de raciocínio: "react" (uma ferramenta por chamada ao LLM) ou "plan_execute"
+    reasoning_strategy: str = "react"
+    plan_max_revisions: int = 2  # Revisões do plano (falha ou checkpoint) no modo plan_execute
+    task_history_max_entries: int = 500  # Tarefas concluídas mantidas no histórico
+    
+    # Cache de planos por intenção normalizada da requisição
+    plan_cache_enabled: bool = False  # Só planos de ferramentas somente leitura são guardados
+    plan_cache_max_entries: int = 200
+    plan_cache_similarity: float = 0.8  # Similaridade mínima para requisições sem parâmetros
+    
+    # Ações de um mesmo turno executadas em paralelo
+    max_parallel_actions: int = 4
+    plan_max_workers: int = 16  # Teto de max_workers aceito pela rota de execução de planos
+    stream_action_dispatch: bool = False  # Executar ações somente leitura assim que seu JSON fecha na resposta transmitida
+    speculative_tools_enabled: bool = False  # Antecipar ferramentas somente leitura prováveis durante a geração
+    speculative_max_calls: int = 2
+    
+    # Contexto do loop de raciocínio (janela deslizante de resultados de ações)
+    context_keep_last_results: int = 3  # Resultados mantidos na íntegra
+    context_max_tokens: int = 12000  # Teto estimado de tokens do prompt por iteração
+    context_summary_chars: int = 300  # Tamanho do resumo de resultados antigos
+    
+    # Gravação/reprodução (cassete) de respostas do LLM e resultados de ferramentas
+    cassette_mode: str = "off"  # "off", "record" ou "replay"
+    cassette_path: str = "./data/cassettes/reasoning.jsonl"
+    cassette_llm_latency: float = 0.0  # Latência sintética por resposta na reprodução (segundos)
+    cassette_tool_latency: float = 0.0  # Latência sintética por ferramenta na reprodução (segundos)
+    cassette_latency_scale: float = 0.0  # Fração da duração gravada somada à latência sintética
+    cassette_strict: bool = False  # Sem correspondência exata, falhar em vez de usar a próxima gravada
+    
     # Configurações de logging
     log_level: str = "INFO"
     log_file: str = "./logs/agent.log"
     
+    # Configurações de ferramentas
+    tool_stream_max_chunks: int = 500  # Partes consumidas pelo raciocínio antes de interromper uma ferramenta de streaming
+    tool_retrieval_enabled: bool = True  # Enviar ao LLM só as ferramentas relevantes (índice BM25)
+    tool_retrieval_top_k: int = 8
+    tool_retrieval_always_include: list = ["read_tool_result"]
+    tool_process_pool_workers: int = 2  # Processos para as ferramentas em CPU_BOUND_TOOLS (criados no primeiro uso); 0 desativa
+    
+    # Configurações de rastreamento (tracing)
+    tracing_enabled: bool = True
+    trace_export_path: Optional[str] = None  # Ex.: "./logs/traces.jsonl"
+    trace_buffer_size: int = 5000
+    
     # Configurações de segurança
-    max_execution_time: int = 300  # 5 minutos
+    max_execution_time: int = 300  # 5 minutos (também o limite de tempo total de cada requisição)
+    request_max_tokens: int = 100000  # Tokens estimados (prompt + resposta) por requisição; 0 desativa
+    request_max_tool_calls: int = 30  # Chamadas de ferramentas por requisição; 0 desativa
     allowed_file_extensions: list = [".txt", ".md", ".py", ".json", ".csv", ".html", ".css", ".js"]
     
     # Configurações de sistema operacional
@@ -2,15 +2,23 @@
 Módulo de Shell - Ferramentas para execução de comandos do sistema
 """
 import os
-import subprocess
 import time
-from typing import Dict, Any, List
+from collections import deque
+from typing import Dict, Any, List, Iterator
 from .windows_compatibility import windows_compat
 
 
 class ShellModule:
     """Módulo para execução de comandos shell com compatibilidade Windows/Linux"""
     
+    # Ferramentas que só consultam o sistema: podem ser executadas especulativamente
+    READ_ONLY_TOOLS = frozenset({
+        "list_directory", "get_system_info", "get_environment_variables", "find_executable"
+    })
+    
+    # Linhas finais mantidas no resumo de execute_command_stream (as demais já foram transmitidas)
+    STREAM_TAIL_LINES = 200
+    
     def __init__(self, workspace_dir: str):
         self.workspace_dir = workspace_dir
         self.compat = windows_compat
@@ -47,6 +55,36 @@ class ShellModule:
                     }
                 }
             },
+            {
+                "type": "function",
+                "function": {
+                    "name": "execute_command_stream",
+                    "description": "Executa um comando no shell transmitindo cada linha de saída conforme é produzida (útil para comandos longos)",
+                    "parameters": {
+                        "type": "object",
+                        "properties": {
+                            "command": {
+                                "type": "string",
+                                "description": "Comando a ser executado"
+                            },
+                            "args": {
+                                "type": "array",
+                                "items": {"type": "string"},
+                                "description": "Argumentos do comando (opcional)"
+                            },
+                            "working_dir": {
+                                "type": "string",
+                                "description": "Diretório de trabalho (opcional)"
+                            },
+                            "timeout": {
+                                "type": "integer",
+                                "description": "Tempo máximo em segundos (opcional, padrão: 30)"
+                            }
+                        },
+                        "required": ["command"]
+                    }
+                }
+            },
             {
                 "type": "function",
                 "function": {
@@ -151,6 +189,56 @@ class ShellModule:
                 "system": self.compat.is_windows and "Windows" or "Linux"
             }
     
+    def execute_command_stream(
+        self,
+        command: str,
+        args: List[str] = None,
+        working_dir: str = None,
+        timeout: int = 30
+    ) -> Iterator[Dict[str, Any]]:
+        """Executa um comando produzindo cada linha de saída assim que é escrita
+        
+        Retorna (valor do gerador) o mesmo resumo de execute_command, com apenas as últimas
+        STREAM_TAIL_LINES linhas em stdout para não acumular a saída inteira. Fechar o
+        gerador antes do fim encerra o processo.
+        """
+        work_dir = self.compat.normalize_path(working_dir) if working_dir else self.workspace_dir
+        system = self.compat.is_windows and "Windows" or "Linux"
+        
+        start_time = time.time()
+        lines = self.compat.execute_command_stream(command, args, work_dir, timeout)
+        output_lines = deque(maxlen=self.STREAM_TAIL_LINES)
+        line_count = 0
+        try:
+            while True:
+                try:
+                    line = next(lines)
+                except StopIteration as stop:
+                    returncode, timed_out = stop.value
+                    break
+                output_lines.append(line)
+                line_count += 1
+                yield {"stream": "output", "line": line}
+        except Exception as e:
+            return {
+                "success": False,
+                "error": f"Erro ao executar comando: {str(e)}",
+                "system": system
+            }
+        finally:
+            lines.close()
+        
+        return {
+            "success": returncode == 0,
+            "returncode": returncode,
+            "stdout": "".join(f"{line}\n" for line in output_lines),
+            "omitted_lines": line_count - len(output_lines),
+            "stderr": f"Comando expirou após {timeout} segundos" if timed_out else "",
+            "execution_time": time.time() - start_time,
+            "working_directory": work_dir,
+            "system": system
+        }
+    
     def list_directory(self, path: str = None) -> Dict[str, Any]:
         """Lista o conteúdo de um diretório"""
         try:
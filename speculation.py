@@ -0,0 +1,142 @@
+"""
+Execução Especulativa - Antecipa chamadas de ferramentas somente leitura enquanto o LLM gera
+"""
+import contextvars
+import json
+import threading
+import weakref
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Any, List, Optional, Tuple
+
+from .request_budget import RequestBudget
+from .tool_manager import ToolManager, ToolResult
+from .tool_retriever import ToolRetriever
+
+
+# Parâmetros que recebem o próprio texto do usuário (ex.: busca na web pelas palavras da requisição)
+_QUERY_PARAMETERS = {"query", "q", "search_query", "term"}
+
+
+def _call_key(name: str, parameters: Dict[str, Any]) -> str:
+    """Chave canônica de uma chamada (parâmetros nulos são ignorados)"""
+    canonical = {key: value for key, value in (parameters or {}).items() if value is not None}
+    return f"{name}:{json.dumps(canonical, sort_keys=True, ensure_ascii=False, default=str)}"
+
+
+class SpeculativeBatch:
+    """Chamadas especulativas disparadas para uma requisição"""
+    
+    def __init__(self, speculator: "ToolSpeculator", budget: Optional[RequestBudget] = None):
+        self._speculator = speculator
+        self._budget = budget
+        self._futures: Dict[str, Future] = {}
+        self._used: set = set()
+        self._lock = threading.Lock()
+    
+    def take(self, name: str, parameters: Dict[str, Any]) -> Optional[ToolResult]:
+        """Resultado da chamada, se ela foi especulada (aguarda se ainda estiver em execução)
+        
+        A chamada já foi descontada do orçamento ao ser disparada.
+        """
+        key = _call_key(name, parameters)
+        with self._lock:
+            future = self._futures.get(key)
+            if future is None or key in self._used or future.cancelled():
+                return None
+            self._used.add(key)
+        self._speculator._record("hits")
+        return future.result()
+    
+    def discard(self) -> None:
+        """Descarta as chamadas não aproveitadas (as já iniciadas terminam em segundo plano)"""
+        with self._lock:
+            unused = [future for key, future in self._futures.items() if key not in self._used]
+            self._used.update(self._futures)
+        cancelled = sum(1 for future in unused if future.cancel())
+        if self._budget is not None and cancelled:
+            # Chamadas canceladas antes de começar não consomem o orçamento
+            self._budget.release_tool_calls(cancelled)
+        self._speculator._record("wasted", len(unused))
+    
+    @property
+    def calls(self) -> List[str]:
+        """Chaves das chamadas especuladas"""
+        return list(self._futures)
+
+
+class ToolSpeculator:
+    """Escolhe e dispara chamadas prováveis de ferramentas somente leitura
+    
+    Heurística barata, sem chamada extra ao LLM: entre as ferramentas marcadas como
+    read_only, considera as sem parâmetros obrigatórios (chamadas com {}) e as cujo único
+    parâmetro obrigatório é uma consulta em texto (chamadas com a requisição do usuário),
+    e dispara as max_calls mais relevantes para a requisição.
+    """
+    
+    def __init__(self, tool_manager: ToolManager, max_calls: int = 2, max_workers: int = 4):
+        self.tool_manager = tool_manager
+        self.max_calls = max_calls
+        self.retriever = ToolRetriever(top_k=max_calls)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="speculative-tool")
+        # Encerra os trabalhadores também se o especulador for descartado sem shutdown()
+        self._finalizer = weakref.finalize(self, self._executor.shutdown, wait=False, cancel_futures=True)
+        self._lock = threading.Lock()
+        self.stats = {"batches": 0, "started": 0, "hits": 0, "wasted": 0}
+    
+    def _record(self, key: str, amount: int = 1) -> None:
+        """Atualiza um contador"""
+        with self._lock:
+            self.stats[key] += amount
+    
+    def guess(self, user_input: str) -> List[Tuple[str, Dict[str, Any]]]:
+        """Chamadas prováveis para a requisição: [(ferramenta, parâmetros)]"""
+        candidates: Dict[str, Dict[str, Any]] = {}
+        definitions = []
+        for tool in list(self.tool_manager.tools.values()):
+            if not tool.read_only or tool.streaming:
+                continue
+            required = tool.parameters.get("required", [])
+            query_parameter = required[0] if len(required) == 1 else None
+            query_schema = tool.parameters.get("properties", {}).get(query_parameter, {})
+            if not required:
+                candidates[tool.name] = {}
+            elif query_parameter in _QUERY_PARAMETERS and query_schema.get("type", "string") == "string":
+                candidates[tool.name] = {query_parameter: user_input}
+            else:
+                continue
+            definitions.append({
+                "type": "function",
+                "function": {"name": tool.name, "description": tool.description, "parameters": tool.parameters}
+            })
+        
+        if not definitions:
+            return []
+        ranked = self.retriever.rank(user_input, definitions, self.tool_manager.catalog_version)
+        return [(name, candidates[name]) for name in ranked[:self.max_calls]]
+    
+    def start(self, user_input: str, budget: Optional[RequestBudget] = None) -> SpeculativeBatch:
+        """Dispara as chamadas prováveis em segundo plano, cada uma reservada no orçamento"""
+        batch = SpeculativeBatch(self, budget)
+        for name, parameters in self.guess(user_input):
+            if budget is not None and not budget.try_tool_call(optional=True):
+                break
+            # Cópia do contexto: a chamada herda o span da requisição
+            context = contextvars.copy_context()
+            batch._futures[_call_key(name, parameters)] = self._executor.submit(
+                context.run, self.tool_manager.execute_tool, name, parameters
+            )
+        self._record("batches")
+        self._record("started", len(batch._futures))
+        return batch
+    
+    def shutdown(self, wait: bool = True) -> None:
+        """Cancela as chamadas ainda na fila e encerra os trabalhadores"""
+        self._finalizer.detach()
+        self._executor.shutdown(wait=wait, cancel_futures=True)
+    
+    def get_status(self) -> Dict[str, Any]:
+        """Retorna os contadores e a taxa de acerto"""
+        with self._lock:
+            stats = dict(self.stats)
+        stats["hit_rate"] = stats["hits"] / stats["started"] if stats["started"] else 0.0
+        return stats
@@ -0,0 +1,1326 @@
+#!/usr/bin/env python3
+"""
+Testes Unitários dos Componentes do Agente Autônomo (sem LLM nem rede)
+"""
+import sys
+import os
+import time
+import shutil
+import hashlib
+import tempfile
+import importlib
+import contextvars
+import threading
+from datetime import datetime
+from typing import Any, Optional
+
+# Os módulos usam imports relativos: importar como pacote a partir do diretório pai
+# (à frente do próprio diretório, onde agent.py esconderia um pacote chamado "agent")
+PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(PACKAGE_DIR))
+PACKAGE = os.path.basename(PACKAGE_DIR)
+
+
+def load(module: str):
+    """Importa um módulo do agente"""
+    return importlib.import_module(f"{PACKAGE}.{module}")
+
+
+def worker_pid() -> int:
+    """PID do processo que executa a ferramenta (nível de módulo: serializável para o pool)"""
+    return os.getpid()
+
+
+def allocate_and_release(megabytes: int) -> int:
+    """Aloca e libera memória no trabalhador (o pico sobe, a memória atual volta)"""
+    block = bytearray(megabytes * 1024 * 1024)
+    size = len(block)
+    del block
+    return size
+
+
+class FakeLLM:
+    """Provedor de LLM com respostas roteirizadas (transmitidas em partes de um caractere)"""
+    
+    provider = "fake"
+    available = True
+    cassette = None
+    
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.prompts = []
+        self.options = []
+    
+    def generate_response(self, prompt, **kwargs):
+        self.prompts.append(prompt if isinstance(prompt, str) else "".join(prompt))
+        self.options.append(kwargs)
+        return self.responses.pop(0) if self.responses else "Resposta final."
+    
+    def generate_response_stream(self, prompt, **kwargs):
+        for char in self.generate_response(prompt, **kwargs):
+            yield char
+    
+    def get_provider_info(self):
+        return {"provider": self.provider}
+
+
+class ComponentTester:
+    """Classe para testar os componentes do agente isoladamente"""
+    
+    def __init__(self):
+        self.test_results = []
+        self.start_time = datetime.now()
+        self.temp_dir = tempfile.mkdtemp(prefix="agent_components_")
+    
+    def log_test(self, test_name: str, success: bool, details: str = "", execution_time: float = 0):
+        """Registra o resultado de um teste"""
+        result = {
+            "test_name": test_name,
+            "success": success,
+            "details": details,
+            "execution_time": execution_time,
+            "timestamp": datetime.now().isoformat()
+        }
+        self.test_results.append(result)
+        
+        status = "✅ PASSOU" if success else "❌ FALHOU"
+        print(f"{status} - {test_name} ({execution_time:.2f}s)")
+        if details:
+            print(f"   Detalhes: {details}")
+    
+    def make_reasoning_core(self, name: str, responses=(), **manager_options):
+        """Cria um núcleo de raciocínio isolado (memória e spill temporários) com um LLM roteirizado"""
+        ReasoningCore = load("reasoning_core").ReasoningCore
+        Memory = load("memory").Memory
+        ToolManager = load("tool_manager").ToolManager
+        
+        manager = ToolManager(spill_directory=os.path.join(self.temp_dir, f"spill_{name}"), **manager_options)
+        core = ReasoningCore(Memory(os.path.join(self.temp_dir, f"memory_{name}")), manager)
+        core.llm = FakeLLM(responses)
+        core.native_function_calling = False
+        core.plan_cache = None
+        core.speculator = None
+        return core
+    
+    def run_test(self, test_name: str, test_function) -> bool:
+        """Executa uma verificação; falha em qualquer exceção (inclusive assert)"""
+        start_time = time.time()
+        try:
+            test_function()
+            self.log_test(test_name, True, "", time.time() - start_time)
+            return True
+        except Exception as e:
+            self.log_test(test_name, False, f"{type(e).__name__}: {e}", time.time() - start_time)
+            return False
+    
+    def test_latency_histogram(self):
+        """Testa os histogramas de latência por ferramenta"""
+        LatencyHistogram = load("tool_metrics").LatencyHistogram
+        
+        def percentiles():
+            histogram = LatencyHistogram()
+            for value in range(1, 101):
+                histogram.record(value / 1000.0)
+            # Erro relativo de até ~19% por bucket
+            assert abs(histogram.percentile(50) - 0.050) <= 0.050 * 0.19
+            assert abs(histogram.percentile(99) - 0.099) <= 0.099 * 0.19
+            assert histogram.percentile(100) == 0.1
+        
+        def merge():
+            first, second = LatencyHistogram(), LatencyHistogram()
+            first.record(0.01)
+            second.record(0.02, success=False)
+            merged = LatencyHistogram.from_dict(first.to_dict())
+            merged.merge(second)
+            assert merged.count == 2 and merged.errors == 1
+        
+        self.run_test("Histograma - percentis", percentiles)
+        self.run_test("Histograma - combinação", merge)
+    
+    def test_plan_cache(self):
+        """Testa o cache de planos (parâmetros obsoletos e requisições negadas)"""
+        PlanCache = load("plan_cache").PlanCache
+        
+        def slots_reused():
+            cache = PlanCache()
+            assert cache.store("pesquise gatos siameses", [{"id": "s1", "tool": "search", "parameters": {"query": "gatos siameses"}}])
+            cached = cache.lookup("pesquise cachorros pequenos")
+            assert cached["steps"][0]["parameters"] == {"query": "cachorros pequenos"}
+        
+        def stale_literal_not_stored():
+            # URL escolhida a partir do resultado da busca: não pode virar constante do plano
+            cache = PlanCache()
+            steps = [
+                {"id": "s1", "tool": "search", "parameters": {"query": "gatos"}},
+                {"id": "s2", "tool": "fetch", "parameters": {"url": "https://example.com/gatos-1"}, "depends_on": ["s1"]}
+            ]
+            assert cache.store("pesquise gatos e abra o primeiro", steps) is None
+            assert cache.lookup("pesquise cachorros e abra o primeiro") is None
+        
+        def references_stored():
+            cache = PlanCache()
+            steps = [
+                {"id": "s1", "tool": "search", "parameters": {"query": "gatos"}},
+                {"id": "s2", "tool": "fetch", "parameters": {"url": "${s1.results.0.url}"}, "depends_on": ["s1"]}
+            ]
+            assert cache.store("pesquise gatos e abra o primeiro", steps)
+            cached = cache.lookup("pesquise cachorros e abra o primeiro")
+            assert cached["steps"][1]["parameters"] == {"url": "${s1.results.0.url}"}
+        
+        def negation_does_not_match():
+            cache = PlanCache(similarity_threshold=0.8)
+            steps = [{"id": "s1", "tool": "get_system_info", "parameters": {}}]
+            assert cache.store("apague arquivos temporários antigos agora", steps)
+            assert cache.lookup("não apague arquivos temporários antigos agora") is None
+            assert cache.lookup("apague arquivos temporários antigos agora!") is not None
+        
+        self.run_test("Cache de planos - slots reaproveitados", slots_reused)
+        self.run_test("Cache de planos - literal de resultado não é guardado", stale_literal_not_stored)
+        self.run_test("Cache de planos - referências ${...} são guardadas", references_stored)
+        self.run_test("Cache de planos - negação não casa", negation_does_not_match)
+    
+    def test_resilience(self):
+        """Testa retentativas e circuit breakers das ferramentas de rede"""
+        RetryPolicy = load("resilience").RetryPolicy
+        CircuitBreaker = load("resilience").CircuitBreaker
+        ToolManager = load("tool_manager").ToolManager
+        
+        def transient_patterns():
+            policy = RetryPolicy()
+            assert policy.is_retryable("HTTP 503 Service Unavailable")
+            assert policy.is_retryable("Connection refused by host")
+            assert policy.is_retryable("Read timed out")
+            assert policy.is_retryable("429 Client Error: Too Many Requests")
+            assert not policy.is_retryable("Arquivo processado: 500 linhas")
+            assert not policy.is_retryable("connection string inválida")
+            assert not policy.is_retryable("Elemento não encontrado")
+        
+        def half_open_after_scheduler_timeout():
+            manager = ToolManager(spill_directory=os.path.join(self.temp_dir, "spill_breaker"))
+            manager.register_tool("fetch_page", lambda url: {"url": url}, "Busca uma página", category="web")
+            manager.scheduler.max_queue_time = 0.05
+            manager.configure_limits(category="web", max_concurrency=1)
+            
+            # Circuito aberto há mais que o tempo de recuperação: a próxima chamada é a de teste
+            for breaker in manager.circuit_breakers.get_breakers("fetch_page", {"url": "http://example.com"}):
+                breaker.state = CircuitBreaker.OPEN
+                breaker.opened_at = time.monotonic() - breaker.recovery_timeout - 1
+            
+            # Categoria ocupada: a chamada de teste expira na fila sem executar
+            with manager.scheduler.slot("other", "web"):
+                result = manager.execute_tool("fetch_page", {"url": "http://example.com"})
+            assert not result.success
+            
+            # O breaker não pode ficar preso com uma chamada de teste "em andamento"
+            result = manager.execute_tool("fetch_page", {"url": "http://example.com"})
+            assert result.success, result.error
+        
+        def streaming_honours_breakers():
+            manager = ToolManager(spill_directory=os.path.join(self.temp_dir, "spill_breaker_stream"))
+            calls = []
+            
+            def fetch_stream(url: str):
+                calls.append(url)
+                yield "início"
+                raise ConnectionError("Connection reset by peer")
+            
+            manager.register_tool("fetch_stream", fetch_stream, "Busca uma página em partes", category="web")
+            threshold = manager.circuit_breakers.failure_threshold
+            for _ in range(threshold):
+                assert not manager.run_stream("fetch_stream", {"url": "http://down.example"}).success
+            
+            # Falhas transitórias abriram o circuito: o stream nem é iniciado
+            result = manager.run_stream("fetch_stream", {"url": "http://down.example"})
+            assert not result.success and "Circuito aberto" in result.error
+            assert len(calls) == threshold
+            
+            # O breaker do host também protege as chamadas comuns ao mesmo host
+            manager.register_tool("fetch_page", lambda url: {"url": url}, "Busca uma página", category="web")
+            assert "Circuito aberto" in manager.execute_tool("fetch_page", {"url": "http://down.example/x"}).error
+        
+        self.run_test("Resiliência - padrões transitórios", transient_patterns)
+        self.run_test("Resiliência - breaker meio aberto após timeout da fila", half_open_after_scheduler_timeout)
+        self.run_test("Resiliência - breakers valem para ferramentas de streaming", streaming_honours_breakers)
+    
+    def test_action_stream_parser(self):
+        """Testa o parser incremental de ações (alimentado caractere a caractere)"""
+        StreamingActionParser = load("action_stream_parser").StreamingActionParser
+        
+        def feed(text):
+            parser = StreamingActionParser()
+            actions = []
+            for char in text:
+                actions.extend(parser.feed(char))
+            return actions
+        
+        def list_items():
+            actions = feed('Vou agir.\n```json\n[{"action": "a", "parameters": {}}, {"action": "b", "parameters": {"x": "}"}}]\n```')
+            assert [action["action"] for action in actions] == ["a", "b"]
+        
+        def actions_key_only():
+            assert len(feed('```json\n{"actions": [{"action": "a", "parameters": {}}]}\n```')) == 1
+            assert feed('```json\n{"meta": [{"action": "rm", "parameters": {}}]}\n```') == []
+        
+        def keeps_only_unparsed_tail():
+            parser = StreamingActionParser()
+            prose = "Texto explicativo longo. " * 400
+            text = prose + '```json\n[{"action": "a", "parameters": {}},\n {"action": "b", "parameters": {}}]\n```' + prose
+            actions = []
+            largest = 0
+            for char in text:
+                actions.extend(parser.feed(char))
+                largest = max(largest, len(parser._buffer))
+            
+            assert [action["action"] for action in actions] == ["a", "b"]
+            # O buffer guarda no máximo o bloco JSON aberto, não a resposta inteira
+            assert largest < 100 and parser.text == text
+        
+        def unconfirmed_dispatch_discarded():
+            # Lista malformada: a extração do texto completo rejeita o bloco inteiro
+            calls = []
+            core = self.make_reasoning_core("stream_dispatch", [
+                '```json\n[{"action": "read_a", "parameters": {"x": 1}}, {"action": "write_b", "parameters": {}},, ]\n```'
+            ])
+            core.tool_manager.register_tool("read_a", lambda x: calls.append("read_a") or x, "Lê", read_only=True)
+            core.tool_manager.register_tool("write_b", lambda: calls.append("write_b"), "Escreve")
+            
+            content, actions, results = core._generate_and_dispatch("prompt")
+            assert actions == [] and results is None
+            # Só a ferramenta somente leitura roda antes da resposta completa
+            assert calls == ["read_a"]
+        
+        def confirmed_dispatch_reused():
+            calls = []
+            core = self.make_reasoning_core("stream_confirmed", [
+                '```json\n[{"action": "read_a", "parameters": {"x": 1}}, {"action": "write_b", "parameters": {}}]\n```'
+            ])
+            core.tool_manager.register_tool("read_a", lambda x: calls.append("read_a") or x, "Lê", read_only=True)
+            core.tool_manager.register_tool("write_b", lambda: calls.append("write_b"), "Escreve")
+            
+            content, actions, results = core._generate_and_dispatch("prompt")
+            assert [action["action"] for action in actions] == ["read_a", "write_b"]
+            assert sorted(calls) == ["read_a", "write_b"] and all(result["success"] for result in results)
+        
+        self.run_test("Parser de ações - itens de lista", list_items)
+        self.run_test("Parser de ações - só a chave \"actions\"", actions_key_only)
+        self.run_test("Parser de ações - guarda só o trecho não analisado", keeps_only_unparsed_tail)
+        self.run_test("Despacho antecipado - ação não confirmada descartada", unconfirmed_dispatch_discarded)
+        self.run_test("Despacho antecipado - ações confirmadas", confirmed_dispatch_reused)
+    
+    def test_cassette(self):
+        """Testa a gravação/reprodução de interações"""
+        cassette_module = load("cassette")
+        Cassette, interaction_key = cassette_module.Cassette, cassette_module.interaction_key
+        path = os.path.join(self.temp_dir, "cassette.jsonl")
+        
+        def record_cassette():
+            recorder = Cassette(path, mode=Cassette.RECORD)
+            recorder.record(Cassette.TOOLS, interaction_key("tools", "p1", []), {"content": "", "tool_calls": []}, 0.1)
+            recorder.record(Cassette.RESPONSE, interaction_key("response", "p2"), "texto", 0.1)
+            recorder.record(Cassette.TOOL, interaction_key("tool", "a", {"x": 1}), {"success": True, "result": "a1"}, 0.1, group="a")
+            recorder.record(Cassette.TOOL, interaction_key("tool", "b", {"x": 1}), {"success": True, "result": "b1"}, 0.1, group="b")
+        
+        def fallback_same_type():
+            record_cassette()
+            player = Cassette(path, mode=Cassette.REPLAY)
+            # Prompt mudou: o fallback não pode servir a resposta com ferramentas como texto
+            assert player.replay_llm(interaction_key("response", "outro prompt")) == "texto"
+            assert "".join(Cassette(path).replay_llm_stream(interaction_key("response", "outro"))) == "texto"
+            assert player.replay_llm(interaction_key("tools", "outro", []), Cassette.TOOLS)["tool_calls"] == []
+        
+        def fallback_same_tool():
+            record_cassette()
+            player = Cassette(path, mode=Cassette.REPLAY)
+            assert player.replay_tool(interaction_key("tool", "b", {"x": 2}), "b")["result"] == "b1"
+            assert player.replay_tool(interaction_key("tool", "a", {"x": 1}), "a")["result"] == "a1"
+        
+        def strict_miss():
+            record_cassette()
+            player = Cassette(path, mode=Cassette.REPLAY, strict=True)
+            try:
+                player.replay_llm(interaction_key("response", "outro prompt"))
+            except cassette_module.CassetteMissError:
+                return
+            raise AssertionError("interação inexistente servida em modo estrito")
+        
+        def key_only_with_cassette():
+            llm_module = load("llm_provider")
+            provider = llm_module.LLMProvider()
+            provider.provider, provider.client = "openai", object()
+            provider._generate_openai_response = lambda prompt, **kwargs: "resposta"
+            hashed = []
+            original_key = llm_module.interaction_key
+            llm_module.interaction_key = lambda *parts: hashed.append(parts) or original_key(*parts)
+            try:
+                # Sem cassete o prompt não é serializado nem hasheado
+                assert provider.generate_response("prompt") == "resposta" and not hashed
+                
+                record_cassette()
+                provider.use_cassette(Cassette(path, mode=Cassette.REPLAY))
+                assert provider.generate_response("p2") == "texto" and len(hashed) == 1
+            finally:
+                llm_module.interaction_key = original_key
+        
+        self.run_test("Cassete - chave calculada só com cassete", key_only_with_cassette)
+        self.run_test("Cassete - fallback só do mesmo tipo", fallback_same_type)
+        self.run_test("Cassete - fallback só da mesma ferramenta", fallback_same_tool)
+        self.run_test("Cassete - modo estrito", strict_miss)
+    
+    def test_plan_execution(self):
+        """Testa a execução de planos pelo núcleo de raciocínio"""
+        def large_results_spilled():
+            core = self.make_reasoning_core("plan_spill", spill_threshold_bytes=1000)
+            core.tool_manager.register_tool("big_page", lambda: "x" * 5000, "Página grande", read_only=True)
+            core.tool_manager.register_tool("echo", lambda text: text, "Repete o texto", read_only=True)
+            context = core._new_reasoning_context("Requisição de teste")
+            results = {}
+            outcome = core._execute_plan_steps([
+                {"id": "page", "tool": "big_page", "parameters": {}},
+                {"id": "copy", "tool": "echo", "parameters": {"text": "${page}"}, "depends_on": ["page"]}
+            ], results, context)
+            
+            assert outcome["success"]
+            # Referências usam o resultado completo; prompt e memória só a prévia
+            assert results["copy"] == "x" * 5000
+            prompt = "".join(context.segments())
+            assert "x" * 5000 not in prompt and "read_tool_result" in prompt
+            assert all("x" * 5000 not in str(entry) for entry in core.memory.get_recent_entries(10))
+        
+        self.run_test("Planos - resultados grandes como prévia", large_results_spilled)
+    
+    def test_result_spill(self):
+        """Testa a área de despejo de resultados grandes"""
+        ResultSpillStore = load("result_spill").ResultSpillStore
+        
+        def directory_created_lazily():
+            directory = os.path.join(self.temp_dir, "spill_lazy")
+            store = ResultSpillStore(directory, threshold_bytes=10)
+            assert not os.path.exists(directory)
+            assert store.maybe_spill("pequeno") is None and not os.path.exists(directory)
+            assert store.maybe_spill("x" * 100) is not None and os.path.isdir(directory)
+        
+        def multibyte_chunks():
+            store = ResultSpillStore(os.path.join(self.temp_dir, "spill_utf8"), threshold_bytes=10)
+            text = "ação é 😀 ok; " * 200
+            handle = store.maybe_spill(text)
+            for length in (1, 2, 5, 7, 64):
+                parts = []
+                for offset in range(0, handle["size"], length):
+                    parts.append(store.read(handle["spill_id"], offset, length))
+                assert "".join(parts) == text, f"trechos de {length} bytes"
+        
+        def restart_reindexes():
+            directory = os.path.join(self.temp_dir, "spill_restart")
+            first = ResultSpillStore(directory, threshold_bytes=10)
+            old = first.maybe_spill("a" * 1000)
+            time.sleep(0.01)
+            new = first.maybe_spill("b" * 1000)
+            os.utime(os.path.join(directory, f"{old['spill_id']}.txt"), (0, 0))
+            
+            # Novo processo: arquivos anteriores contam para o limite e os mais antigos saem
+            second = ResultSpillStore(directory, threshold_bytes=10, max_total_bytes=1500)
+            assert second.total_bytes == 1000
+            assert second.read(old["spill_id"]) is None
+            assert not os.path.exists(os.path.join(directory, f"{old['spill_id']}.txt"))
+            assert second.read(new["spill_id"]) == "b" * 1000
+        
+        self.run_test("Despejo - diretório criado sob demanda", directory_created_lazily)
+        self.run_test("Despejo - trechos com caracteres multibyte", multibyte_chunks)
+        self.run_test("Despejo - reindexação após reinício", restart_reindexes)
+    
+    def test_tool_streaming(self):
+        """Testa a execução de ferramentas de streaming"""
+        ToolManager = load("tool_manager").ToolManager
+        ShellModule = load("shell_module").ShellModule
+        
+        def large_stream_spilled_incrementally():
+            directory = os.path.join(self.temp_dir, "spill_stream")
+            manager = ToolManager(spill_directory=directory, spill_threshold_bytes=1000)
+            
+            def lines(count: int):
+                for index in range(count):
+                    yield f"linha {index:04d} " + "x" * 40
+            
+            manager.register_tool("lines", lines, "Produz linhas")
+            events = manager.stream_tool("lines", {"count": 500})
+            for event in events:
+                if event["event"] == "chunk" and event["index"] == 100:
+                    break
+            
+            # Acima do limite as partes já estão sendo gravadas em disco, antes do fim
+            partial = [os.path.join(directory, name) for name in os.listdir(directory)]
+            assert len(partial) == 1 and os.path.getsize(partial[0]) > 1000
+            
+            completed = [event for event in events if event["event"] == "completed"][0]
+            assert completed["success"] and completed["chunks"] == 500 and completed["spill_id"]
+            loaded = manager.spill_store.load(completed["spill_id"])
+            assert loaded == list(lines(500))
+            assert completed["result_size"] == os.path.getsize(partial[0])
+        
+        def slot_released_between_chunks():
+            manager = ToolManager(spill_directory=os.path.join(self.temp_dir, "spill_stream_slot"))
+            manager.scheduler.max_queue_time = 0.1
+            manager.configure_limits(category="web", max_concurrency=1, rate_per_second=1, burst=1)
+            
+            def pages():
+                yield "primeira"
+                yield "segunda"
+            
+            manager.register_tool("pages", pages, "Produz páginas", category="web")
+            events = manager.stream_tool("pages", {})
+            assert next(events)["data"] == "primeira"
+            
+            # Consumidor lento: a vaga da categoria está livre enquanto ele processa a parte
+            status = manager.scheduler.get_status()["categories"]["web"]
+            assert status["active"] == 0
+            
+            # As partes seguintes não consomem outra ficha de taxa
+            rest = list(events)
+            assert rest[0]["data"] == "segunda"
+            assert rest[-1]["success"] and rest[-1]["chunks"] == 2
+        
+        def shell_stream_keeps_tail():
+            shell = ShellModule(os.path.join(self.temp_dir, "shell_workspace"))
+            shell.STREAM_TAIL_LINES = 5
+            output = shell.execute_command_stream("python", ["-c", "\"print(*range(20), sep=chr(10))\""])
+            streamed = []
+            while True:
+                try:
+                    streamed.append(next(output)["line"])
+                except StopIteration as stop:
+                    summary = stop.value
+                    break
+            
+            assert streamed == [str(n) for n in range(20)]
+            assert summary["success"] and summary["stdout"] == "15\n16\n17\n18\n19\n"
+            assert summary["omitted_lines"] == 15
+        
+        def page_decoded_as_it_arrives():
+            SearchModule = load("search_module").SearchModule
+            html = "<html><head><title>Café</title></head><body>ação</body></html>".encode("utf-8")
+            # Blocos de 3 bytes: "é" e "ç" ficam divididos entre dois blocos
+            blocks = [html[index:index + 3] for index in range(0, len(html), 3)]
+            delivered = []
+            
+            class FakeResponse:
+                status_code = 200
+                encoding = "utf-8"
+                headers = {"content-type": "text/html; charset=utf-8"}
+                
+                def __enter__(self):
+                    return self
+                
+                def __exit__(self, *exc_info):
+                    return False
+                
+                def raise_for_status(self):
+                    pass
+                
+                def iter_content(self, chunk_size):
+                    for block in blocks:
+                        delivered.append(block)
+                        yield block
+            
+            search = SearchModule()
+            search.session.get = lambda url, **kwargs: FakeResponse()
+            output = search.fetch_page_content_stream("http://example.com")
+            
+            # A primeira parte sai antes de o corpo terminar de chegar
+            first = next(output)
+            assert first["chunk"] == "<ht" and len(delivered) == 1
+            
+            chunks = [first["chunk"]]
+            while True:
+                try:
+                    chunks.append(next(output)["chunk"])
+                except StopIteration as stop:
+                    result = stop.value
+                    break
+            
+            assert "".join(chunks) == html.decode("utf-8")
+            assert result["success"] and result["content"]["content_length"] == len(html)
+            assert result["content"]["title"] == "Café" and result["content"]["text"] == "Café ação"
+        
+        self.run_test("Streaming - partes grandes despejadas incrementalmente", large_stream_spilled_incrementally)
+        self.run_test("Streaming - vaga livre entre as partes", slot_released_between_chunks)
+        self.run_test("Streaming - shell mantém só as últimas linhas", shell_stream_keeps_tail)
+        self.run_test("Streaming - página decodificada conforme chega", page_decoded_as_it_arrives)
+    
+    def test_native_function_calling(self):
+        """Testa a alternância entre chamada nativa de funções e modo texto"""
+        def unsupported_provider_latched():
+            core = self.make_reasoning_core("native", ["Resposta em texto.", "Outra resposta."])
+            core.native_function_calling = True
+            native_calls = []
+            
+            def generate_with_tools(prompt, tools, **kwargs):
+                native_calls.append(prompt)
+                return {"content": "", "tool_calls": [], "error": "tools not supported"}
+            
+            core.llm.generate_with_tools = generate_with_tools
+            context = core._new_reasoning_context("Requisição de teste")
+            assert core._next_step(context)[0] == "Resposta em texto."
+            # A falha fica registrada para o provedor/modelo: sem nova chamada nativa
+            assert core._next_step(context)[0] == "Outra resposta."
+            assert len(native_calls) == 1
+            assert len(core.llm.prompts) == 2
+        
+        self.run_test("Funções nativas - provedor sem suporte desativado após a falha", unsupported_provider_latched)
+    
+    def test_request_budget(self):
+        """Testa os limites de tempo e de chamadas de ferramentas por requisição"""
+        RequestBudget = load("request_budget").RequestBudget
+        reasoning_module = load("reasoning_core")
+        ToolManager = load("tool_manager").ToolManager
+        ToolSpeculator = load("speculation").ToolSpeculator
+        
+        def limits():
+            budget = RequestBudget(max_tokens=100, max_tool_calls=1)
+            assert budget.exhausted() is None and budget.remaining_time() is None
+            assert budget.try_tool_call() and not budget.try_tool_call()
+            assert budget.exhausted() == "tool_calls" and budget.refused_tool_calls == 1
+            
+            budget = RequestBudget(max_tokens=100)
+            budget.add_tokens(prompt_tokens=60, completion_tokens=40)
+            status = budget.get_status()
+            assert status["exhausted"] == "tokens" and status["consumed"]["tokens"] == 100
+            assert status["limits"]["tool_calls"] is None
+        
+        def plan_items_reserved_before_dispatch():
+            core = self.make_reasoning_core("budget_plan")
+            executed = []
+            core.tool_manager.register_tool("fetch", lambda page: executed.append(page) or page, "Busca", read_only=True)
+            budget = RequestBudget(max_tool_calls=2)
+            
+            def run():
+                reasoning_module._budget.set(budget)
+                return core._execute_plan_steps([
+                    {"id": "pages", "tool": "fetch", "for_each": [1, 2, 3, 4], "parameters": {"page": "${item}"}}
+                ], {}, core._new_reasoning_context("Requisição de teste"))
+            
+            contextvars.copy_context().run(run)
+            # Só as chamadas reservadas executam: as demais são recusadas antes de disparar
+            assert len(executed) == 2 and budget.tool_calls == 2
+            assert budget.refused_tool_calls == 2 and budget.exhausted() == "tool_calls"
+        
+        def speculative_calls_reserved():
+            manager = ToolManager(spill_directory=os.path.join(self.temp_dir, "spill_budget_speculation"))
+            manager.register_tool("system_info", lambda: {"os": "linux"}, "Informações do sistema", read_only=True)
+            manager.register_tool("list_files", lambda: ["a.txt"], "Lista arquivos do sistema", read_only=True)
+            speculator = ToolSpeculator(manager, max_calls=2, max_workers=1)
+            try:
+                budget = RequestBudget(max_tool_calls=1)
+                batch = speculator.start("informações do sistema", budget)
+                assert len(batch.calls) == 1 and budget.tool_calls == 1
+                # Recusa de uma chamada especulativa não esgota o orçamento
+                assert budget.refused_tool_calls == 0 and budget.exhausted() == "tool_calls"
+                
+                budget = RequestBudget(max_tool_calls=5)
+                speculator._executor.submit(time.sleep, 0.2)
+                batch = speculator.start("informações do sistema", budget)
+                assert budget.tool_calls == 2
+                # Chamadas canceladas antes de começar devolvem a reserva
+                batch.discard()
+                assert budget.tool_calls == 0
+            finally:
+                speculator.shutdown()
+        
+        def remaining_time_as_llm_timeout():
+            core = self.make_reasoning_core("budget_timeout", ["Resposta."])
+            budget = RequestBudget(max_wall_time=30)
+            
+            def run():
+                reasoning_module._budget.set(budget)
+                return core._generate("prompt")
+            
+            contextvars.copy_context().run(run)
+            assert 0 < core.llm.options[0]["timeout"] <= 30
+        
+        def llm_timeout_degrades_to_final_response():
+            action = '```json\n{"action": "fetch", "parameters": {"page": 1}}\n```'
+            step = '{"id": "a", "tool": "fetch", "parameters": {"page": 1}, "checkpoint": true}'
+            followup = '{"id": "b", "tool": "fetch", "parameters": {"page": 2}, "depends_on": ["a"]}'
+            
+            class SlowLLM(FakeLLM):
+                """A segunda chamada só termina quando o tempo do orçamento (timeout) acaba"""
+                
+                def generate_response(self, prompt, **kwargs):
+                    if len(self.prompts) != 1:
+                        return super().generate_response(prompt, **kwargs)
+                    self.prompts.append("".join(prompt))
+                    self.options.append(kwargs)
+                    time.sleep(kwargs["timeout"])
+                    return "[ERRO] Não foi possível gerar resposta: Request timed out."
+            
+            cases = [
+                # Próximo passo do ReAct cortado
+                ("react", action),
+                # Revisão do plano (após o checkpoint) cortada
+                ("plan_execute", f'```json\n{{"steps": [{step}, {followup}]}}\n```'),
+                # A própria resposta final cortada: repetida sem limite
+                ("plan_execute", f'```json\n{{"steps": [{step}]}}\n```')
+            ]
+            for index, (strategy, first_response) in enumerate(cases):
+                core = self.make_reasoning_core(f"budget_llm_timeout_{index}")
+                core.strategy = strategy
+                core.tool_manager.register_tool("fetch", lambda page: f"conteúdo da página {page}", "Busca uma página")
+                core.llm = SlowLLM([first_response, "Resposta com o que foi obtido."])
+                
+                response = core.process_request("Busque a página 1", RequestBudget(max_wall_time=0.3))
+                assert response == "Resposta com o que foi obtido.", (index, response)
+                assert core.get_last_task()["budget"]["exhausted"] == "wall_time"
+                # A resposta final vai sem timeout e com o resultado já obtido
+                assert "timeout" not in core.llm.options[-1]
+                assert "conteúdo da página 1" in core.llm.prompts[-1]
+        
+        self.run_test("Orçamento - limites de tokens e chamadas", limits)
+        self.run_test("Orçamento - itens do plano reservados antes de disparar", plan_items_reserved_before_dispatch)
+        self.run_test("Orçamento - chamadas especulativas reservadas", speculative_calls_reserved)
+        self.run_test("Orçamento - tempo restante como timeout do LLM", remaining_time_as_llm_timeout)
+        self.run_test("Orçamento - timeout do LLM no fim do tempo gera a resposta parcial", llm_timeout_degrades_to_final_response)
+    
+    def test_tool_validation(self):
+        """Testa a validação e a coerção dos parâmetros das ferramentas"""
+        ToolManager = load("tool_manager").ToolManager
+        manager = ToolManager(spill_directory=os.path.join(self.temp_dir, "spill_validation"))
+        
+        def search(query: str, count: int = 10, site: Optional[str] = None, exact: bool = False):
+            return {"query": query, "count": count, "site": site, "exact": exact}
+        
+        manager.register_tool("search", search, "Busca")
+        validator = manager.tools["search"].validator
+        
+        def coercion():
+            parameters, error = validator.validate({"query": 42, "count": "5", "exact": "sim"})
+            assert error is None and parameters == {"query": "42", "count": 5, "exact": True}
+            assert validator.validate({"query": "x", "count": "cinco"})[1]
+            assert validator.validate({"query": "x", "limit": 3})[1]
+        
+        def null_for_optional_uses_default():
+            # Nulo em parâmetro opcional não anulável equivale a omiti-lo
+            parameters, error = validator.validate({"query": "x", "count": None, "site": None})
+            assert error is None and parameters == {"query": "x", "site": None}
+            result = manager.execute_tool("search", {"query": "x", "count": None})
+            assert result.success and result.result["count"] == 10
+        
+        def null_for_required_rejected():
+            assert validator.validate({"query": None})[1]
+            assert validator.validate({"count": 3})[1]
+        
+        self.run_test("Validação - coerção de tipos", coercion)
+        self.run_test("Validação - nulo em opcional usa o padrão", null_for_optional_uses_default)
+        self.run_test("Validação - nulo em obrigatório recusado", null_for_required_rejected)
+    
+    def test_tool_plan(self):
+        """Testa o executor de planos de ferramentas (DAG)"""
+        ToolManager = load("tool_manager").ToolManager
+        PlanValidationError = load("tool_plan").PlanValidationError
+        manager = ToolManager(spill_directory=os.path.join(self.temp_dir, "spill_tool_plan"))
+        active = {"now": 0, "max": 0}
+        active_lock = threading.Lock()
+        
+        def work(value: Any, fail: bool = False):
+            with active_lock:
+                active["now"] += 1
+                active["max"] = max(active["max"], active["now"])
+            time.sleep(0.02)
+            with active_lock:
+                active["now"] -= 1
+            if fail:
+                raise RuntimeError("falha simulada")
+            return {"value": value}
+        
+        manager.register_tool("work", work, "Trabalho de teste")
+        
+        def references_and_skips():
+            outcome = manager.run_plan([
+                {"id": "a", "tool": "work", "parameters": {"value": 1}},
+                {"id": "b", "tool": "work", "parameters": {"value": "${a.value}"}},
+                {"id": "c", "tool": "work", "parameters": {"value": 3, "fail": True}},
+                {"id": "d", "tool": "work", "parameters": {"value": 4}, "depends_on": ["c"]}
+            ])
+            assert outcome["nodes"]["b"]["result"] == {"value": 1}
+            assert outcome["failed_nodes"] == ["c", "d"]
+            assert outcome["nodes"]["d"]["event"] == "node_skipped"
+        
+        def invalid_plan_rejected_eagerly():
+            for nodes in (
+                [{"id": "a", "tool": "work", "parameters": {"value": "${b}"}}],
+                [{"id": "a", "tool": "work", "depends_on": ["b"]}, {"id": "b", "tool": "work", "depends_on": ["a"]}]
+            ):
+                try:
+                    manager.execute_plan(nodes)
+                except PlanValidationError:
+                    continue
+                raise AssertionError(f"plano inválido aceito: {nodes}")
+        
+        def for_each_shares_plan_workers():
+            active["max"] = 0
+            outcome = manager.run_plan([
+                {"id": "items", "tool": "work", "for_each": [1, 2, 3, 4], "parameters": {"value": "${item}"}},
+                {"id": "other", "tool": "work", "parameters": {"value": 0}}
+            ], max_workers=2)
+            assert outcome["success"]
+            assert outcome["nodes"]["items"]["result"] == [{"value": n} for n in (1, 2, 3, 4)]
+            # Itens e nós disputam os mesmos trabalhadores do plano
+            assert active["max"] <= 2, active["max"]
+        
+        self.run_test("Planos - referências e dependências que falharam", references_and_skips)
+        self.run_test("Planos - plano inválido recusado antes de executar", invalid_plan_rejected_eagerly)
+        self.run_test("Planos - itens for_each nos trabalhadores do plano", for_each_shares_plan_workers)
+    
+    def test_speculation(self):
+        """Testa a escolha e o ciclo de vida das chamadas especulativas"""
+        ToolManager = load("tool_manager").ToolManager
+        ToolSpeculator = load("speculation").ToolSpeculator
+        FileManagerModule = load("file_manager_module").FileManagerModule
+        ShellModule = load("shell_module").ShellModule
+        
+        def module_read_only_tools():
+            manager = ToolManager(spill_directory=os.path.join(self.temp_dir, "spill_speculation"))
+            files = FileManagerModule(os.path.join(self.temp_dir, "files_workspace"))
+            manager.register_tool("get_operation_history", files.get_operation_history, "Histórico de operações")
+            manager.register_tool("clear_operation_history", files.clear_operation_history, "Limpa o histórico de operações")
+            assert manager.tools["get_operation_history"].read_only
+            assert not manager.tools["clear_operation_history"].read_only
+            
+            shell = ShellModule(os.path.join(self.temp_dir, "shell_speculation"))
+            manager.register_tool("list_directory", shell.list_directory, "Lista o conteúdo de um diretório")
+            manager.register_tool("get_system_info", shell.get_system_info, "Informações do sistema")
+            manager.register_tool("execute_command", shell.execute_command, "Executa um comando")
+            assert manager.tools["list_directory"].read_only and manager.tools["get_system_info"].read_only
+            assert not manager.tools["execute_command"].read_only
+            
+            # Só a ferramenta sem efeitos colaterais é candidata à especulação
+            speculator = ToolSpeculator(manager)
+            try:
+                assert speculator.guess("histórico de operações") == [("get_operation_history", {})]
+            finally:
+                speculator.shutdown()
+        
+        def shutdown_stops_workers():
+            manager = ToolManager(spill_directory=os.path.join(self.temp_dir, "spill_speculation_shutdown"))
+            manager.register_tool("system_info", lambda: {"os": "linux"}, "Informações do sistema", read_only=True)
+            speculator = ToolSpeculator(manager, max_workers=1)
+            batch = speculator.start("informações do sistema")
+            assert batch.take("system_info", {}).success
+            speculator.shutdown()
+            assert not any(thread.name.startswith("speculative-tool") for thread in threading.enumerate())
+        
+        self.run_test("Especulação - ferramentas somente leitura dos módulos", module_read_only_tools)
+        self.run_test("Especulação - shutdown encerra os trabalhadores", shutdown_stops_workers)
+    
+    def test_execution_log(self):
+        """Testa o log persistente de execuções e os percentis exatos"""
+        execution_log = load("execution_log")
+        
+        def nearest_rank():
+            values = [n / 100.0 for n in range(100, 0, -1)]
+            assert execution_log.nearest_rank_percentiles(values) == {"p50": 0.5, "p90": 0.9, "p99": 0.99}
+            assert execution_log.nearest_rank_percentiles([]) == {"p50": 0.0, "p90": 0.0, "p99": 0.0}
+        
+        def logged_percentiles():
+            log = execution_log.ToolExecutionLog(os.path.join(self.temp_dir, "executions.db"), flush_interval=0.01)
+            for n in range(1, 11):
+                log.log({"timestamp": time.time(), "tool_name": "fetch", "success": True, "execution_time": n / 10.0})
+            log.close()
+            assert log.written_entries == 10
+            assert log.percentiles("fetch") == {"p50": 0.5, "p90": 0.9, "p99": 1.0}
+        
+        self.run_test("Log de execuções - percentis nearest-rank", nearest_rank)
+        self.run_test("Log de execuções - percentis gravados", logged_percentiles)
+    
+    def test_iteration_timings(self):
+        """Testa o registro de tempos por iteração nas duas estratégias"""
+        def check_totals(task):
+            timings = task["iteration_timings"]
+            assert timings and all("total" in record for record in timings), timings
+            first = timings[0]
+            # A primeira iteração inclui a preparação do contexto e a chamada ao LLM
+            assert first["total"] >= first["context_preparation"] + first["llm_call"], first
+        
+        def slow_context(core):
+            prepare_context = core._prepare_context
+            core._prepare_context = lambda user_input: time.sleep(0.05) or prepare_context(user_input)
+        
+        def react_totals():
+            core = self.make_reasoning_core("timings_react", ["Resposta final."])
+            slow_context(core)
+            core.process_request("Olá")
+            check_totals(core.get_last_task())
+        
+        def plan_execute_totals():
+            plan = '```json\n{"steps": [{"id": "a", "tool": "echo", "parameters": {"text": "oi"}}]}\n```'
+            core = self.make_reasoning_core("timings_plan", [plan, "Resposta final."])
+            core.tool_manager.register_tool("echo", lambda text: text, "Repete o texto")
+            core.strategy = "plan_execute"
+            slow_context(core)
+            core.process_request("Repita oi")
+            task = core.get_last_task()
+            assert task["actions"] and task["actions"][0]["success"]
+            check_totals(task)
+            assert task["iteration_timings"][0]["total"] >= task["iteration_timings"][0].get("tool_execution", 0)
+        
+        self.run_test("Tempos - total por iteração no ReAct", react_totals)
+        self.run_test("Tempos - total por iteração no planejar-e-executar", plan_execute_totals)
+    
+    def test_tool_scheduler(self):
+        """Testa os limites de concorrência e de taxa por categoria"""
+        tool_scheduler = load("tool_scheduler")
+        
+        def concurrency_limit():
+            scheduler = tool_scheduler.ToolScheduler(max_queue_time=0.05)
+            scheduler.configure_category("web", max_concurrency=1)
+            with scheduler.slot("fetch", "web"):
+                try:
+                    with scheduler.slot("fetch", "web"):
+                        raise AssertionError("segunda vaga concedida acima do limite")
+                except tool_scheduler.SchedulerTimeoutError:
+                    pass
+                # Outras categorias não disputam a mesma vaga
+                with scheduler.slot("read_file", "file"):
+                    pass
+            status = scheduler.get_status()["categories"]["web"]
+            assert status["active"] == 0 and status["timeouts"] == 1 and status["acquisitions"] == 1
+        
+        def rate_limit():
+            scheduler = tool_scheduler.ToolScheduler(max_queue_time=1.0)
+            scheduler.configure_tool("fetch", rate_per_second=20, burst=1)
+            with scheduler.slot("fetch", "general") as first_wait:
+                pass
+            with scheduler.slot("fetch", "general") as second_wait:
+                pass
+            assert first_wait < 0.01 and second_wait >= 0.03, (first_wait, second_wait)
+            # Retomar uma execução não consome outra ficha
+            start = time.monotonic()
+            with scheduler.slot("fetch", "general", rate_limited=False):
+                pass
+            assert time.monotonic() - start < 0.01
+        
+        self.run_test("Escalonador - limite de concorrência", concurrency_limit)
+        self.run_test("Escalonador - limite de taxa", rate_limit)
+    
+    def test_tracing(self):
+        """Testa os spans aninhados e a exportação dos traces"""
+        Tracer = load("tracing").Tracer
+        
+        def nested_spans():
+            export_path = os.path.join(self.temp_dir, "traces", "spans.jsonl")
+            tracer = Tracer()
+            tracer.configure(export_path=export_path)
+            with tracer.span("request", task="t1") as root:
+                with tracer.span("tool") as child:
+                    child.set_attribute("tool", "echo")
+                # Threads que recebem uma cópia do contexto continuam o mesmo trace
+                def work():
+                    with tracer.span("worker"):
+                        pass
+                
+                worker = threading.Thread(target=contextvars.copy_context().run, args=(work,))
+                worker.start()
+                worker.join()
+            
+            spans = tracer.get_trace(root.trace_id)
+            by_name = {span["name"]: span for span in spans}
+            assert by_name["tool"]["parent_id"] == root.span_id
+            assert by_name["tool"]["attributes"]["tool"] == "echo"
+            assert by_name["worker"]["parent_id"] == root.span_id
+            with open(export_path, encoding="utf-8") as f:
+                assert len(f.readlines()) == len(tracer.spans)
+            summary = tracer.get_recent_traces(1)[0]
+            assert summary["name"] == "request" and summary["span_count"] == 3
+        
+        def error_status():
+            tracer = Tracer()
+            try:
+                with tracer.span("failing"):
+                    raise ValueError("falha")
+            except ValueError:
+                pass
+            span = tracer.spans[-1]
+            assert span["status"] == "error" and span["error"] == "falha"
+            
+            tracer.configure(enabled=False)
+            with tracer.span("disabled") as disabled:
+                assert disabled is None
+        
+        self.run_test("Tracing - spans aninhados e exportação", nested_spans)
+        self.run_test("Tracing - status de erro e desativação", error_status)
+    
+    def test_reasoning_context(self):
+        """Testa a janela deslizante de resultados do raciocínio"""
+        ReasoningContext = load("reasoning_context").ReasoningContext
+        
+        def sliding_window():
+            context = ReasoningContext("Base", keep_last=2, max_tokens=10000, summary_chars=20)
+            for index in range(4):
+                context.add_result(f"tool_{index}", {"success": True, "result": f"conteúdo {index} " * 20})
+            context.add_result("big", {"success": True, "result": "x", "spill_id": "abc"})
+            text = "".join(context.segments())
+            # Os dois últimos turnos na íntegra, os anteriores resumidos
+            assert "Resultado resumido #1 (tool_0)" in text and "Resultado resumido #3 (tool_2)" in text
+            assert "conteúdo 3 " * 20 in text and "conteúdo 0 " * 20 not in text
+            assert "caracteres omitidos" in text
+        
+        def token_ceiling():
+            context = ReasoningContext("Base", keep_last=3, max_tokens=120, summary_chars=20)
+            for index in range(10):
+                context.add_result(f"tool_{index}", {"success": True, "result": "y" * 200})
+            segments = context.segments()
+            assert "antigo(s) omitido(s)" in "".join(segments)
+            assert context.token_estimate() <= 120 + 20
+            assert context.segments(reserved_tokens=50) != segments
+        
+        def segment_estimate():
+            context_module = load("reasoning_context")
+            segments = ["Base", "\n\n", "x" * 37, ""]
+            assert context_module.estimate_segments_tokens(segments) == context_module.estimate_tokens("".join(segments))
+            assert context_module.estimate_segments_tokens([]) == 0
+        
+        self.run_test("Contexto - janela deslizante e resumos", sliding_window)
+        self.run_test("Contexto - teto de tokens", token_ceiling)
+        self.run_test("Contexto - estimativa de tokens por segmentos", segment_estimate)
+    
+    def test_tool_retriever(self):
+        """Testa a seleção de ferramentas relevantes (BM25)"""
+        ToolRetriever = load("tool_retriever").ToolRetriever
+        
+        def definition(name, description, *parameters):
+            return {"type": "function", "function": {
+                "name": name,
+                "description": description,
+                "parameters": {"type": "object", "properties": {parameter: {"type": "string"} for parameter in parameters}}
+            }}
+        
+        catalog = [
+            definition("search_web", "Pesquisa informações na internet", "query"),
+            definition("read_file", "Lê o conteúdo de um arquivo", "path"),
+            definition("list_directory", "Lista os arquivos de um diretório", "path"),
+            definition("get_system_info", "Obtém informações do sistema operacional")
+        ]
+        
+        def relevant_subset():
+            retriever = ToolRetriever(top_k=1, always_include=["get_system_info"])
+            selected = retriever.select("pesquisa na internet", catalog, version=1)
+            assert [d["function"]["name"] for d in selected] == ["search_web", "get_system_info"]
+            status = retriever.get_status()
+            assert status["selections"] == 1 and status["fallbacks_to_all_tools"] == 0
+            assert status["prompt_tokens_saved"] > 0
+        
+        def fallback_and_reindex():
+            retriever = ToolRetriever(top_k=1)
+            assert retriever.select("zzz", catalog, version=1) == catalog
+            assert retriever.get_status()["fallbacks_to_all_tools"] == 1
+            # Catálogo novo (outra versão): o índice é refeito
+            extra = catalog + [definition("send_email", "Envia um email", "to")]
+            assert retriever.rank("enviar email", extra, version=2) == ["send_email"]
+        
+        self.run_test("Seleção de ferramentas - subconjunto relevante", relevant_subset)
+        self.run_test("Seleção de ferramentas - alternativa e reindexação", fallback_and_reindex)
+    
+    def test_lazy_tools(self):
+        """Testa o registro de ferramentas com importação do módulo sob demanda"""
+        ToolManager = load("tool_manager").ToolManager
+        register_default_modules = load("tool_catalog").register_default_modules
+        
+        fixture_dir = os.path.join(self.temp_dir, "lazy_modules")
+        os.makedirs(fixture_dir, exist_ok=True)
+        with open(os.path.join(fixture_dir, "lazy_fixture_module.py"), "w", encoding="utf-8") as f:
+            f.write(
+                "from enum import Enum\n"
+                "from typing import Dict, Any, List, Optional\n"
+                "INSTANCES = []\n"
+                "class Unit(Enum):\n"
+                "    SECONDS = 's'\n"
+                "    MINUTES = 'm'\n"
+                "class FixtureModule:\n"
+                "    READ_ONLY_TOOLS = frozenset({'describe'})\n"
+                "    def __init__(self, prefix: str = ''):\n"
+                "        self.prefix = prefix\n"
+                "        INSTANCES.append(self)\n"
+                "    def describe(self, name: str, tags: Optional[List[str]] = None, unit: Unit = Unit.SECONDS) -> Dict[str, Any]:\n"
+                "        \"\"\"Descreve um item\n\n        Detalhes.\"\"\"\n"
+                "        return {'success': True, 'name': self.prefix + name, 'tags': tags}\n"
+                "    def count(self, limit: int = 3):\n"
+                "        \"\"\"Conta até o limite\"\"\"\n"
+                "        def helper():\n"
+                "            return 0\n"
+                "        for index in range(limit):\n"
+                "            yield index\n"
+                "    def _private(self):\n"
+                "        return None\n"
+            )
+        sys.path.insert(0, fixture_dir)
+        
+        def schema_without_import():
+            manager = ToolManager(spill_directory=os.path.join(self.temp_dir, "spill_lazy_module"))
+            names = manager.register_lazy_module("lazy_fixture_module", "FixtureModule", category="test", init_kwargs={"prefix": "> "})
+            assert names == ["describe", "count"]
+            assert "lazy_fixture_module" not in sys.modules
+            
+            describe = manager.tools["describe"]
+            assert describe.description == "Descreve um item" and describe.read_only
+            assert describe.parameters["required"] == ["name"]
+            assert describe.parameters["properties"]["tags"] == {"type": "array", "items": {"type": "string"}, "description": "Parâmetro tags"}
+            assert describe.parameters["properties"]["unit"]["enum"] == ["s", "m"]
+            assert manager.tools["count"].streaming and not manager.tools["count"].read_only
+            
+            # Parâmetros inválidos são rejeitados sem importar o módulo
+            assert not manager.execute_tool("describe", {}).success
+            assert "lazy_fixture_module" not in sys.modules
+            assert manager.get_lazy_tools_status()["loaded_modules"] == []
+            
+            # Primeira chamada importa e instancia; as demais ferramentas usam a mesma instância
+            result = manager.execute_tool("describe", {"name": "a", "tags": "x"})
+            assert result.success and result.result["name"] == "> a" and result.result["tags"] == ["x"]
+            assert manager.execute_tool("count", {"limit": 2}).result == [0, 1]
+            assert len(sys.modules["lazy_fixture_module"].INSTANCES) == 1
+            assert manager.get_lazy_tools_status()["loaded_modules"] == ["lazy_fixture_module.FixtureModule"]
+        
+        def load_failure_is_tool_error():
+            manager = ToolManager(spill_directory=os.path.join(self.temp_dir, "spill_lazy_failure"))
+            manager.register_lazy_module("lazy_fixture_module", "FixtureModule", init_kwargs={"unknown": 1})
+            result = manager.execute_tool("describe", {"name": "a"})
+            assert not result.success and "Falha ao carregar o módulo" in result.error
+        
+        def default_modules_not_imported():
+            manager = ToolManager(spill_directory=os.path.join(self.temp_dir, "spill_lazy_defaults"))
+            before = set(sys.modules)
+            names = register_default_modules(manager, os.path.join(self.temp_dir, "lazy_workspace"))
+            imported = {name.rsplit(".", 1)[-1] for name in set(sys.modules) - before}
+            assert not imported & {"web_navigation_module", "search_module", "system_monitor_module", "selenium", "requests", "bs4", "psutil"}
+            assert {"search_web", "navigate_to_url", "get_system_info", "execute_command", "send_message"} <= set(names)
+            assert manager.tools["search_web"].category == "search"
+            assert manager.tools["get_system_info"].module == "system_monitor_module"
+            assert manager.tools["execute_command_stream"].streaming
+            assert "get_tools" not in manager.tools
+        
+        self.run_test("Ferramentas lazy - schema sem importar o módulo", schema_without_import)
+        self.run_test("Ferramentas lazy - falha ao carregar vira erro da ferramenta", load_failure_is_tool_error)
+        self.run_test("Ferramentas lazy - módulos padrão não importados no registro", default_modules_not_imported)
+    
+    def test_process_pool(self):
+        """Testa a execução de ferramentas CPU-bound no pool de processos"""
+        ToolManager = load("tool_manager").ToolManager
+        FileManagerModule = load("file_manager_module").FileManagerModule
+        
+        def module_tools_run_in_workers():
+            manager = ToolManager(spill_directory=os.path.join(self.temp_dir, "spill_process_pool"))
+            workspace = os.path.join(self.temp_dir, "pool_workspace")
+            files = FileManagerModule(workspace)
+            with open(os.path.join(workspace, "data.bin"), "wb") as f:
+                f.write(b"abc" * 10000)
+            
+            manager.register_tool("calculate_file_hash", files.calculate_file_hash, "Calcula o hash de um arquivo")
+            manager.register_tool("get_file_metadata", files.get_file_metadata, "Metadados de um arquivo")
+            manager.register_tool("worker_pid", worker_pid, "PID do trabalhador", cpu_bound=True)
+            assert manager.tools["calculate_file_hash"].cpu_bound
+            assert not manager.tools["get_file_metadata"].cpu_bound
+            
+            manager.enable_process_pool(max_workers=1)
+            try:
+                # Método de módulo serializado (com a instância) e executado no trabalhador (spawn)
+                result = manager.execute_tool("calculate_file_hash", {"file_path": "data.bin"})
+                assert result.success, result.error
+                assert result.result["hash"] == hashlib.sha256(b"abc" * 10000).hexdigest()
+                
+                pid = manager.execute_tool("worker_pid", {}).result
+                assert pid != os.getpid()
+                assert manager.process_pool.get_status()["tasks_submitted"] == 2
+                
+                # Ferramentas fora de CPU_BOUND_TOOLS continuam no processo atual
+                assert manager.execute_tool("get_file_metadata", {"file_path": "data.bin"}).success
+                assert manager.process_pool.get_status()["tasks_submitted"] == 2
+            finally:
+                manager.disable_process_pool()
+        
+        def recycles_on_current_memory():
+            ToolProcessPool = load("tool_process_pool").ToolProcessPool
+            pool = ToolProcessPool(max_workers=1, max_worker_memory_mb=0)
+            try:
+                baseline_mb = pool.run(load("tool_process_pool")._get_worker_memory_mb, {})
+                assert baseline_mb > 0
+                
+                # Pico temporário acima do limite não recicla: vale a memória atual
+                pool.max_worker_memory_mb = baseline_mb + 64
+                pool.run(allocate_and_release, {"megabytes": 256})
+                assert pool.recycles == 0
+                
+                # Trabalhador acima do limite: o pool é trocado uma única vez
+                pool.max_worker_memory_mb = 1
+                first_pid = pool.run(worker_pid, {})
+                assert pool.recycles == 1
+                assert pool.run(worker_pid, {}) != first_pid
+            finally:
+                pool.shutdown()
+        
+        self.run_test("Pool de processos - ferramentas CPU-bound nos trabalhadores", module_tools_run_in_workers)
+        self.run_test("Pool de processos - reciclagem pela memória atual", recycles_on_current_memory)
+    
+    def test_request_stream(self):
+        """Testa os eventos de process_request_stream"""
+        def events_in_order():
+            core = self.make_reasoning_core("request_stream", [
+                '```json\n{"action": "fetch", "parameters": {"page": 1}}\n```',
+                "Página obtida."
+            ])
+            core.tool_manager.register_tool("fetch", lambda page: f"conteúdo da página {page}", "Busca uma página")
+            
+            events = list(core.process_request_stream("Busque a página 1"))
+            names = [event["event"] for event in events]
+            assert names[0] == "task_started" and names[-1] == "final"
+            assert names.index("tool_started") < names.index("tool_finished")
+            
+            # Os tokens antes da ferramenta formam a ação; os depois, a resposta final
+            split = names.index("tool_started")
+            before = "".join(event["text"] for event in events[:split] if event["event"] == "token")
+            after = "".join(event["text"] for event in events[split:] if event["event"] == "token")
+            assert '"action": "fetch"' in before and after == "Página obtida."
+            
+            finished = events[names.index("tool_finished")]
+            assert finished["name"] == "fetch" and finished["success"]
+            assert events[-1]["response"] == "Página obtida." and events[-1]["budget"] is not None
+        
+        def error_ends_stream():
+            core = self.make_reasoning_core("request_stream_error")
+            
+            def broken(*args, **kwargs):
+                raise RuntimeError("falha interna")
+            
+            core.process_request = broken
+            events = list(core.process_request_stream("Qualquer"))
+            assert [event["event"] for event in events] == ["error"]
+            assert events[0]["error"] == "falha interna"
+        
+        self.run_test("Stream da requisição - eventos em ordem", events_in_order)
+        self.run_test("Stream da requisição - erro encerra o stream", error_ends_stream)
+    
+    def test_request_isolation(self):
+        """Testa o estado por requisição com requisições simultâneas no mesmo núcleo"""
+        def concurrent_requests():
+            
+            class RoutingLLM(FakeLLM):
+                """Responde conforme a requisição do prompt (a ordem das chamadas não é fixa)
+                
+                O histórico e as memórias, compartilhados, podem citar a outra requisição.
+                """
+                
+                def generate_response(self, prompt, **kwargs):
+                    text = prompt if isinstance(prompt, str) else "".join(prompt)
+                    name = "alfa" if "Requisição do usuário: Pedido alfa" in text else "beta"
+                    if "Resultado da ação:" in text:
+                        return f"Resposta {name}."
+                    return f'```json\n{{"action": "echo", "parameters": {{"value": "{name}"}}}}\n```'
+            
+            core = self.make_reasoning_core("request_isolation")
+            core.llm = RoutingLLM([])
+            # As duas requisições ficam com a ferramenta em andamento ao mesmo tempo
+            barrier = threading.Barrier(2, timeout=5)
+            seen_inside = {}
+            
+            def echo(value: str):
+                barrier.wait()
+                seen_inside[value] = (core.current_task["input"], len(core.get_active_tasks()))
+                barrier.wait()
+                return f"eco {value}"
+            
+            core.tool_manager.register_tool("echo", echo, "Repete o valor")
+            outcomes = {}
+            
+            def run(name):
+                response = core.process_request(f"Pedido {name}")
+                outcomes[name] = (response, core.get_last_task())
+            
+            threads = [threading.Thread(target=run, args=(name,)) for name in ("alfa", "beta")]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join(10)
+            
+            for name in ("alfa", "beta"):
+                response, task = outcomes[name]
+                assert response == f"Resposta {name}."
+                assert task["input"] == f"Pedido {name}" and task["status"] == "completed"
+                assert [action["parameters"]["value"] for action in task["actions"]] == [name]
+                # Dentro da ferramenta a tarefa atual é a da própria requisição; as duas estão ativas
+                assert seen_inside[name] == (f"Pedido {name}", 2)
+            
+            # Fora das requisições não há tarefa atual nem ativa
+            assert core.current_task is None and core.get_active_tasks() == []
+        
+        self.run_test("Requisições simultâneas - estado isolado por requisição", concurrent_requests)
+    
+    def run_all_tests(self):
+        """Executa todos os testes"""
+        print("=" * 60)
+        print("INICIANDO TESTES DOS COMPONENTES DO AGENTE AUTÔNOMO")
+        print("=" * 60)
+        
+        test_methods = [
+            self.test_latency_histogram,
+            self.test_plan_cache,
+            self.test_resilience,
+            self.test_action_stream_parser,
+            self.test_cassette,
+            self.test_plan_execution,
+            self.test_result_spill,
+            self.test_tool_streaming,
+            self.test_native_function_calling,
+            self.test_request_budget,
+            self.test_tool_validation,
+            self.test_tool_plan,
+            self.test_speculation,
+            self.test_execution_log,
+            self.test_iteration_timings,
+            self.test_tool_scheduler,
+            self.test_tracing,
+            self.test_reasoning_context,
+            self.test_tool_retriever,
+            self.test_lazy_tools,
+            self.test_process_pool,
+            self.test_request_stream,
+            self.test_request_isolation
+        ]
+        
+        try:
+            for test_method in test_methods:
+                print(f"\n--- Executando {test_method.__name__} ---")
+                test_method()
+        finally:
+            shutil.rmtree(self.temp_dir, ignore_errors=True)
+        
+        return self.generate_report()
+    
+    def generate_report(self) -> bool:
+        """Mostra o resumo dos testes; retorna True se todos passaram"""
+        total_tests = len(self.test_results)
+        passed_tests = sum(1 for result in self.test_results if result["success"])
+        failed_tests = total_tests - passed_tests
+        total_time = (datetime.now() - self.start_time).total_seconds()
+        
+        print("\n" + "=" * 60)
+        print("RELATÓRIO FINAL DOS TESTES")
+        print("=" * 60)
+        print(f"Total de testes: {total_tests}")
+        print(f"Testes aprovados: {passed_tests}")
+        print(f"Testes falharam: {failed_tests}")
+        print(f"Tempo total: {total_time:.2f} segundos")
+        
+        if failed_tests > 0:
+            print("\nTESTES QUE FALHARAM:")
+            for result in self.test_results:
+                if not result["success"]:
+                    print(f"  ❌ {result['test_name']}: {result['details']}")
+        print("=" * 60)
+        
+        return failed_tests == 0
+
+
+def main():
+    """Função principal"""
+    tester = ComponentTester()
+    sys.exit(0 if tester.run_all_tests() else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,241 @@
+"""
+Catálogo de Módulos de Ferramentas - Lê os schemas do código-fonte sem importar os módulos
+"""
+import ast
+import enum
+import importlib.util
+import inspect
+import typing
+from typing import Dict, Any, List, Optional, Tuple
+
+
+# Nomes aceitos nas anotações lidas do código-fonte; os demais valem como Any
+_ANNOTATION_NAMES: Dict[str, Any] = {
+    name: getattr(typing, name)
+    for name in ("Any", "Dict", "List", "Optional", "Tuple", "Union", "Literal", "Iterator", "Set")
+}
+_ANNOTATION_NAMES.update({
+    "str": str, "int": int, "float": float, "bool": bool,
+    "list": list, "dict": dict, "tuple": tuple, "set": set
+})
+
+# Constantes de classe com conjuntos de nomes de ferramentas
+_TOOL_SETS = ("READ_ONLY_TOOLS", "CPU_BOUND_TOOLS")
+
+# Padrão não literal (ex.: MessageType.INFO): o parâmetro é opcional e não anulável
+_NON_LITERAL_DEFAULT = object()
+
+
+def default_tool_modules(workspace_dir: str, headless: bool = True) -> List[Dict[str, Any]]:
+    """Módulos de ferramentas padrão do agente, na ordem de registro"""
+    return [
+        {
+            "module_path": ".shell_module",
+            "class_name": "ShellModule",
+            "category": "shell",
+            "init_kwargs": {"workspace_dir": workspace_dir},
+            # get_system_info fica com o SystemMonitorModule, mais completo
+            "exclude": ("get_tools", "get_system_info")
+        },
+        {
+            "module_path": ".file_manager_module",
+            "class_name": "FileManagerModule",
+            "category": "file",
+            "init_kwargs": {"base_directory": workspace_dir}
+        },
+        {
+            "module_path": ".system_monitor_module",
+            "class_name": "SystemMonitorModule",
+            "category": "system"
+        },
+        {
+            "module_path": ".messaging_module",
+            "class_name": "MessagingModule",
+            "category": "communication"
+        },
+        {
+            "module_path": ".web_navigation_module",
+            "class_name": "WebNavigationModule",
+            "category": "web",
+            "init_kwargs": {"headless": headless},
+            # search_web fica com o SearchModule, que não depende do navegador
+            "exclude": ("search_web",)
+        },
+        {
+            "module_path": ".search_module",
+            "class_name": "SearchModule",
+            "category": "search"
+        }
+    ]
+
+
+def register_default_modules(tool_manager: Any, workspace_dir: str, lazy: bool = True, headless: bool = True) -> List[str]:
+    """Registra as ferramentas dos módulos padrão e retorna seus nomes
+    
+    Com lazy=True (padrão) nenhum módulo é importado aqui: selenium, requests, bs4 e psutil
+    só são carregados na primeira chamada de uma ferramenta do módulo correspondente.
+    """
+    registered = []
+    for entry in default_tool_modules(workspace_dir, headless):
+        if lazy:
+            registered.extend(tool_manager.register_lazy_module(**entry))
+        else:
+            module = importlib.import_module(entry["module_path"], package=__package__)
+            instance = getattr(module, entry["class_name"])(**entry.get("init_kwargs", {}))
+            registered.extend(tool_manager.register_module(
+                instance,
+                category=entry["category"],
+                exclude=entry.get("exclude", ())
+            ))
+    return registered
+
+
+def read_tool_catalog(module_path: str, class_name: str, package: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Lê do código-fonte as ferramentas (métodos públicos) de uma classe, sem importar o módulo
+    
+    Cada item traz name, description, signature (inspect.Signature sem self), streaming
+    (método gerador), read_only e cpu_bound (declarados em READ_ONLY_TOOLS e CPU_BOUND_TOOLS).
+    """
+    spec = importlib.util.find_spec(module_path, package=package)
+    if spec is None or not spec.origin or not spec.origin.endswith(".py"):
+        raise ValueError(f"Código-fonte do módulo '{module_path}' não encontrado")
+    
+    with open(spec.origin, encoding="utf-8") as f:
+        tree = ast.parse(f.read(), filename=spec.origin)
+    
+    class_node = next(
+        (node for node in tree.body if isinstance(node, ast.ClassDef) and node.name == class_name),
+        None
+    )
+    if class_node is None:
+        raise ValueError(f"Classe '{class_name}' não encontrada em '{module_path}'")
+    
+    namespace = dict(_ANNOTATION_NAMES)
+    namespace.update(_module_enums(tree))
+    tool_sets = _class_tool_sets(class_node)
+    
+    catalog = []
+    for node in class_node.body:
+        if not isinstance(node, ast.FunctionDef) or node.name.startswith("_") or node.decorator_list:
+            continue
+        docstring = ast.get_docstring(node) or node.name
+        catalog.append({
+            "name": node.name,
+            "description": docstring.strip().splitlines()[0],
+            "signature": _signature(node, namespace),
+            "streaming": _is_generator(node),
+            "read_only": node.name in tool_sets["READ_ONLY_TOOLS"],
+            "cpu_bound": node.name in tool_sets["CPU_BOUND_TOOLS"]
+        })
+    return catalog
+
+
+def _module_enums(tree: ast.Module) -> Dict[str, Any]:
+    """Recria os Enums do módulo (para gerar o mesmo schema com enum que a importação geraria)"""
+    enums = {}
+    for node in tree.body:
+        if not isinstance(node, ast.ClassDef):
+            continue
+        bases = {base.id if isinstance(base, ast.Name) else getattr(base, "attr", None) for base in node.bases}
+        if not bases & {"Enum", "IntEnum", "StrEnum"}:
+            continue
+        members = {}
+        for statement in node.body:
+            if isinstance(statement, ast.Assign) and len(statement.targets) == 1 and isinstance(statement.targets[0], ast.Name):
+                try:
+                    members[statement.targets[0].id] = ast.literal_eval(statement.value)
+                except ValueError:
+                    continue
+        if members:
+            enums[node.name] = enum.Enum(node.name, members)
+    return enums
+
+
+def _class_tool_sets(class_node: ast.ClassDef) -> Dict[str, frozenset]:
+    """Lê READ_ONLY_TOOLS e CPU_BOUND_TOOLS (frozenset({...}), set ou lista literal) da classe"""
+    tool_sets = {name: frozenset() for name in _TOOL_SETS}
+    for statement in class_node.body:
+        if not isinstance(statement, ast.Assign) or len(statement.targets) != 1:
+            continue
+        target = statement.targets[0]
+        if not isinstance(target, ast.Name) or target.id not in tool_sets:
+            continue
+        value = statement.value
+        if isinstance(value, ast.Call) and not value.keywords and len(value.args) <= 1:
+            value = value.args[0] if value.args else ast.List(elts=[], ctx=ast.Load())
+        tool_sets[target.id] = frozenset(ast.literal_eval(value))
+    return tool_sets
+
+
+def _signature(node: ast.FunctionDef, namespace: Dict[str, Any]) -> inspect.Signature:
+    """Monta a assinatura do método (sem self) a partir da árvore sintática"""
+    args = node.args
+    positional = args.posonlyargs + args.args
+    defaults = [None] * (len(positional) - len(args.defaults)) + list(args.defaults)
+    
+    parameters = []
+    for index, (arg, default) in enumerate(zip(positional, defaults)):
+        if index == 0:
+            continue  # self
+        kind = inspect.Parameter.POSITIONAL_ONLY if arg in args.posonlyargs else inspect.Parameter.POSITIONAL_OR_KEYWORD
+        parameters.append(_parameter(arg, kind, default, namespace))
+    if args.vararg:
+        parameters.append(_parameter(args.vararg, inspect.Parameter.VAR_POSITIONAL, None, namespace))
+    for arg, default in zip(args.kwonlyargs, args.kw_defaults):
+        parameters.append(_parameter(arg, inspect.Parameter.KEYWORD_ONLY, default, namespace))
+    if args.kwarg:
+        parameters.append(_parameter(args.kwarg, inspect.Parameter.VAR_KEYWORD, None, namespace))
+    
+    return inspect.Signature(parameters)
+
+
+def _parameter(arg: ast.arg, kind: Any, default: Optional[ast.expr], namespace: Dict[str, Any]) -> inspect.Parameter:
+    """Converte um argumento da árvore sintática em inspect.Parameter"""
+    if default is None:
+        value = inspect.Parameter.empty
+    else:
+        try:
+            value = ast.literal_eval(default)
+        except ValueError:
+            value = _NON_LITERAL_DEFAULT
+    annotation = _annotation(arg.annotation, namespace) if arg.annotation is not None else inspect.Parameter.empty
+    return inspect.Parameter(arg.arg, kind, default=value, annotation=annotation)
+
+
+def _annotation(node: ast.expr, namespace: Dict[str, Any]) -> Any:
+    """Converte uma anotação da árvore sintática no tipo equivalente (Any quando desconhecida)"""
+    if isinstance(node, ast.Constant):
+        if node.value is None:
+            return type(None)
+        if isinstance(node.value, str):
+            return _annotation(ast.parse(node.value, mode="eval").body, namespace)
+        return Any
+    if isinstance(node, ast.Name):
+        return namespace.get(node.id, Any)
+    if isinstance(node, ast.BinOp) and isinstance(node.op, ast.BitOr):
+        return typing.Union[_annotation(node.left, namespace), _annotation(node.right, namespace)]
+    if isinstance(node, ast.Subscript):
+        origin = _annotation(node.value, namespace)
+        elements = node.slice.elts if isinstance(node.slice, ast.Tuple) else [node.slice]
+        try:
+            if origin is typing.Literal:
+                arguments: Tuple[Any, ...] = tuple(ast.literal_eval(element) for element in elements)
+            else:
+                arguments = tuple(_annotation(element, namespace) for element in elements)
+            return origin[arguments if len(arguments) > 1 else arguments[0]]
+        except (TypeError, ValueError):
+            return Any
+    return Any
+
+
+def _is_generator(node: ast.FunctionDef) -> bool:
+    """Verifica se a função contém yield (ignorando funções aninhadas)"""
+    pending = list(node.body)
+    while pending:
+        current = pending.pop()
+        if isinstance(current, (ast.Yield, ast.YieldFrom)):
+            return True
+        if isinstance(current, (ast.FunctionDef, ast.AsyncFunctionDef, ast.Lambda, ast.ClassDef)):
+            continue
+        pending.extend(ast.iter_child_nodes(current))
+    return False
@@ -1,12 +1,29 @@
 """
 Gerenciador de Ferramentas do Agente
 """
+import enum
+import hashlib
+import importlib
 import inspect
 import json
-from typing import Dict, Any, List, Callable, Optional
+import threading
+import time
+from typing import Dict, Any, List, Callable, Optional, Iterator, Tuple, Union, Literal, get_origin, get_args
 from pydantic import BaseModel, Field
 from datetime import datetime
 
+from .tool_metrics import LatencyHistogram
+from .tool_validation import ParameterValidator
+from .tool_process_pool import ToolProcessPool
+from .result_spill import ResultSpillStore
+from .tool_scheduler import ToolScheduler, SchedulerTimeoutError
+from .tool_plan import ToolPlanExecutor
+from .resilience import RetryPolicy, CircuitBreakerRegistry
+from .execution_log import ToolExecutionLog
+from .tracing import tracer
+from .cassette import Cassette, CassetteMissError, interaction_key
+from .tool_catalog import read_tool_catalog
+
 
 class ToolDefinition(BaseModel):
     """Definição de uma ferramenta"""
@@ -16,6 +33,14 @@ class ToolDefinition(BaseModel):
     function: Optional[Callable] = Field(exclude=True)
     module: Optional[str] = None
     category: str = "general"
+    validator: Optional[ParameterValidator] = Field(default=None, exclude=True)
+    loader: Optional[Callable] = Field(default=None, exclude=True)  # Importa o módulo na primeira chamada
+    cpu_bound: bool = False
+    streaming: bool = False
+    read_only: bool = False  # Sem efeitos colaterais: pode ser executada especulativamente
+    
+    class Config:
+        arbitrary_types_allowed = True
 
 
 class ToolResult(BaseModel):
@@ -24,16 +49,70 @@ class ToolResult(BaseModel):
     result: Any = None
     error: Optional[str] = None
     execution_time: float = 0.0
+    queue_time: float = 0.0
+    attempts: int = 1
     timestamp: datetime = Field(default_factory=datetime.now)
+    spill_id: Optional[str] = None
+    preview: Optional[str] = None
+    result_size: int = 0
+    
+    def compact_result(self) -> Any:
+        """Retorna a prévia para resultados despejados em disco, ou o resultado completo"""
+        return self.preview if self.spill_id else self.result
 
 
 class ToolManager:
     """Gerenciador de ferramentas do agente"""
     
-    def __init__(self):
+    def __init__(
+        self,
+        spill_directory: str = "./data/tool_results",
+        spill_threshold_bytes: int = 64 * 1024
+    ):
         self.tools: Dict[str, ToolDefinition] = {}
+        # Incrementada a cada registro; permite cachear textos derivados do catálogo
+        self.catalog_version = 0
         self.execution_history: List[Dict[str, Any]] = []
         self.max_history_size = 1000
+        
+        # Histogramas de latência por ferramenta e por categoria
+        self.tool_latency: Dict[str, LatencyHistogram] = {}
+        self.category_latency: Dict[str, LatencyHistogram] = {}
+        self._metrics_lock = threading.Lock()
+        
+        # Instâncias dos módulos de ferramentas lazy, criadas na primeira chamada
+        self._lazy_instances: Dict[tuple, Any] = {}
+        self._lazy_lock = threading.Lock()
+        
+        # Pool de processos para ferramentas CPU-bound (desativado por padrão)
+        self.process_pool: Optional[ToolProcessPool] = None
+        
+        # Limites de concorrência e de taxa por categoria
+        self.scheduler = ToolScheduler()
+        
+        # Retentativas e circuit breakers (por padrão só para ferramentas de rede)
+        self.retry_policies: Dict[str, RetryPolicy] = {}
+        self.category_retry_policies: Dict[str, RetryPolicy] = {
+            "web": RetryPolicy(),
+            "search": RetryPolicy()
+        }
+        self.circuit_breakers = CircuitBreakerRegistry()
+        
+        # Log persistente de execuções (ativado com enable_execution_log)
+        self.execution_log: Optional[ToolExecutionLog] = None
+        
+        # Gravação/reprodução de resultados para benchmarks offline
+        self.cassette: Optional[Cassette] = None
+        
+        # Resultados grandes ficam em disco; histórico, memória e prompts guardam só um handle
+        self.spill_store = ResultSpillStore(spill_directory, spill_threshold_bytes)
+        self.register_tool(
+            "read_tool_result",
+            self.read_spilled_result,
+            "Lê um trecho de um resultado grande de ferramenta guardado em disco (use o spill_id informado)",
+            category="system",
+            read_only=True
+        )
     
     def register_tool(
         self,
@@ -41,29 +120,31 @@ class ToolManager:
         function: Callable,
         description: str,
         category: str = "general",
-        module: Optional[str] = None
+        module: Optional[str] = None,
+        parameters: Optional[Dict[str, Any]] = None,
+        cpu_bound: Optional[bool] = None,
+        retry_policy: Optional[RetryPolicy] = None,
+        streaming: Optional[bool] = None,
+        read_only: Optional[bool] = None
     ) -> None:
-        """Registra uma nova ferramenta"""
+        """Registra uma nova ferramenta (funções geradoras são registradas como ferramentas de streaming)
+        
+        Sem read_only/cpu_bound explícitos, métodos de módulos valem o que o módulo declara em
+        READ_ONLY_TOOLS e CPU_BOUND_TOOLS.
+        """
+        owner = getattr(function, "__self__", None)
+        method_name = getattr(function, "__name__", None)
+        if read_only is None:
+            read_only = method_name in getattr(owner, "READ_ONLY_TOOLS", ())
+        if cpu_bound is None:
+            cpu_bound = method_name in getattr(owner, "CPU_BOUND_TOOLS", ())
         
         # Extrair parâmetros da função
-        sig = inspect.signature(function)
-        parameters = {
-            "type": "object",
-            "properties": {},
-            "required": []
-        }
+        signature_parameters, nullable, untyped, accepts_extra = self._signature_schema(inspect.signature(function))
         
-        for param_name, param in sig.parameters.items():
-            param_info = {
-                "type": self._get_param_type(param.annotation),
-                "description": f"Parâmetro {param_name}"
-            }
-            
-            parameters["properties"][param_name] = param_info
-            
-            # Se não tem valor padrão, é obrigatório
-            if param.default == inspect.Parameter.empty:
-                parameters["required"].append(param_name)
+        # Um schema explícito (com descrições e enums) tem precedência sobre a assinatura
+        if parameters is None:
+            parameters = signature_parameters
         
         tool_def = ToolDefinition(
             name=name,
@@ -71,14 +152,249 @@ class ToolManager:
             parameters=parameters,
             function=function,
             module=module,
-            category=category
+            category=category,
+            validator=ParameterValidator(parameters, nullable, untyped, accepts_extra),
+            cpu_bound=cpu_bound,
+            streaming=inspect.isgeneratorfunction(function) if streaming is None else streaming,
+            read_only=read_only
         )
         
         self.tools[name] = tool_def
+        self.catalog_version += 1
+        if retry_policy:
+            self.retry_policies[name] = retry_policy
         print(f"Ferramenta '{name}' registrada com sucesso")
     
+    def _signature_schema(self, sig: inspect.Signature) -> Tuple[Dict[str, Any], List[str], List[str], bool]:
+        """Converte uma assinatura em (schema, anuláveis, sem tipo, aceita parâmetros extras)"""
+        schema = {
+            "type": "object",
+            "properties": {},
+            "required": []
+        }
+        nullable = []
+        untyped = []
+        accepts_extra = False
+        
+        for param_name, param in sig.parameters.items():
+            if param.kind == inspect.Parameter.VAR_KEYWORD:
+                accepts_extra = True
+                continue
+            if param.kind == inspect.Parameter.VAR_POSITIONAL:
+                continue
+            
+            param_info = self._get_param_schema(param.annotation)
+            param_info["description"] = f"Parâmetro {param_name}"
+            
+            schema["properties"][param_name] = param_info
+            
+            # Se não tem valor padrão, é obrigatório
+            if param.default is inspect.Parameter.empty:
+                schema["required"].append(param_name)
+            
+            if param.default is None or self._is_optional(param.annotation):
+                nullable.append(param_name)
+            if param.annotation in (inspect.Parameter.empty, Any):
+                untyped.append(param_name)
+        
+        return schema, nullable, untyped, accepts_extra
+    
+    def register_module(
+        self,
+        instance: Any,
+        category: str = "general",
+        exclude: Tuple[str, ...] = ()
+    ) -> List[str]:
+        """Registra os métodos públicos de uma instância de módulo como ferramentas"""
+        module = type(instance).__module__.rsplit(".", 1)[-1]
+        registered = []
+        for name, method in inspect.getmembers(instance, inspect.ismethod):
+            if name.startswith("_") or name in exclude:
+                continue
+            description = (inspect.getdoc(method) or name).strip().splitlines()[0]
+            self.register_tool(name, method, description, category=category, module=module)
+            registered.append(name)
+        return registered
+    
+    def register_lazy_module(
+        self,
+        module_path: str,
+        class_name: str,
+        category: str = "general",
+        init_kwargs: Optional[Dict[str, Any]] = None,
+        exclude: Tuple[str, ...] = ()
+    ) -> List[str]:
+        """Registra as ferramentas de um módulo sem importá-lo (o schema é lido do código-fonte)
+        
+        O módulo é importado e a classe instanciada (uma vez, com init_kwargs) só na primeira
+        chamada de uma de suas ferramentas; parâmetros inválidos são rejeitados antes disso.
+        """
+        catalog = read_tool_catalog(module_path, class_name, __package__)
+        instance_key = (module_path, class_name, json.dumps(init_kwargs or {}, sort_keys=True, default=str))
+        module = module_path.lstrip(".").rsplit(".", 1)[-1]
+        registered = []
+        
+        for entry in catalog:
+            if entry["name"] in exclude:
+                continue
+            parameters, nullable, untyped, accepts_extra = self._signature_schema(entry["signature"])
+            self.tools[entry["name"]] = ToolDefinition(
+                name=entry["name"],
+                description=entry["description"],
+                parameters=parameters,
+                function=None,
+                module=module,
+                category=category,
+                validator=ParameterValidator(parameters, nullable, untyped, accepts_extra),
+                loader=self._lazy_loader(instance_key, init_kwargs or {}, entry["name"]),
+                cpu_bound=entry["cpu_bound"],
+                streaming=entry["streaming"],
+                read_only=entry["read_only"]
+            )
+            registered.append(entry["name"])
+        
+        self.catalog_version += 1
+        print(f"Módulo '{module}' registrado com {len(registered)} ferramentas (carregamento sob demanda)")
+        return registered
+    
+    def _lazy_loader(self, instance_key: tuple, init_kwargs: Dict[str, Any], method_name: str) -> Callable[[], Callable]:
+        """Cria a função que importa o módulo, instancia a classe (uma vez) e retorna o método"""
+        module_path, class_name, _ = instance_key
+        
+        def loader() -> Callable:
+            with self._lazy_lock:
+                instance = self._lazy_instances.get(instance_key)
+                if instance is None:
+                    module = importlib.import_module(module_path, package=__package__)
+                    instance = getattr(module, class_name)(**init_kwargs)
+                    self._lazy_instances[instance_key] = instance
+            return getattr(instance, method_name)
+        
+        return loader
+    
+    def _resolve_function(self, tool: ToolDefinition) -> Callable:
+        """Retorna a função da ferramenta, importando o módulo das ferramentas lazy na primeira chamada"""
+        if tool.function is None and tool.loader is not None:
+            try:
+                tool.function = tool.loader()
+            except Exception as e:
+                raise RuntimeError(f"Falha ao carregar o módulo '{tool.module}' da ferramenta '{tool.name}': {e}")
+        return tool.function
+    
+    def get_lazy_tools_status(self) -> Dict[str, Any]:
+        """Retorna quais módulos de ferramentas lazy já foram importados"""
+        lazy_tools = [tool for tool in self.tools.values() if tool.loader is not None]
+        loaded_modules = {f"{key[0].lstrip('.')}.{key[1]}" for key in self._lazy_instances}
+        return {
+            "lazy_tools": len(lazy_tools),
+            "loaded_tools": [tool.name for tool in lazy_tools if tool.function is not None],
+            "loaded_modules": sorted(loaded_modules)
+        }
+    
+    def enable_process_pool(
+        self,
+        max_workers: Optional[int] = None,
+        max_tasks_per_child: int = 100,
+        max_worker_memory_mb: float = 512.0
+    ) -> None:
+        """Ativa o modo de isolamento: ferramentas cpu_bound passam a rodar em processos separados
+        
+        Métodos de módulos vão serializados com a instância a cada chamada: mudanças de estado
+        feitas no trabalhador (ex.: o histórico de operações) não voltam a este processo.
+        """
+        if self.process_pool is not None:
+            self.process_pool.shutdown()
+        self.process_pool = ToolProcessPool(max_workers, max_tasks_per_child, max_worker_memory_mb)
+    
+    def disable_process_pool(self) -> None:
+        """Desativa o pool de processos e encerra os trabalhadores"""
+        if self.process_pool is not None:
+            self.process_pool.shutdown()
+            self.process_pool = None
+    
+    def set_cpu_bound(self, name: str, cpu_bound: bool = True) -> bool:
+        """Marca (ou desmarca) uma ferramenta registrada como CPU-bound"""
+        tool = self.tools.get(name)
+        if not tool:
+            return False
+        tool.cpu_bound = cpu_bound
+        return True
+    
+    def set_read_only(self, name: str, read_only: bool = True) -> bool:
+        """Marca (ou desmarca) uma ferramenta registrada como somente leitura (sem efeitos colaterais)"""
+        tool = self.tools.get(name)
+        if not tool:
+            return False
+        tool.read_only = read_only
+        return True
+    
+    def _run_function(self, tool: ToolDefinition, parameters: Dict[str, Any]) -> Any:
+        """Executa a função da ferramenta no processo atual ou no pool de processos"""
+        function = self._resolve_function(tool)
+        if tool.cpu_bound and not tool.streaming and self.process_pool is not None:
+            return self.process_pool.run(function, parameters)
+        
+        result = function(**parameters)
+        
+        # Ferramentas de streaming chamadas sem stream_tool: consumir o gerador inteiro
+        if inspect.isgenerator(result):
+            return self._collect_stream(result)
+        return result
+    
+    def _collect_stream(self, generator: Iterator[Any]) -> Any:
+        """Consome um gerador; o valor de retorno (se houver) tem precedência sobre a lista de partes"""
+        chunks = []
+        while True:
+            try:
+                chunks.append(next(generator))
+            except StopIteration as stop:
+                return stop.value if stop.value is not None else chunks
+    
+    def configure_limits(
+        self,
+        category: Optional[str] = None,
+        tool_name: Optional[str] = None,
+        max_concurrency: Optional[int] = None,
+        rate_per_second: Optional[float] = None,
+        burst: Optional[float] = None
+    ) -> None:
+        """Configura limites de concorrência/taxa de uma categoria ou de uma ferramenta específica"""
+        if tool_name:
+            self.scheduler.configure_tool(tool_name, max_concurrency, rate_per_second, burst)
+        elif category:
+            self.scheduler.configure_category(category, max_concurrency, rate_per_second, burst)
+        else:
+            raise ValueError("Informe a categoria ou o nome da ferramenta")
+    
+    def _is_optional(self, annotation) -> bool:
+        """Verifica se a anotação aceita None (Optional[X])"""
+        return get_origin(annotation) is Union and type(None) in get_args(annotation)
+    
+    def _unwrap_optional(self, annotation):
+        """Remove o Optional de uma anotação"""
+        if self._is_optional(annotation):
+            args = [arg for arg in get_args(annotation) if arg is not type(None)]
+            return args[0] if len(args) == 1 else Union[tuple(args)]
+        return annotation
+    
     def _get_param_type(self, annotation) -> str:
         """Converte anotação de tipo Python para tipo JSON Schema"""
+        annotation = self._unwrap_optional(annotation)
+        origin = get_origin(annotation)
+        
+        if origin in (list, tuple, set, frozenset):
+            return "array"
+        elif origin is dict:
+            return "object"
+        elif origin is Literal:
+            values = get_args(annotation)
+            return self._get_param_type(type(values[0])) if values else "string"
+        elif origin is Union:
+            # Union de tipos distintos: usar o primeiro
+            return self._get_param_type(get_args(annotation)[0])
+        elif inspect.isclass(annotation) and issubclass(annotation, enum.Enum):
+            return "string"
+        
         if annotation == str or annotation == "str":
             return "string"
         elif annotation == int or annotation == "int":
@@ -87,13 +403,30 @@ class ToolManager:
             return "number"
         elif annotation == bool or annotation == "bool":
             return "boolean"
-        elif annotation == list or annotation == "list":
+        elif annotation in (list, tuple, set) or annotation == "list":
             return "array"
         elif annotation == dict or annotation == "dict":
             return "object"
         else:
             return "string"  # Padrão
     
+    def _get_param_schema(self, annotation) -> Dict[str, Any]:
+        """Converte anotação de tipo Python para schema JSON completo (itens e enums)"""
+        annotation = self._unwrap_optional(annotation)
+        origin = get_origin(annotation)
+        schema = {"type": self._get_param_type(annotation)}
+        
+        if origin in (list, tuple, set, frozenset):
+            args = [arg for arg in get_args(annotation) if arg is not Ellipsis]
+            if args:
+                schema["items"] = self._get_param_schema(args[0])
+        elif origin is Literal:
+            schema["enum"] = list(get_args(annotation))
+        elif inspect.isclass(annotation) and issubclass(annotation, enum.Enum):
+            schema["enum"] = [member.value for member in annotation]
+        
+        return schema
+    
     def get_tool_definitions(self) -> List[Dict[str, Any]]:
         """Retorna as definições de todas as ferramentas em formato OpenAI"""
         definitions = []
@@ -123,7 +456,29 @@ class ToolManager:
     
     def execute_tool(self, name: str, parameters: Dict[str, Any]) -> ToolResult:
         """Executa uma ferramenta com os parâmetros fornecidos"""
+        tool = self.tools.get(name)
+        with tracer.span("tool.execute", tool=name, category=tool.category if tool else None) as span:
+            if self.cassette is not None and self.cassette.replaying:
+                result = self._replay_tool_result(name, parameters)
+            else:
+                result = self._execute_tool(name, parameters)
+                self._record_tool_result(name, parameters, result)
+            if span:
+                span.set_attributes(
+                    success=result.success,
+                    attempts=result.attempts,
+                    queue_time=result.queue_time
+                )
+                if not result.success:
+                    span.status = "error"
+                    span.error = result.error
+            return result
+    
+    def _execute_tool(self, name: str, parameters: Dict[str, Any]) -> ToolResult:
+        """Executa uma ferramenta (validação, limites, retentativas e histórico)"""
         start_time = datetime.now()
+        queue_time = 0.0
+        attempts = 1
         
         try:
             tool = self.tools.get(name)
@@ -134,35 +489,111 @@ class ToolManager:
                     execution_time=0.0
                 )
             
-            if not tool.function:
+            if not tool.function and not tool.loader:
                 return ToolResult(
                     success=False,
                     error=f"Função não definida para a ferramenta '{name}'",
                     execution_time=0.0
                 )
             
-            # Validar parâmetros obrigatórios
-            required_params = tool.parameters.get("required", [])
-            for param in required_params:
-                if param not in parameters:
+            # Validar e converter parâmetros antes de executar
+            if tool.validator:
+                parameters, validation_error = tool.validator.validate(parameters)
+                if validation_error:
                     return ToolResult(
                         success=False,
-                        error=f"Parâmetro obrigatório '{param}' não fornecido",
+                        error=validation_error,
                         execution_time=0.0
                     )
             
-            # Executar a função
-            result = tool.function(**parameters)
+            retry_policy = self._get_retry_policy(tool)
+            breakers = self.circuit_breakers.get_breakers(name, parameters) if retry_policy else []
+            retry_deadline = time.monotonic() + (retry_policy.max_total_time if retry_policy else 0.0)
+            attempts = 0
+            total_queue_time = 0.0
             
-            execution_time = (datetime.now() - start_time).total_seconds()
+            while True:
+                # Dependência sabidamente quebrada: falhar rápido
+                allowed = [breaker for breaker in breakers if breaker.allow()]
+                if len(allowed) < len(breakers):
+                    for breaker in allowed:
+                        breaker.release()
+                    return self._circuit_open_result(name, parameters, breakers, attempts, total_queue_time)
+                
+                attempts += 1
+                exception = None
+                result = None
+                
+                # Aguardar vaga na categoria (concorrência e taxa) antes de executar
+                try:
+                    with self.scheduler.slot(name, tool.category) as queue_time:
+                        total_queue_time += queue_time
+                        start_time = datetime.now()
+                        try:
+                            result = self._run_function(tool, parameters)
+                        except Exception as e:
+                            exception = e
+                        execution_time = (datetime.now() - start_time).total_seconds()
+                except SchedulerTimeoutError:
+                    # Chamada não executada: devolver a chamada de teste dos breakers meio abertos
+                    for breaker in allowed:
+                        breaker.release()
+                    raise
+                
+                queue_time = total_queue_time
+                failure = str(exception) if exception is not None else self._get_result_error(result)
+                if failure is None:
+                    for breaker in breakers:
+                        breaker.record_success()
+                    break
+                
+                # Só erros transitórios indicam dependência degradada; os demais provam que ela respondeu
+                transient = retry_policy is not None and retry_policy.is_retryable(failure, exception)
+                for breaker in breakers:
+                    if transient:
+                        breaker.record_failure()
+                    else:
+                        breaker.record_success()
+                
+                # Retentar apenas erros transitórios, dentro do orçamento de tempo da política
+                if transient and attempts < retry_policy.max_attempts:
+                    delay = retry_policy.delay_for(attempts)
+                    if time.monotonic() + delay < retry_deadline:
+                        self._record_latency(tool, execution_time, False)
+                        time.sleep(delay)
+                        continue
+                
+                if exception is not None:
+                    raise exception
+                break
+            
+            # Despejar resultados grandes em disco
+            spill_handle = self.spill_store.maybe_spill(result) if name != "read_tool_result" else None
             
             # Registrar no histórico
-            self._add_to_history(name, parameters, result, True, execution_time)
+            self._add_to_history(name, parameters, result, True, execution_time, spill_handle=spill_handle, queue_time=queue_time, attempts=attempts)
+            self._record_latency(tool, execution_time, True)
             
             return ToolResult(
                 success=True,
                 result=result,
-                execution_time=execution_time
+                execution_time=execution_time,
+                queue_time=queue_time,
+                attempts=attempts,
+                spill_id=spill_handle["spill_id"] if spill_handle else None,
+                preview=spill_handle["preview"] if spill_handle else None,
+                result_size=spill_handle["size"] if spill_handle else 0
+            )
+        
+        except SchedulerTimeoutError as e:
+            queue_time = (datetime.now() - start_time).total_seconds()
+            self._add_to_history(name, parameters, None, False, 0.0, str(e), queue_time=queue_time)
+            
+            return ToolResult(
+                success=False,
+                error=str(e),
+                execution_time=0.0,
+                queue_time=queue_time
             )
             
         except Exception as e:
@@ -170,14 +601,335 @@ class ToolManager:
             error_msg = str(e)
             
             # Registrar erro no histórico
-            self._add_to_history(name, parameters, None, False, execution_time, error_msg)
+            self._add_to_history(name, parameters, None, False, execution_time, error_msg, queue_time=queue_time, attempts=attempts)
+            self._record_latency(self.tools.get(name), execution_time, False)
             
             return ToolResult(
                 success=False,
                 error=error_msg,
-                execution_time=execution_time
+                execution_time=execution_time,
+                queue_time=queue_time,
+                attempts=attempts
             )
     
+    def _get_retry_policy(self, tool: ToolDefinition) -> Optional[RetryPolicy]:
+        """Retorna a política de retentativa da ferramenta ou da sua categoria"""
+        return self.retry_policies.get(tool.name) or self.category_retry_policies.get(tool.category)
+    
+    def _get_result_error(self, result: Any) -> Optional[str]:
+        """Detecta falhas reportadas como {"success": False} pelos módulos"""
+        if isinstance(result, dict) and result.get("success") is False:
+            return str(result.get("error") or "Falha reportada pela ferramenta")
+        return None
+    
+    def _circuit_open_result(
+        self,
+        name: str,
+        parameters: Dict[str, Any],
+        breakers: List[Any],
+        attempts: int,
+        queue_time: float
+    ) -> ToolResult:
+        """Monta o resultado de uma chamada rejeitada por circuito aberto"""
+        retry_after = max(breaker.retry_after() for breaker in breakers)
+        error_msg = f"Circuito aberto para '{name}': dependência indisponível, nova tentativa em {retry_after:.1f}s"
+        self._add_to_history(name, parameters, None, False, 0.0, error_msg, queue_time=queue_time, attempts=attempts)
+        
+        return ToolResult(
+            success=False,
+            error=error_msg,
+            execution_time=0.0,
+            queue_time=queue_time,
+            attempts=attempts
+        )
+    
+    def set_retry_policy(
+        self,
+        policy: Optional[RetryPolicy],
+        tool_name: Optional[str] = None,
+        category: Optional[str] = None
+    ) -> None:
+        """Define (ou remove, com None) a política de retentativa de uma ferramenta ou categoria"""
+        target = self.retry_policies if tool_name else self.category_retry_policies
+        key = tool_name or category
+        if not key:
+            raise ValueError("Informe a categoria ou o nome da ferramenta")
+        if policy is None:
+            target.pop(key, None)
+        else:
+            target[key] = policy
+    
+    def stream_tool(
+        self,
+        name: str,
+        parameters: Dict[str, Any],
+        max_chunks: Optional[int] = None
+    ) -> Iterator[Dict[str, Any]]:
+        """Executa uma ferramenta produzindo um evento por parte do resultado, conforme são geradas
+        
+        Eventos: {"event": "chunk", "index", "data"} e, ao final, {"event": "completed", ...}.
+        Parar de consumir (ou atingir max_chunks) encerra o gerador da ferramenta. Ferramentas
+        comuns produzem um único chunk. Os circuit breakers valem como em execute_tool, mas não
+        há retentativas: partes já podem ter sido repassadas.
+        """
+        tool = self.tools.get(name)
+        if not tool or (not tool.function and not tool.loader):
+            yield {"event": "completed", "tool": name, "success": False, "error": f"Ferramenta '{name}' não encontrada", "chunks": 0}
+            return
+        
+        if tool.validator:
+            parameters, validation_error = tool.validator.validate(parameters)
+            if validation_error:
+                yield {"event": "completed", "tool": name, "success": False, "error": validation_error, "chunks": 0}
+                return
+        
+        # Mesmos circuit breakers de execute_tool: dependência sabidamente quebrada falha rápido
+        retry_policy = self._get_retry_policy(tool)
+        breakers = self.circuit_breakers.get_breakers(name, parameters) if retry_policy else []
+        allowed = [breaker for breaker in breakers if breaker.allow()]
+        if len(allowed) < len(breakers):
+            for breaker in allowed:
+                breaker.release()
+            rejected = self._circuit_open_result(name, parameters, breakers, 0, 0.0)
+            yield {"event": "completed", "tool": name, "success": False, "error": rejected.error, "chunks": 0}
+            return
+        
+        writer = self.spill_store.stream_writer()
+        streaming = False
+        started = False
+        chunk_count = 0
+        result = None
+        spill_handle = None
+        error = None
+        exception = None
+        truncated = False
+        queue_time = 0.0
+        start = time.monotonic()
+        
+        try:
+            with self.scheduler.slot(name, tool.category) as queue_time:
+                start = time.monotonic()
+                started = True
+                output = self._resolve_function(tool)(**parameters)
+                streaming = inspect.isgenerator(output)
+                if streaming:
+                    finished, value = self._advance_stream(output)
+            
+            if not streaming:
+                chunk_count = 1
+                result = output
+                yield {"event": "chunk", "tool": name, "index": 0, "data": output}
+            else:
+                try:
+                    while not finished:
+                        writer.append(value)
+                        chunk_count += 1
+                        # A vaga fica livre enquanto o consumidor processa a parte
+                        yield {"event": "chunk", "tool": name, "index": chunk_count - 1, "data": value}
+                        
+                        if max_chunks and chunk_count >= max_chunks:
+                            truncated = True
+                            break
+                        
+                        with self.scheduler.slot(name, tool.category, rate_limited=False) as waited:
+                            queue_time += waited
+                            finished, value = self._advance_stream(output)
+                    
+                    if finished and value is not None:
+                        # O valor de retorno tem precedência sobre as partes
+                        writer.discard()
+                        result = value
+                finally:
+                    # Consumidor parou (ou limite atingido): liberar os recursos da ferramenta
+                    output.close()
+        
+        except GeneratorExit:
+            truncated = True
+            raise
+        
+        except Exception as e:
+            error = str(e)
+            exception = e
+        
+        finally:
+            execution_time = time.monotonic() - start
+            if streaming and result is None and error is None:
+                result, spill_handle = writer.finish()
+            else:
+                writer.discard()
+            error = error or self._get_result_error(result)
+            success = error is None
+            self._record_stream_outcome(breakers, retry_policy, started, error, exception)
+            if success and spill_handle is None:
+                spill_handle = self.spill_store.maybe_spill(result)
+            self._add_to_history(
+                name, parameters, result, success, execution_time, error,
+                spill_handle=spill_handle, queue_time=queue_time
+            )
+            self._record_latency(tool, execution_time, success)
+        
+        yield {
+            "event": "completed",
+            "tool": name,
+            "success": success,
+            "result": spill_handle["preview"] if spill_handle else result,
+            "error": error,
+            "spill_id": spill_handle["spill_id"] if spill_handle else None,
+            "result_size": spill_handle["size"] if spill_handle else 0,
+            "chunks": chunk_count,
+            "truncated": truncated,
+            "execution_time": execution_time,
+            "queue_time": queue_time
+        }
+    
+    def _record_stream_outcome(
+        self,
+        breakers: List[Any],
+        retry_policy: Optional[RetryPolicy],
+        started: bool,
+        error: Optional[str],
+        exception: Optional[BaseException]
+    ) -> None:
+        """Registra nos circuit breakers o desfecho de um stream (só erros transitórios contam como falha)"""
+        for breaker in breakers:
+            if not started:
+                # Chamada não executada (ex.: tempo de fila esgotado): devolver a chamada de teste
+                breaker.release()
+            elif error is not None and retry_policy.is_retryable(error, exception):
+                breaker.record_failure()
+            else:
+                breaker.record_success()
+    
+    def _advance_stream(self, output: Iterator[Any]) -> Tuple[bool, Any]:
+        """Obtém a próxima parte do gerador: (False, parte) ou (True, valor de retorno)"""
+        try:
+            return False, next(output)
+        except StopIteration as stop:
+            return True, stop.value
+    
+    def run_stream(
+        self,
+        name: str,
+        parameters: Dict[str, Any],
+        max_chunks: Optional[int] = None,
+        on_chunk: Optional[Callable[[Any], None]] = None
+    ) -> ToolResult:
+        """Consome stream_tool (repassando cada parte a on_chunk) e retorna o resultado consolidado"""
+        if self.cassette is not None and self.cassette.replaying:
+            return self._replay_tool_result(name, parameters)
+        
+        completed: Dict[str, Any] = {}
+        with tracer.span("tool.stream", tool=name) as span:
+            for event in self.stream_tool(name, parameters, max_chunks):
+                if event["event"] == "chunk":
+                    if on_chunk:
+                        on_chunk(event["data"])
+                else:
+                    completed = event
+            
+            if span:
+                span.set_attributes(
+                    success=completed.get("success", False),
+                    chunks=completed.get("chunks", 0),
+                    truncated=completed.get("truncated", False)
+                )
+                if not completed.get("success", False):
+                    span.status = "error"
+                    span.error = completed.get("error")
+        
+        result = ToolResult(
+            success=completed.get("success", False),
+            result=completed.get("result"),
+            error=completed.get("error"),
+            execution_time=completed.get("execution_time", 0.0),
+            queue_time=completed.get("queue_time", 0.0),
+            spill_id=completed.get("spill_id"),
+            preview=completed.get("result") if completed.get("spill_id") else None,
+            result_size=completed.get("result_size", 0)
+        )
+        self._record_tool_result(name, parameters, result)
+        return result
+    
+    def use_cassette(self, cassette: Optional[Cassette]) -> None:
+        """Grava os resultados das ferramentas em um cassete ou os serve a partir dele (None desativa)"""
+        self.cassette = cassette
+    
+    def _record_tool_result(self, name: str, parameters: Dict[str, Any], result: ToolResult) -> None:
+        """Grava o resultado no cassete, se estiver gravando"""
+        if self.cassette is None or not self.cassette.recording:
+            return
+        self.cassette.record(
+            Cassette.TOOL,
+            interaction_key("tool", name, parameters),
+            {
+                "success": result.success,
+                "result": result.result,
+                "error": result.error,
+                "execution_time": result.execution_time,
+                "queue_time": result.queue_time,
+                "attempts": result.attempts,
+                "spill_id": result.spill_id,
+                "preview": result.preview,
+                "result_size": result.result_size
+            },
+            result.execution_time,
+            group=name
+        )
+    
+    def _replay_tool_result(self, name: str, parameters: Dict[str, Any]) -> ToolResult:
+        """Serve o resultado gravado no cassete, sem executar a ferramenta"""
+        try:
+            return ToolResult(**self.cassette.replay_tool(interaction_key("tool", name, parameters), name))
+        except CassetteMissError as e:
+            return ToolResult(success=False, error=str(e))
+    
+    def get_circuit_breaker_status(self) -> Dict[str, Any]:
+        """Retorna o estado dos circuit breakers por ferramenta e por host"""
+        return self.circuit_breakers.get_status()
+    
+    def execute_plan(
+        self,
+        nodes: List[Dict[str, Any]],
+        max_workers: int = 4,
+        stop_on_error: bool = False,
+        initial_results: Optional[Dict[str, Any]] = None,
+        execute_tool: Optional[Callable[[str, Dict[str, Any]], ToolResult]] = None
+    ) -> Iterator[Dict[str, Any]]:
+        """Executa um grafo de chamadas dependentes, produzindo eventos conforme os nós terminam
+        
+        Cada nó tem "id", "tool", "parameters" e opcionalmente "depends_on", "for_each", "limit"
+        e "checkpoint". Parâmetros podem referenciar resultados anteriores com "${id.campo.0.subcampo}"
+        (inclusive os de initial_results); em nós for_each, "${item}" é o elemento atual.
+        execute_tool substitui a execução de cada chamada (padrão: self.execute_tool).
+        """
+        executor = ToolPlanExecutor(execute_tool or self.execute_tool, max_workers, stop_on_error)
+        return executor.execute(nodes, initial_results)
+    
+    def run_plan(
+        self,
+        nodes: List[Dict[str, Any]],
+        max_workers: int = 4,
+        stop_on_error: bool = False,
+        initial_results: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        """Executa um plano completo e retorna os resultados de todos os nós"""
+        nodes_results = {}
+        summary = {}
+        
+        for event in self.execute_plan(nodes, max_workers, stop_on_error, initial_results):
+            if event["event"] == "plan_completed":
+                summary = event
+            else:
+                nodes_results[event["node_id"]] = event
+        
+        return {
+            "success": summary.get("success", False),
+            "nodes": nodes_results,
+            "total_time": summary.get("total_time", 0.0),
+            "failed_nodes": summary.get("failed_nodes", []),
+            "deferred_nodes": summary.get("deferred_nodes", [])
+        }
+    
     def _add_to_history(
         self,
         tool_name: str,
@@ -185,16 +937,26 @@ class ToolManager:
         result: Any,
         success: bool,
         execution_time: float,
-        error: Optional[str] = None
+        error: Optional[str] = None,
+        spill_handle: Optional[Dict[str, Any]] = None,
+        queue_time: float = 0.0,
+        attempts: int = 1
     ) -> None:
         """Adiciona uma execução ao histórico"""
+        if spill_handle:
+            result_repr = spill_handle["preview"]
+        else:
+            result_repr = str(result) if result is not None else None
+        
         history_entry = {
             "timestamp": datetime.now().isoformat(),
             "tool_name": tool_name,
             "parameters": parameters,
-            "result": str(result) if result is not None else None,
+            "result": result_repr,
+            "spill_id": spill_handle["spill_id"] if spill_handle else None,
             "success": success,
             "execution_time": execution_time,
+            "queue_time": queue_time,
             "error": error
         }
         
@@ -203,6 +965,115 @@ class ToolManager:
         # Limitar tamanho do histórico
         if len(self.execution_history) > self.max_history_size:
             self.execution_history.pop(0)
+        
+        # Persistir no log de execuções (gravado em segundo plano)
+        if self.execution_log is not None:
+            params_json = json.dumps(parameters, sort_keys=True, ensure_ascii=False, default=str)
+            tool = self.tools.get(tool_name)
+            self.execution_log.log({
+                "timestamp": datetime.now().timestamp(),
+                "tool_name": tool_name,
+                "category": tool.category if tool else None,
+                "params_hash": hashlib.sha1(params_json.encode("utf-8")).hexdigest(),
+                "success": 1 if success else 0,
+                "execution_time": execution_time,
+                "queue_time": queue_time,
+                "attempts": attempts,
+                "params_bytes": len(params_json),
+                "result_bytes": spill_handle["size"] if spill_handle else len(result_repr or ""),
+                "error": error
+            })
+    
+    def enable_execution_log(self, db_path: str = "./data/tool_executions.db", **kwargs) -> ToolExecutionLog:
+        """Ativa o log persistente de execuções em SQLite"""
+        if self.execution_log is None:
+            self.execution_log = ToolExecutionLog(db_path, **kwargs)
+        return self.execution_log
+    
+    def disable_execution_log(self) -> None:
+        """Grava as execuções pendentes e desativa o log persistente"""
+        if self.execution_log is not None:
+            self.execution_log.close()
+            self.execution_log = None
+    
+    def _record_latency(self, tool: Optional[ToolDefinition], execution_time: float, success: bool) -> None:
+        """Registra a latência de uma execução nos histogramas"""
+        if tool is None:
+            return
+        
+        with self._metrics_lock:
+            if tool.name not in self.tool_latency:
+                self.tool_latency[tool.name] = LatencyHistogram()
+            if tool.category not in self.category_latency:
+                self.category_latency[tool.category] = LatencyHistogram()
+            
+            self.tool_latency[tool.name].record(execution_time, success)
+            self.category_latency[tool.category].record(execution_time, success)
+    
+    def get_latency_statistics(self, category: Optional[str] = None) -> Dict[str, Any]:
+        """Retorna percentis (p50/p90/p99/max) e taxas por janela de cada ferramenta e categoria"""
+        with self._metrics_lock:
+            tools = {
+                name: histogram.summary()
+                for name, histogram in self.tool_latency.items()
+                if not category or (name in self.tools and self.tools[name].category == category)
+            }
+            categories = {
+                name: histogram.summary()
+                for name, histogram in self.category_latency.items()
+                if not category or name == category
+            }
+        
+        # Ordenar pelo p99 para destacar as ferramentas mais lentas
+        slowest = sorted(tools, key=lambda name: tools[name]["p99"], reverse=True)
+        
+        return {
+            "tools": tools,
+            "categories": categories,
+            "slowest_tools": slowest[:10]
+        }
+    
+    def export_latency_histograms(self) -> Dict[str, Any]:
+        """Exporta os histogramas serializados para combinação entre processos"""
+        with self._metrics_lock:
+            return {
+                "tools": {name: histogram.to_dict() for name, histogram in self.tool_latency.items()},
+                "categories": {name: histogram.to_dict() for name, histogram in self.category_latency.items()}
+            }
+    
+    def merge_latency_histograms(self, data: Dict[str, Any]) -> None:
+        """Combina histogramas exportados por outro processo"""
+        with self._metrics_lock:
+            for target, key in ((self.tool_latency, "tools"), (self.category_latency, "categories")):
+                for name, histogram_data in data.get(key, {}).items():
+                    histogram = LatencyHistogram.from_dict(histogram_data)
+                    if name in target:
+                        target[name].merge(histogram)
+                    else:
+                        target[name] = histogram
+    
+    def read_spilled_result(self, spill_id: str, offset: int = 0, length: int = 20000) -> Dict[str, Any]:
+        """Lê um trecho de um resultado despejado em disco"""
+        content = self.spill_store.read(spill_id, offset, length)
+        if content is None:
+            return {
+                "success": False,
+                "error": f"Resultado '{spill_id}' não encontrado"
+            }
+        
+        entry = self.spill_store.entries.get(spill_id, {})
+        return {
+            "success": True,
+            "spill_id": spill_id,
+            "offset": offset,
+            "content": content,
+            "total_size": entry.get("size", 0),
+            "has_more": offset + length < entry.get("size", 0)
+        }
+    
+    def load_spilled_result(self, spill_id: str) -> Any:
+        """Carrega o resultado completo de um handle de despejo"""
+        return self.spill_store.load(spill_id)
     
     def get_execution_history(self, count: int = 10) -> List[Dict[str, Any]]:
         """Retorna o histórico de execuções"""
@@ -240,11 +1111,18 @@ class ToolManager:
             # Tempo médio geral
             stats["average_execution_time"] = sum(e["execution_time"] for e in self.execution_history) / len(self.execution_history)
         
+        # Percentis de latência (não limitados ao tamanho do histórico)
+        stats["latency"] = self.get_latency_statistics()
+        stats["circuit_breakers"] = self.get_circuit_breaker_status()
+        
         return stats
     
     def clear_history(self) -> None:
         """Limpa o histórico de execuções"""
         self.execution_history.clear()
+        with self._metrics_lock:
+            self.tool_latency.clear()
+            self.category_latency.clear()
     
     def export_tools_schema(self) -> str:
         """Exporta o schema de todas as ferramentas em JSON"""
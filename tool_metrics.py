@@ -0,0 +1,159 @@
+"""
+Métricas de Latência das Ferramentas - Histogramas logarítmicos e taxas por janela
+"""
+import math
+import time
+from typing import Dict, Any, List, Optional
+
+
+class LatencyHistogram:
+    """Histograma de latência com buckets logarítmicos, combinável entre processos"""
+    
+    # Buckets crescem por um fator constante (erro relativo de até ~19% por bucket)
+    MIN_VALUE = 0.0001  # 0,1 ms
+    GROWTH_FACTOR = 2 ** 0.25
+    
+    # Janelas de taxa: slots de 5 segundos cobrindo até 1 hora
+    RATE_SLOT_SECONDS = 5
+    RATE_WINDOWS = {"1m": 60, "5m": 300, "1h": 3600}
+    
+    def __init__(self):
+        self.buckets: Dict[int, int] = {}
+        self.count = 0
+        self.errors = 0
+        self.total = 0.0
+        self.min = None
+        self.max = 0.0
+        self.rate_slots: Dict[int, List[int]] = {}  # slot -> [execuções, erros]
+    
+    def _bucket_index(self, value: float) -> int:
+        """Calcula o índice do bucket para um valor em segundos"""
+        if value <= self.MIN_VALUE:
+            return 0
+        return int(math.ceil(math.log(value / self.MIN_VALUE, self.GROWTH_FACTOR)))
+    
+    def _bucket_upper_bound(self, index: int) -> float:
+        """Retorna o limite superior de um bucket"""
+        return self.MIN_VALUE * (self.GROWTH_FACTOR ** index)
+    
+    def record(self, value: float, success: bool = True, timestamp: Optional[float] = None) -> None:
+        """Registra uma amostra de latência (em segundos)"""
+        value = max(value, 0.0)
+        index = self._bucket_index(value)
+        self.buckets[index] = self.buckets.get(index, 0) + 1
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+        self.min = value if self.min is None else min(self.min, value)
+        if not success:
+            self.errors += 1
+        
+        # Contabilizar na janela de taxas
+        slot = int((timestamp or time.time()) // self.RATE_SLOT_SECONDS)
+        counters = self.rate_slots.setdefault(slot, [0, 0])
+        counters[0] += 1
+        if not success:
+            counters[1] += 1
+        self._prune_rate_slots(slot)
+    
+    def _prune_rate_slots(self, current_slot: int) -> None:
+        """Descarta slots mais antigos que a maior janela"""
+        oldest = current_slot - max(self.RATE_WINDOWS.values()) // self.RATE_SLOT_SECONDS
+        for slot in [s for s in self.rate_slots if s < oldest]:
+            del self.rate_slots[slot]
+    
+    def percentile(self, q: float) -> float:
+        """Retorna o percentil q (0-100) aproximado pelo limite do bucket"""
+        if self.count == 0:
+            return 0.0
+        
+        rank = max(1, int(math.ceil(self.count * q / 100.0)))
+        seen = 0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen >= rank:
+                return min(self._bucket_upper_bound(index), self.max)
+        return self.max
+    
+    def get_rates(self, now: Optional[float] = None) -> Dict[str, Dict[str, float]]:
+        """Retorna execuções e erros por segundo nas janelas de 1m/5m/1h"""
+        current_slot = int((now or time.time()) // self.RATE_SLOT_SECONDS)
+        rates = {}
+        
+        for window_name, window_seconds in self.RATE_WINDOWS.items():
+            first_slot = current_slot - window_seconds // self.RATE_SLOT_SECONDS + 1
+            executions = 0
+            errors = 0
+            for slot, (slot_count, slot_errors) in self.rate_slots.items():
+                if first_slot <= slot <= current_slot:
+                    executions += slot_count
+                    errors += slot_errors
+            rates[window_name] = {
+                "count": executions,
+                "per_second": executions / window_seconds,
+                "error_rate": errors / executions if executions else 0.0
+            }
+        
+        return rates
+    
+    def merge(self, other: "LatencyHistogram") -> None:
+        """Combina outro histograma neste (ex.: vindo de outro processo)"""
+        for index, bucket_count in other.buckets.items():
+            self.buckets[index] = self.buckets.get(index, 0) + bucket_count
+        self.count += other.count
+        self.errors += other.errors
+        self.total += other.total
+        self.max = max(self.max, other.max)
+        if other.min is not None:
+            self.min = other.min if self.min is None else min(self.min, other.min)
+        
+        for slot, (slot_count, slot_errors) in other.rate_slots.items():
+            counters = self.rate_slots.setdefault(slot, [0, 0])
+            counters[0] += slot_count
+            counters[1] += slot_errors
+        if self.rate_slots:
+            self._prune_rate_slots(max(self.rate_slots))
+    
+    def summary(self) -> Dict[str, Any]:
+        """Retorna um resumo com percentis e taxas"""
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "avg": self.total / self.count if self.count else 0.0,
+            "min": self.min or 0.0,
+            "p50": self.percentile(50),
+            "p90": self.percentile(90),
+            "p99": self.percentile(99),
+            "max": self.max,
+            "rates": self.get_rates()
+        }
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Serializa o histograma em formato JSON"""
+        return {
+            "min_value": self.MIN_VALUE,
+            "growth_factor": self.GROWTH_FACTOR,
+            "buckets": {str(index): bucket_count for index, bucket_count in self.buckets.items()},
+            "count": self.count,
+            "errors": self.errors,
+            "total": self.total,
+            "min": self.min,
+            "max": self.max,
+            "rate_slots": {str(slot): counters for slot, counters in self.rate_slots.items()}
+        }
+    
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "LatencyHistogram":
+        """Reconstrói um histograma serializado com to_dict"""
+        if data.get("min_value", cls.MIN_VALUE) != cls.MIN_VALUE or data.get("growth_factor", cls.GROWTH_FACTOR) != cls.GROWTH_FACTOR:
+            raise ValueError("Histograma com parâmetros de bucket incompatíveis")
+        
+        histogram = cls()
+        histogram.buckets = {int(index): bucket_count for index, bucket_count in data.get("buckets", {}).items()}
+        histogram.count = data.get("count", 0)
+        histogram.errors = data.get("errors", 0)
+        histogram.total = data.get("total", 0.0)
+        histogram.min = data.get("min")
+        histogram.max = data.get("max", 0.0)
+        histogram.rate_slots = {int(slot): list(counters) for slot, counters in data.get("rate_slots", {}).items()}
+        return histogram
@@ -0,0 +1,297 @@
+"""
+Executor de Planos de Ferramentas - Executa grafos de dependência (DAG) de chamadas
+"""
+import contextvars
+import re
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Dict, Any, List, Optional, Iterator, Callable, Set, Tuple
+
+
+class PlanValidationError(ValueError):
+    """Plano de ferramentas inválido (dependência inexistente, ciclo, etc.)"""
+    pass
+
+
+# ${no}, ${no.campo.0.subcampo} ou ${item.campo} dentro de for_each
+_REFERENCE_PATTERN = re.compile(r"\$\{([A-Za-z_][\w-]*)((?:\.[\w-]+)*)\}")
+
+
+def _resolve_path(value: Any, path: List[str]) -> Any:
+    """Navega em dicionários/listas seguindo os segmentos do caminho"""
+    for segment in path:
+        if isinstance(value, dict):
+            if segment not in value:
+                raise KeyError(f"campo '{segment}' não encontrado")
+            value = value[segment]
+        elif isinstance(value, (list, tuple)):
+            try:
+                value = value[int(segment)]
+            except (ValueError, IndexError):
+                raise KeyError(f"índice '{segment}' inválido")
+        else:
+            raise KeyError(f"não é possível acessar '{segment}' em {type(value).__name__}")
+    return value
+
+
+def _find_references(value: Any) -> Set[str]:
+    """Retorna os ids de nós referenciados em parâmetros (recursivamente)"""
+    if isinstance(value, str):
+        return {match.group(1) for match in _REFERENCE_PATTERN.finditer(value)}
+    if isinstance(value, dict):
+        return set().union(*(_find_references(v) for v in value.values())) if value else set()
+    if isinstance(value, (list, tuple)):
+        return set().union(*(_find_references(v) for v in value)) if value else set()
+    return set()
+
+
+def _substitute(value: Any, scope: Dict[str, Any]) -> Any:
+    """Substitui referências ${...} pelos resultados já disponíveis"""
+    if isinstance(value, str):
+        full_match = _REFERENCE_PATTERN.fullmatch(value)
+        if full_match:
+            # Referência isolada preserva o tipo original (lista, número, ...)
+            return _resolve_path(scope[full_match.group(1)], [s for s in full_match.group(2).split(".") if s])
+        return _REFERENCE_PATTERN.sub(
+            lambda m: str(_resolve_path(scope[m.group(1)], [s for s in m.group(2).split(".") if s])),
+            value
+        )
+    if isinstance(value, dict):
+        return {k: _substitute(v, scope) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_substitute(v, scope) for v in value]
+    return value
+
+
+class ToolPlanExecutor:
+    """Executa um plano de chamadas de ferramentas respeitando dependências, em paralelo"""
+    
+    def __init__(self, execute_tool: Callable, max_workers: int = 4, stop_on_error: bool = False):
+        self.execute_tool = execute_tool
+        self.max_workers = max_workers
+        self.stop_on_error = stop_on_error
+    
+    def _normalize(self, nodes: List[Dict[str, Any]], known_ids: Set[str] = frozenset()) -> Dict[str, Dict[str, Any]]:
+        """Valida o plano e calcula as dependências de cada nó (known_ids: resultados já disponíveis)"""
+        plan = {}
+        for index, node in enumerate(nodes):
+            node_id = str(node.get("id") or f"step_{index + 1}")
+            if node_id in plan or node_id in known_ids:
+                raise PlanValidationError(f"Nó duplicado: '{node_id}'")
+            if not node.get("tool"):
+                raise PlanValidationError(f"Nó '{node_id}' sem ferramenta")
+            plan[node_id] = dict(node, id=node_id)
+        
+        for node_id, node in plan.items():
+            references = _find_references(node.get("parameters", {})) | _find_references(node.get("for_each"))
+            references.discard("item")
+            dependencies = set(node.get("depends_on", [])) | references
+            unknown = dependencies - set(plan) - set(known_ids)
+            if unknown:
+                raise PlanValidationError(f"Nó '{node_id}' depende de nós inexistentes: {sorted(unknown)}")
+            node["depends_on"] = sorted(dependencies)
+        
+        # Detectar ciclos (ordenação topológica de Kahn)
+        remaining = {node_id: set(node["depends_on"]) - set(known_ids) for node_id, node in plan.items()}
+        while remaining:
+            ready = [node_id for node_id, deps in remaining.items() if not deps]
+            if not ready:
+                raise PlanValidationError(f"Ciclo de dependências entre: {sorted(remaining)}")
+            for node_id in ready:
+                del remaining[node_id]
+            for deps in remaining.values():
+                deps.difference_update(ready)
+        
+        return plan
+    
+    def _for_each_calls(self, node: Dict[str, Any], results: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Parâmetros de cada item de um nó for_each (KeyError se uma referência for inválida)"""
+        scope = dict(results)
+        items = _substitute(node["for_each"], scope)
+        if not isinstance(items, list):
+            items = [items]
+        if node.get("limit"):
+            items = items[:int(node["limit"])]
+        return [_substitute(node.get("parameters", {}), dict(scope, item=item)) for item in items]
+    
+    def _for_each_event(self, node: Dict[str, Any], tool_results: List[Any], start: float) -> Dict[str, Any]:
+        """Evento de conclusão de um nó for_each a partir dos resultados dos itens"""
+        errors = [r.error for r in tool_results if not r.success]
+        return {
+            "event": "node_completed",
+            "node_id": node["id"],
+            "tool": node["tool"],
+            "success": not errors or len(errors) < len(tool_results),
+            "result": [r.result if r.success else None for r in tool_results],
+            "compact_result": [r.compact_result() if r.success else None for r in tool_results],
+            "spill_id": None,
+            "error": "; ".join(errors) if errors else None,
+            "execution_time": time.time() - start,
+            "queue_time": sum(r.queue_time for r in tool_results)
+        }
+    
+    def _invalid_reference_event(self, node: Dict[str, Any], error: KeyError, start: float) -> Dict[str, Any]:
+        """Evento de falha de um nó cuja referência ${...} não pôde ser resolvida"""
+        return {
+            "event": "node_completed",
+            "node_id": node["id"],
+            "tool": node["tool"],
+            "success": False,
+            "result": None,
+            "compact_result": None,
+            "spill_id": None,
+            "error": f"Referência inválida: {error.args[0] if error.args else error}",
+            "execution_time": time.time() - start,
+            "queue_time": 0.0
+        }
+    
+    def _run_node(self, node: Dict[str, Any], results: Dict[str, Any]) -> Dict[str, Any]:
+        """Executa um nó simples e devolve o evento de conclusão"""
+        start = time.time()
+        try:
+            parameters = _substitute(node.get("parameters", {}), dict(results))
+        except KeyError as e:
+            return self._invalid_reference_event(node, e, start)
+        
+        tool_result = self.execute_tool(node["tool"], parameters)
+        return {
+            "event": "node_completed",
+            "node_id": node["id"],
+            "tool": node["tool"],
+            "success": tool_result.success,
+            "result": tool_result.result,
+            # Prévia + spill_id para resultados grandes; "result" completo só alimenta as referências
+            "compact_result": tool_result.compact_result(),
+            "spill_id": tool_result.spill_id,
+            "error": tool_result.error,
+            "execution_time": time.time() - start,
+            "queue_time": tool_result.queue_time
+        }
+    
+    def execute(
+        self,
+        nodes: List[Dict[str, Any]],
+        initial_results: Optional[Dict[str, Any]] = None
+    ) -> Iterator[Dict[str, Any]]:
+        """Executa o plano, produzindo um evento a cada nó concluído ou ignorado
+        
+        initial_results traz resultados de execuções anteriores, referenciáveis pelos nós.
+        Um nó com "checkpoint": true, ao concluir, adia os nós ainda não iniciados
+        (evento node_skipped com deferred=True) para que quem chamou revise o restante.
+        O plano é validado já nesta chamada (PlanValidationError antes de qualquer evento);
+        os nós executam conforme o iterador é consumido.
+        """
+        initial_results = dict(initial_results or {})
+        plan = self._normalize(nodes, set(initial_results))
+        return self._execute(plan, initial_results)
+    
+    def _execute(self, plan: Dict[str, Dict[str, Any]], initial_results: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+        """Executa um plano já validado"""
+        start = time.time()
+        results: Dict[str, Any] = dict(initial_results)
+        failed: Set[str] = set()
+        deferred: Set[str] = set()
+        finished: Set[str] = set(initial_results)
+        pending = dict(plan)
+        # Futuro -> (nó, índice do item em nós for_each ou None)
+        running: Dict[Future, Tuple[str, Optional[int]]] = {}
+        item_results: Dict[str, List[Any]] = {}
+        items_left: Dict[str, int] = {}
+        started: Dict[str, float] = {}
+        aborted = False
+        checkpoint_reached = False
+        
+        executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        try:
+            while pending or running:
+                # Ignorar nós cujas dependências falharam
+                for node_id, node in list(pending.items()):
+                    if failed.intersection(node["depends_on"]) or aborted:
+                        del pending[node_id]
+                        finished.add(node_id)
+                        if checkpoint_reached and not failed.intersection(node["depends_on"]):
+                            deferred.add(node_id)
+                            reason = "checkpoint atingido"
+                        else:
+                            failed.add(node_id)
+                            reason = "execução interrompida" if aborted else "dependência falhou"
+                        yield {
+                            "event": "node_skipped",
+                            "node_id": node_id,
+                            "tool": node["tool"],
+                            "reason": reason,
+                            "deferred": node_id in deferred
+                        }
+                
+                # Disparar todos os nós prontos
+                completed = []
+                for node_id, node in list(pending.items()):
+                    if not all(dep in finished for dep in node["depends_on"]):
+                        continue
+                    del pending[node_id]
+                    started[node_id] = time.time()
+                    
+                    if node.get("for_each") is None:
+                        # Copiar o contexto para que os spans das ferramentas fiquem sob o span do chamador
+                        context = contextvars.copy_context()
+                        running[executor.submit(context.run, self._run_node, node, dict(results))] = (node_id, None)
+                        continue
+                    
+                    try:
+                        calls = self._for_each_calls(node, results)
+                    except KeyError as e:
+                        completed.append(self._invalid_reference_event(node, e, started[node_id]))
+                        continue
+                    if not calls:
+                        completed.append(self._for_each_event(node, [], started[node_id]))
+                        continue
+                    
+                    # Os itens são independentes: cada um ocupa um trabalhador do próprio plano
+                    item_results[node_id] = [None] * len(calls)
+                    items_left[node_id] = len(calls)
+                    for index, parameters in enumerate(calls):
+                        context = contextvars.copy_context()
+                        future = executor.submit(context.run, self.execute_tool, node["tool"], parameters)
+                        running[future] = (node_id, index)
+                
+                if not completed:
+                    if not running:
+                        continue
+                    done, _ = wait(list(running), return_when=FIRST_COMPLETED)
+                    for future in done:
+                        node_id, index = running.pop(future)
+                        if index is None:
+                            completed.append(future.result())
+                            continue
+                        item_results[node_id][index] = future.result()
+                        items_left[node_id] -= 1
+                        if items_left[node_id] == 0:
+                            del items_left[node_id]
+                            completed.append(self._for_each_event(
+                                plan[node_id], item_results.pop(node_id), started[node_id]
+                            ))
+                
+                for event in completed:
+                    node_id = event["node_id"]
+                    finished.add(node_id)
+                    if event["success"]:
+                        results[node_id] = event["result"]
+                        if plan[node_id].get("checkpoint"):
+                            checkpoint_reached = True
+                            aborted = True
+                    else:
+                        failed.add(node_id)
+                        aborted = aborted or self.stop_on_error
+                    yield event
+            
+            yield {
+                "event": "plan_completed",
+                "success": not failed,
+                "completed_nodes": len(results) - len(initial_results),
+                "failed_nodes": sorted(failed),
+                "deferred_nodes": sorted(deferred),
+                "total_time": time.time() - start
+            }
+        finally:
+            # Consumidor pode parar cedo: cancelar o que ainda não começou
+            executor.shutdown(wait=False, cancel_futures=True)
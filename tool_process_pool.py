@@ -0,0 +1,116 @@
+"""
+Pool de Processos para Ferramentas CPU-bound - Isola ferramentas que seguram o GIL
+"""
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Any, Callable, Optional, Tuple
+
+
+def _get_worker_memory_mb() -> float:
+    """Retorna a memória residente atual (não o pico) do processo trabalhador em MB"""
+    try:
+        # Linux: segunda coluna de statm = páginas residentes
+        with open("/proc/self/statm") as f:
+            resident_pages = int(f.read().split()[1])
+        return resident_pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, IndexError, AttributeError):
+        pass
+    try:
+        import psutil
+        return psutil.Process(os.getpid()).memory_info().rss / (1024 * 1024)
+    except ImportError:
+        return 0.0  # Sem como medir: só a reciclagem por número de tarefas vale
+
+
+def _run_in_worker(target: Callable, parameters: Dict[str, Any]) -> Tuple[Any, float]:
+    """Executa a ferramenta no processo trabalhador e retorna (resultado, memória em MB)"""
+    result = target(**parameters)
+    return result, _get_worker_memory_mb()
+
+
+class ToolProcessPool:
+    """Pool persistente de processos com reciclagem por número de tarefas ou memória
+    
+    Cada trabalhador é substituído sozinho após max_tasks_per_child tarefas. O
+    ProcessPoolExecutor não permite aposentar um trabalhador específico, então quando um
+    deles passa de max_worker_memory_mb (memória residente atual) o pool inteiro é trocado:
+    as tarefas em andamento terminam nos processos antigos e as novas vão para processos novos.
+    """
+    
+    def __init__(
+        self,
+        max_workers: Optional[int] = None,
+        max_tasks_per_child: int = 100,
+        max_worker_memory_mb: float = 512.0
+    ):
+        self.max_workers = max_workers or os.cpu_count() or 2
+        self.max_tasks_per_child = max_tasks_per_child
+        self.max_worker_memory_mb = max_worker_memory_mb
+        self.tasks_submitted = 0
+        self.recycles = 0
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+    
+    def _get_executor(self) -> ProcessPoolExecutor:
+        """Cria o executor sob demanda"""
+        with self._lock:
+            if self._executor is None:
+                # spawn evita herdar threads e locks do servidor Flask via fork
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    max_tasks_per_child=self.max_tasks_per_child
+                )
+            return self._executor
+    
+    def recycle(self, executor: Optional[ProcessPoolExecutor] = None) -> None:
+        """Substitui todos os processos trabalhadores (tarefas em andamento terminam)
+        
+        Com executor, só recicla se ele ainda for o atual (evita trocar duas vezes quando
+        várias tarefas do mesmo pool passam do limite de memória).
+        """
+        with self._lock:
+            if executor is not None and executor is not self._executor:
+                return
+            executor, self._executor = self._executor, None
+            self.recycles += 1
+        if executor is not None:
+            executor.shutdown(wait=False)
+    
+    def run(self, target: Callable, parameters: Dict[str, Any], timeout: Optional[float] = None) -> Any:
+        """Executa uma ferramenta no pool; argumentos e resultado são serializados com pickle"""
+        executor = self._get_executor()
+        self.tasks_submitted += 1
+        
+        try:
+            result, worker_memory_mb = executor.submit(_run_in_worker, target, parameters).result(timeout=timeout)
+        except BrokenProcessPool:
+            self.recycle(executor)
+            raise RuntimeError("Processo trabalhador encerrado inesperadamente")
+        
+        # Trabalhador acima do limite de memória: trocar o pool (ver docstring da classe)
+        if self.max_worker_memory_mb and worker_memory_mb > self.max_worker_memory_mb:
+            self.recycle(executor)
+        
+        return result
+    
+    def shutdown(self) -> None:
+        """Encerra o pool aguardando as tarefas em andamento"""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+    
+    def get_status(self) -> Dict[str, Any]:
+        """Retorna o estado do pool"""
+        return {
+            "active": self._executor is not None,
+            "max_workers": self.max_workers,
+            "max_tasks_per_child": self.max_tasks_per_child,
+            "max_worker_memory_mb": self.max_worker_memory_mb,
+            "tasks_submitted": self.tasks_submitted,
+            "recycles": self.recycles
+        }
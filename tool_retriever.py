@@ -0,0 +1,173 @@
+"""
+Seleção de Ferramentas por Relevância - Índice BM25 sobre nomes e descrições das ferramentas
+"""
+import json
+import math
+import re
+import threading
+import time
+import unicodedata
+from collections import Counter
+from typing import Dict, Any, List, Optional, Tuple
+
+from .reasoning_context import estimate_tokens
+
+
+# Palavras sem valor para distinguir ferramentas
+_STOPWORDS = {
+    "a", "o", "as", "os", "um", "uma", "de", "do", "da", "dos", "das", "e", "em", "no", "na",
+    "nos", "nas", "por", "para", "com", "que", "se", "ou", "ao", "aos", "sua", "seu", "me",
+    "the", "an", "of", "and", "or", "to", "in", "on", "for", "with", "is", "by", "from"
+}
+
+# Prefixo usado como radical: junta variações como "arquivo"/"arquivos", "pesquise"/"pesquisar"
+_STEM_LENGTH = 6
+
+
+def tokenize(text: str) -> List[str]:
+    """Tokens normalizados (sem acentos, minúsculas, radical por prefixo), separando snake_case"""
+    decomposed = unicodedata.normalize("NFKD", text.lower())
+    text = "".join(char for char in decomposed if not unicodedata.combining(char))
+    return [
+        token[:_STEM_LENGTH]
+        for token in re.split(r"[^a-z0-9]+", text)
+        if len(token) > 1 and token not in _STOPWORDS
+    ]
+
+
+class ToolRetriever:
+    """Escolhe as ferramentas mais relevantes para a requisição e o passo atual
+    
+    Cada ferramenta vira um documento (nome com peso dobrado, descrição e nomes dos
+    parâmetros) em um índice BM25, refeito só quando o catálogo muda. O prompt recebe
+    as top_k mais bem pontuadas mais as ferramentas de always_include.
+    """
+    
+    def __init__(
+        self,
+        top_k: int = 8,
+        always_include: Optional[List[str]] = None,
+        k1: float = 1.5,
+        b: float = 0.75
+    ):
+        self.top_k = top_k
+        self.always_include = list(always_include or [])
+        self.k1 = k1
+        self.b = b
+        self._version: Optional[int] = None
+        self._documents: Dict[str, Counter] = {}
+        self._lengths: Dict[str, int] = {}
+        self._document_frequency: Counter = Counter()
+        self._average_length = 0.0
+        self._full_tokens = 0
+        self._lock = threading.Lock()
+        
+        # Métricas
+        self.selections = 0
+        self.fallbacks = 0
+        self.tools_offered = 0
+        self.tokens_full = 0
+        self.tokens_selected = 0
+        self.selection_time = 0.0
+    
+    def _index(self, tool_definitions: List[Dict[str, Any]], version: int) -> None:
+        """Refaz o índice se a versão do catálogo mudou"""
+        if self._version == version:
+            return
+        
+        documents = {}
+        for definition in tool_definitions:
+            function = definition["function"]
+            parameters = (function.get("parameters") or {}).get("properties", {})
+            text = " ".join([
+                function["name"], function["name"],
+                function.get("description", ""),
+                " ".join(parameters)
+            ])
+            documents[function["name"]] = Counter(tokenize(text))
+        
+        self._documents = documents
+        self._lengths = {name: sum(terms.values()) for name, terms in documents.items()}
+        self._document_frequency = Counter(term for terms in documents.values() for term in terms)
+        self._average_length = sum(self._lengths.values()) / len(documents) if documents else 0.0
+        self._full_tokens = self._estimate_tokens(tool_definitions)
+        self._version = version
+    
+    def score(self, query: str) -> List[Tuple[str, float]]:
+        """Pontuação BM25 de cada ferramenta para a consulta, da maior para a menor"""
+        query_terms = set(tokenize(query))
+        total = len(self._documents)
+        scores = []
+        for name, terms in self._documents.items():
+            score = 0.0
+            length_norm = 1 - self.b + self.b * self._lengths[name] / (self._average_length or 1.0)
+            for term in query_terms:
+                frequency = terms.get(term, 0)
+                if not frequency:
+                    continue
+                document_frequency = self._document_frequency[term]
+                idf = math.log(1 + (total - document_frequency + 0.5) / (document_frequency + 0.5))
+                score += idf * frequency * (self.k1 + 1) / (frequency + self.k1 * length_norm)
+            scores.append((name, score))
+        return sorted(scores, key=lambda item: item[1], reverse=True)
+    
+    def rank(self, query: str, tool_definitions: List[Dict[str, Any]], version: int) -> List[str]:
+        """Nomes das ferramentas com algum termo em comum com a consulta, do mais ao menos relevante"""
+        with self._lock:
+            self._index(tool_definitions, version)
+            return [name for name, score in self.score(query) if score > 0]
+    
+    def select(
+        self,
+        query: str,
+        tool_definitions: List[Dict[str, Any]],
+        version: int,
+        top_k: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """Retorna o subconjunto das definições relevante para a consulta, na ordem do catálogo
+        
+        Se nenhuma ferramenta tiver termo em comum com a consulta, todas são mantidas:
+        melhor um prompt maior do que esconder a ferramenta certa.
+        """
+        start = time.perf_counter()
+        top_k = self.top_k if top_k is None else top_k
+        
+        ranked = self.rank(query, tool_definitions, version)[:top_k]
+        
+        if not ranked or len(tool_definitions) <= top_k:
+            selected = tool_definitions
+        else:
+            names = set(ranked) | set(self.always_include)
+            selected = [definition for definition in tool_definitions if definition["function"]["name"] in names]
+        
+        with self._lock:
+            self.selections += 1
+            if not ranked:
+                self.fallbacks += 1
+            self.tools_offered += len(selected)
+            self.tokens_full += self._full_tokens
+            self.tokens_selected += self._full_tokens if selected is tool_definitions else self._estimate_tokens(selected)
+            self.selection_time += time.perf_counter() - start
+        
+        return selected
+    
+    @staticmethod
+    def _estimate_tokens(tool_definitions: List[Dict[str, Any]]) -> int:
+        """Tokens estimados das definições no prompt"""
+        return estimate_tokens(json.dumps(tool_definitions, ensure_ascii=False, default=str))
+    
+    def get_status(self) -> Dict[str, Any]:
+        """Retorna as métricas de seleção e a economia estimada de tokens"""
+        with self._lock:
+            return {
+                "top_k": self.top_k,
+                "always_include": self.always_include,
+                "indexed_tools": len(self._documents),
+                "selections": self.selections,
+                "fallbacks_to_all_tools": self.fallbacks,
+                "average_tools_offered": self.tools_offered / self.selections if self.selections else 0.0,
+                "prompt_tokens_full": self.tokens_full,
+                "prompt_tokens_selected": self.tokens_selected,
+                "prompt_tokens_saved": self.tokens_full - self.tokens_selected,
+                "average_selection_time": self.selection_time / self.selections if self.selections else 0.0
+            }
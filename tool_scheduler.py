@@ -0,0 +1,186 @@
+"""
+Escalonador de Ferramentas - Limites de concorrência e de taxa por categoria
+"""
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Any, Optional, Iterator
+
+
+class SchedulerTimeoutError(TimeoutError):
+    """Tempo máximo de espera na fila excedido"""
+    pass
+
+
+class TokenBucket:
+    """Balde de fichas para limitar a taxa de execuções"""
+    
+    def __init__(self, rate_per_second: float, burst: Optional[float] = None):
+        self.rate = rate_per_second
+        self.capacity = burst if burst is not None else max(1.0, rate_per_second)
+        self.tokens = self.capacity
+        self.last_refill = time.monotonic()
+        self._lock = threading.Lock()
+    
+    def _refill(self) -> None:
+        """Repõe as fichas proporcionalmente ao tempo decorrido"""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.last_refill) * self.rate)
+        self.last_refill = now
+    
+    def acquire(self, timeout: Optional[float] = None) -> bool:
+        """Consome uma ficha, aguardando se necessário"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        
+        while True:
+            with self._lock:
+                self._refill()
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return True
+                wait_time = (1 - self.tokens) / self.rate
+            
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                wait_time = min(wait_time, remaining)
+            time.sleep(wait_time)
+
+
+class CategoryLimits:
+    """Limites de uma categoria (ou ferramenta) de ferramentas"""
+    
+    def __init__(
+        self,
+        max_concurrency: Optional[int] = None,
+        rate_per_second: Optional[float] = None,
+        burst: Optional[float] = None
+    ):
+        self.max_concurrency = max_concurrency
+        self.rate_per_second = rate_per_second
+        self.semaphore = threading.BoundedSemaphore(max_concurrency) if max_concurrency else None
+        self.bucket = TokenBucket(rate_per_second, burst) if rate_per_second else None
+        self.active = 0
+        self.waiting = 0
+        self.total_queue_time = 0.0
+        self.acquisitions = 0
+        self.timeouts = 0
+
+
+class ToolScheduler:
+    """Controla quantas ferramentas de cada categoria rodam ao mesmo tempo e com qual taxa"""
+    
+    # Limites padrão: navegadores e motores de busca são os recursos mais caros
+    DEFAULT_LIMITS = {
+        "web": {"max_concurrency": 3, "rate_per_second": 2.0, "burst": 4},
+        "shell": {"max_concurrency": 4},
+        "file": {"max_concurrency": 8},
+        "system": {"max_concurrency": 4}
+    }
+    
+    def __init__(self, max_queue_time: float = 60.0):
+        self.max_queue_time = max_queue_time
+        self.category_limits: Dict[str, CategoryLimits] = {}
+        self.tool_limits: Dict[str, CategoryLimits] = {}
+        self._stats_lock = threading.Lock()
+        
+        for category, limits in self.DEFAULT_LIMITS.items():
+            self.configure_category(category, **limits)
+    
+    def configure_category(
+        self,
+        category: str,
+        max_concurrency: Optional[int] = None,
+        rate_per_second: Optional[float] = None,
+        burst: Optional[float] = None
+    ) -> None:
+        """Define os limites de uma categoria (None remove o limite)"""
+        self.category_limits[category] = CategoryLimits(max_concurrency, rate_per_second, burst)
+    
+    def configure_tool(
+        self,
+        tool_name: str,
+        max_concurrency: Optional[int] = None,
+        rate_per_second: Optional[float] = None,
+        burst: Optional[float] = None
+    ) -> None:
+        """Define limites específicos de uma ferramenta, somados aos da categoria"""
+        self.tool_limits[tool_name] = CategoryLimits(max_concurrency, rate_per_second, burst)
+    
+    @contextmanager
+    def slot(self, tool_name: str, category: str, rate_limited: bool = True) -> Iterator[float]:
+        """Aguarda vaga e ficha de taxa; produz o tempo gasto na fila em segundos
+        
+        rate_limited=False só aguarda a vaga: usado para retomar uma execução que já
+        consumiu a sua ficha (ex.: partes seguintes de uma ferramenta de streaming).
+        """
+        start = time.monotonic()
+        deadline = start + self.max_queue_time
+        acquired = []
+        
+        limits_chain = [
+            limits for limits in (self.category_limits.get(category), self.tool_limits.get(tool_name))
+            if limits is not None
+        ]
+        
+        try:
+            for limits in limits_chain:
+                with self._stats_lock:
+                    limits.waiting += 1
+                try:
+                    if limits.semaphore is not None:
+                        if not limits.semaphore.acquire(timeout=max(0.0, deadline - time.monotonic())):
+                            raise self._timeout(limits, tool_name)
+                        acquired.append(limits)
+                    if limits.bucket is not None and rate_limited:
+                        if not limits.bucket.acquire(timeout=max(0.0, deadline - time.monotonic())):
+                            raise self._timeout(limits, tool_name)
+                finally:
+                    with self._stats_lock:
+                        limits.waiting -= 1
+            
+            queue_time = time.monotonic() - start
+            with self._stats_lock:
+                for limits in limits_chain:
+                    limits.active += 1
+                    limits.acquisitions += 1
+                    limits.total_queue_time += queue_time
+            
+            try:
+                yield queue_time
+            finally:
+                with self._stats_lock:
+                    for limits in limits_chain:
+                        limits.active -= 1
+        finally:
+            for limits in acquired:
+                limits.semaphore.release()
+    
+    def _timeout(self, limits: CategoryLimits, tool_name: str) -> SchedulerTimeoutError:
+        """Registra e cria o erro de tempo de fila excedido"""
+        with self._stats_lock:
+            limits.timeouts += 1
+        return SchedulerTimeoutError(
+            f"Tempo de espera na fila excedido ({self.max_queue_time}s) para a ferramenta '{tool_name}'"
+        )
+    
+    def get_status(self) -> Dict[str, Any]:
+        """Retorna ocupação, fila e limites de cada categoria e ferramenta"""
+        def describe(limits: CategoryLimits) -> Dict[str, Any]:
+            return {
+                "max_concurrency": limits.max_concurrency,
+                "rate_per_second": limits.rate_per_second,
+                "active": limits.active,
+                "waiting": limits.waiting,
+                "acquisitions": limits.acquisitions,
+                "timeouts": limits.timeouts,
+                "avg_queue_time": limits.total_queue_time / limits.acquisitions if limits.acquisitions else 0.0
+            }
+        
+        with self._stats_lock:
+            return {
+                "max_queue_time": self.max_queue_time,
+                "categories": {name: describe(limits) for name, limits in self.category_limits.items()},
+                "tools": {name: describe(limits) for name, limits in self.tool_limits.items()}
+            }
@@ -0,0 +1,215 @@
+"""
+Validação de Parâmetros das Ferramentas - Validadores compilados com coerção de tipos
+"""
+import json
+from typing import Dict, Any, List, Callable, Optional, Tuple
+
+
+class ParameterValidationError(ValueError):
+    """Erro de validação de parâmetros de uma ferramenta"""
+    pass
+
+
+_TRUE_VALUES = {"true", "1", "yes", "y", "sim", "s", "on"}
+_FALSE_VALUES = {"false", "0", "no", "n", "não", "nao", "off"}
+
+
+def _coerce_string(value: Any) -> str:
+    """Converte o valor para texto"""
+    if isinstance(value, str):
+        return value
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return str(value)
+    raise ParameterValidationError(f"esperado texto, recebido {type(value).__name__}")
+
+
+def _coerce_integer(value: Any) -> int:
+    """Converte o valor para inteiro"""
+    if isinstance(value, bool):
+        raise ParameterValidationError("esperado inteiro, recebido booleano")
+    if isinstance(value, int):
+        return value
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    if isinstance(value, str):
+        text = value.strip()
+        try:
+            return int(text)
+        except ValueError:
+            try:
+                number = float(text)
+            except ValueError:
+                number = None
+            if number is not None and number.is_integer():
+                return int(number)
+    raise ParameterValidationError(f"esperado inteiro, recebido {value!r}")
+
+
+def _coerce_number(value: Any) -> float:
+    """Converte o valor para número"""
+    if isinstance(value, bool):
+        raise ParameterValidationError("esperado número, recebido booleano")
+    if isinstance(value, (int, float)):
+        return value
+    if isinstance(value, str):
+        try:
+            return float(value.strip().replace(",", "."))
+        except ValueError:
+            pass
+    raise ParameterValidationError(f"esperado número, recebido {value!r}")
+
+
+def _coerce_boolean(value: Any) -> bool:
+    """Converte o valor para booleano"""
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, int) and value in (0, 1):
+        return bool(value)
+    if isinstance(value, str):
+        text = value.strip().lower()
+        if text in _TRUE_VALUES:
+            return True
+        if text in _FALSE_VALUES:
+            return False
+    raise ParameterValidationError(f"esperado booleano, recebido {value!r}")
+
+
+def _coerce_object(value: Any) -> Dict[str, Any]:
+    """Converte o valor para objeto (dicionário)"""
+    if isinstance(value, dict):
+        return value
+    if isinstance(value, str) and value.strip().startswith("{"):
+        try:
+            parsed = json.loads(value)
+        except json.JSONDecodeError:
+            parsed = None
+        if isinstance(parsed, dict):
+            return parsed
+    raise ParameterValidationError(f"esperado objeto, recebido {type(value).__name__}")
+
+
+def _compile_array(item_coercer: Optional[Callable[[Any], Any]]) -> Callable[[Any], List[Any]]:
+    """Compila o coersor de listas, aplicando o coersor de itens quando houver"""
+    def coerce(value: Any) -> List[Any]:
+        if isinstance(value, (list, tuple)):
+            items = list(value)
+        elif isinstance(value, str):
+            text = value.strip()
+            parsed = None
+            if text.startswith("["):
+                try:
+                    parsed = json.loads(text)
+                except json.JSONDecodeError:
+                    parsed = None
+            # Um único valor é aceito como lista de um elemento
+            items = parsed if isinstance(parsed, list) else [value]
+        else:
+            raise ParameterValidationError(f"esperado lista, recebido {type(value).__name__}")
+        
+        if item_coercer is None:
+            return items
+        coerced = []
+        for index, item in enumerate(items):
+            try:
+                coerced.append(item_coercer(item))
+            except ParameterValidationError as e:
+                raise ParameterValidationError(f"item {index}: {e}")
+        return coerced
+    
+    return coerce
+
+
+def _compile_enum(coercer: Callable[[Any], Any], allowed: List[Any]) -> Callable[[Any], Any]:
+    """Compila a verificação de valores enumerados"""
+    lookup = {str(option).lower(): option for option in allowed}
+    
+    def coerce(value: Any) -> Any:
+        value = coercer(value)
+        if value in allowed:
+            return value
+        match = lookup.get(str(value).strip().lower())
+        if match is not None:
+            return match
+        raise ParameterValidationError(f"valor {value!r} não permitido, use um de {allowed}")
+    
+    return coerce
+
+
+_SCALAR_COERCERS = {
+    "string": _coerce_string,
+    "integer": _coerce_integer,
+    "number": _coerce_number,
+    "boolean": _coerce_boolean,
+    "object": _coerce_object,
+}
+
+
+def compile_coercer(schema: Dict[str, Any]) -> Optional[Callable[[Any], Any]]:
+    """Compila um coersor a partir do schema JSON de um parâmetro"""
+    param_type = schema.get("type")
+    
+    if param_type == "array":
+        items = schema.get("items")
+        coercer = _compile_array(compile_coercer(items) if items else None)
+    else:
+        coercer = _SCALAR_COERCERS.get(param_type)
+    
+    if coercer is not None and schema.get("enum"):
+        coercer = _compile_enum(coercer, list(schema["enum"]))
+    
+    return coercer
+
+
+class ParameterValidator:
+    """Validador de parâmetros compilado uma única vez por ferramenta"""
+    
+    def __init__(
+        self,
+        schema: Dict[str, Any],
+        nullable: Optional[List[str]] = None,
+        untyped: Optional[List[str]] = None,
+        accepts_extra: bool = False
+    ):
+        properties = schema.get("properties", {})
+        self.required = tuple(schema.get("required", []))
+        self.nullable = frozenset(nullable or [])
+        self.accepts_extra = accepts_extra
+        self.coercers: Dict[str, Optional[Callable[[Any], Any]]] = {
+            name: None if name in (untyped or []) else compile_coercer(param_schema)
+            for name, param_schema in properties.items()
+        }
+    
+    def validate(self, parameters: Dict[str, Any]) -> Tuple[Dict[str, Any], Optional[str]]:
+        """Valida e converte os parâmetros, retornando (parâmetros, erro)"""
+        for name in self.required:
+            if name not in parameters:
+                return parameters, f"Parâmetro obrigatório '{name}' não fornecido"
+        
+        coerced = {}
+        for name, value in parameters.items():
+            if name not in self.coercers:
+                if self.accepts_extra:
+                    coerced[name] = value
+                    continue
+                accepted = ", ".join(self.coercers) or "nenhum"
+                return parameters, f"Parâmetro desconhecido '{name}' (aceitos: {accepted})"
+            
+            if value is None:
+                if name in self.nullable:
+                    coerced[name] = None
+                elif name in self.required:
+                    return parameters, f"Parâmetro obrigatório '{name}' não pode ser nulo"
+                # Opcional não anulável (ex.: count: int = 10): nulo equivale a omitir, vale o padrão
+                continue
+            
+            coercer = self.coercers[name]
+            if coercer is None:
+                coerced[name] = value
+                continue
+            
+            try:
+                coerced[name] = coercer(value)
+            except ParameterValidationError as e:
+                return parameters, f"Parâmetro '{name}' inválido: {e}"
+        
+        return coerced, None
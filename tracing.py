@@ -0,0 +1,177 @@
+"""
+Rastreamento (Tracing) - Spans aninhados de requisição, raciocínio, ferramentas e LLM
+"""
+import contextvars
+import json
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, Any, List, Optional, Iterator
+
+
+class Span:
+    """Intervalo de tempo nomeado com atributos, parte de um trace"""
+    
+    def __init__(self, name: str, trace_id: str, parent_id: Optional[str], attributes: Dict[str, Any]):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent_id
+        self.attributes = dict(attributes)
+        self.start_time = time.time()
+        self._start_monotonic = time.monotonic()
+        self.duration: Optional[float] = None
+        self.status = "ok"
+        self.error: Optional[str] = None
+    
+    def set_attribute(self, key: str, value: Any) -> None:
+        """Define um atributo do span"""
+        self.attributes[key] = value
+    
+    def set_attributes(self, **attributes: Any) -> None:
+        """Define vários atributos do span"""
+        self.attributes.update(attributes)
+    
+    def finish(self) -> None:
+        """Encerra o span"""
+        if self.duration is None:
+            self.duration = time.monotonic() - self._start_monotonic
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Serializa o span"""
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start_time": self.start_time,
+            "duration": self.duration,
+            "status": self.status,
+            "error": self.error,
+            "attributes": self.attributes
+        }
+
+
+_current_span: contextvars.ContextVar = contextvars.ContextVar("current_span", default=None)
+
+
+class Tracer:
+    """Cria spans aninhados e os exporta para um buffer em memória e/ou arquivo JSONL"""
+    
+    def __init__(self, buffer_size: int = 5000, export_path: Optional[str] = None):
+        self.enabled = True
+        self.spans: deque = deque(maxlen=buffer_size)
+        self.export_path = export_path
+        self._lock = threading.Lock()
+    
+    def configure(
+        self,
+        export_path: Optional[str] = None,
+        buffer_size: Optional[int] = None,
+        enabled: Optional[bool] = None
+    ) -> None:
+        """Ajusta o destino de exportação, o tamanho do buffer e a ativação"""
+        with self._lock:
+            if export_path is not None:
+                directory = os.path.dirname(export_path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                self.export_path = export_path or None
+            if buffer_size is not None and buffer_size != self.spans.maxlen:
+                self.spans = deque(self.spans, maxlen=buffer_size)
+            if enabled is not None:
+                self.enabled = enabled
+    
+    @contextmanager
+    def span(self, name: str, **attributes: Any) -> Iterator[Optional[Span]]:
+        """Abre um span filho do span atual (ou raiz de um novo trace)"""
+        if not self.enabled:
+            yield None
+            return
+        
+        parent = _current_span.get()
+        span = Span(
+            name,
+            parent.trace_id if parent else uuid.uuid4().hex,
+            parent.span_id if parent else None,
+            attributes
+        )
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.status = "error"
+            span.error = str(e)
+            raise
+        finally:
+            _current_span.reset(token)
+            span.finish()
+            self._export(span)
+    
+    def current_span(self) -> Optional[Span]:
+        """Retorna o span ativo no contexto atual"""
+        return _current_span.get()
+    
+    def current_trace_id(self) -> Optional[str]:
+        """Retorna o id do trace ativo no contexto atual"""
+        span = _current_span.get()
+        return span.trace_id if span else None
+    
+    def _export(self, span: Span) -> None:
+        """Guarda o span no buffer e, se configurado, no arquivo JSONL"""
+        data = span.to_dict()
+        with self._lock:
+            self.spans.append(data)
+            if self.export_path:
+                try:
+                    with open(self.export_path, "a", encoding="utf-8") as f:
+                        f.write(json.dumps(data, ensure_ascii=False, default=str) + "\n")
+                except OSError as e:
+                    print(f"Erro ao exportar span: {e}")
+    
+    def get_trace(self, trace_id: str) -> List[Dict[str, Any]]:
+        """Retorna os spans de um trace, em ordem de início"""
+        with self._lock:
+            spans = [span for span in self.spans if span["trace_id"] == trace_id]
+        return sorted(spans, key=lambda span: span["start_time"])
+    
+    def get_recent_traces(self, count: int = 20) -> List[Dict[str, Any]]:
+        """Resume os traces mais recentes a partir dos spans raiz"""
+        with self._lock:
+            spans = list(self.spans)
+        
+        spans_by_trace: Dict[str, List[Dict[str, Any]]] = {}
+        for span in spans:
+            spans_by_trace.setdefault(span["trace_id"], []).append(span)
+        
+        roots = [span for span in spans if span["parent_id"] is None]
+        roots.sort(key=lambda span: span["start_time"], reverse=True)
+        
+        summaries = []
+        for root in roots[:count]:
+            trace_spans = spans_by_trace.get(root["trace_id"], [])
+            time_by_name: Dict[str, float] = {}
+            for span in trace_spans:
+                time_by_name[span["name"]] = time_by_name.get(span["name"], 0.0) + (span["duration"] or 0.0)
+            summaries.append({
+                "trace_id": root["trace_id"],
+                "name": root["name"],
+                "start_time": root["start_time"],
+                "duration": root["duration"],
+                "status": root["status"],
+                "span_count": len(trace_spans),
+                "time_by_span_name": time_by_name
+            })
+        return summaries
+    
+    def clear(self) -> None:
+        """Limpa o buffer em memória"""
+        with self._lock:
+            self.spans.clear()
+
+
+# Instância global do tracer
+tracer = Tracer()
@@ -3,8 +3,10 @@ Módulo de Compatibilidade com Windows
 """
 import os
 import platform
+import signal
 import subprocess
-from typing import Dict, List, Optional, Tuple
+import threading
+from typing import Dict, Generator, List, Optional, Tuple
 
 
 class WindowsCompatibility:
@@ -66,6 +68,10 @@ class WindowsCompatibility:
         """Retorna o comando equivalente para o sistema atual"""
         return self.command_mapping.get(linux_command, linux_command)
     
+    def build_command(self, command: str, args: List[str] = None) -> str:
+        """Monta a linha de comando para o shell, mapeando o comando para o sistema atual"""
+        return " ".join([self.get_command(command)] + (args or []))
+    
     def execute_command(self, command: str, args: List[str] = None, shell: bool = True) -> Tuple[int, str, str]:
         """Executa um comando de forma compatível com o sistema"""
         if args is None:
@@ -75,16 +81,15 @@ class WindowsCompatibility:
         mapped_command = self.get_command(command)
         
         # Construir comando completo
-        if args:
+        if shell:
+            full_command = self.build_command(command, args)
+        elif args:
             full_command = [mapped_command] + args
         else:
             full_command = mapped_command
         
         try:
             # Executar comando
-            if shell and isinstance(full_command, list):
-                full_command = " ".join(full_command)
-            
             result = subprocess.run(
                 full_command,
                 shell=shell,
@@ -100,6 +105,61 @@ class WindowsCompatibility:
         except Exception as e:
             return 1, "", f"Erro ao executar comando: {str(e)}"
     
+    def execute_command_stream(
+        self,
+        command: str,
+        args: List[str] = None,
+        working_dir: Optional[str] = None,
+        timeout: float = 30
+    ) -> Generator[str, None, Tuple[int, bool]]:
+        """Executa um comando produzindo cada linha de saída (stdout e stderr) assim que é escrita
+        
+        Retorna (valor do gerador) o código de saída e se o limite de tempo foi atingido.
+        Fechar o gerador antes do fim encerra o processo e os seus filhos.
+        """
+        process = subprocess.Popen(
+            self.build_command(command, args),
+            shell=True,
+            cwd=working_dir,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            text=True,
+            bufsize=1,
+            # Grupo próprio para encerrar também os filhos do shell
+            start_new_session=not self.is_windows
+        )
+        timed_out = threading.Event()
+        
+        def kill_process():
+            if process.poll() is not None:
+                return
+            try:
+                if self.is_windows:
+                    process.kill()
+                else:
+                    os.killpg(process.pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+        
+        def on_timeout():
+            timed_out.set()
+            kill_process()
+        
+        timer = threading.Timer(timeout, on_timeout)
+        timer.start()
+        try:
+            for line in process.stdout:
+                yield line.rstrip("\n")
+            returncode = process.wait()
+        finally:
+            timer.cancel()
+            if process.poll() is None:
+                kill_process()
+                process.wait()
+            process.stdout.close()
+        
+        return returncode, timed_out.is_set()
+    
     def list_directory(self, path: str = ".") -> List[Dict[str, str]]:
         """Lista o conteúdo de um diretório de forma compatível"""
         normalized_path = self.normalize_path(path)